@@ -1,81 +1,107 @@
 # Em cada página ou no script principal se for gerenciado centralmente
 import streamlit as st
-import pandas as pd
+import amostragem
+import analises
 import app_utils
-from datetime import datetime, timedelta
+import barra_lateral
+import desempenho
+from datetime import datetime
 
 st.set_page_config(layout="wide", page_title="Dashboard Açaí - Visao Geral")
+desempenho.iniciar_execucao("Visão Geral")
+desempenho.secao("Filtros")
 
-st.sidebar.header("Filtros 🎛️")
-formas_pagamento_opcoes, clientes_opcoes, min_data_bd, max_data_bd = app_utils.obter_opcoes_filtro()
-
-data_inicio = st.sidebar.date_input("Data Início", min_data_bd, min_value=min_data_bd, max_value=max_data_bd)
-data_fim = st.sidebar.date_input("Data Fim", max_data_bd, min_value=min_data_bd, max_value=max_data_bd)
-
-if data_inicio > data_fim:
-    st.sidebar.error("Data de início não pode ser maior que a data de fim.")
-    st.stop() 
-
-formas_pagamento_selecionadas = st.sidebar.multiselect(
-    "Forma de Pagamento",
-    options=formas_pagamento_opcoes,
-    default=[] # Pode deixar vazio ou pré-selecionar algumas
-)
-clientes_selecionados = st.sidebar.multiselect(
-    "Cliente",
-    options=clientes_opcoes,
-    default=[]
-)
+# Filtros compartilhados com as demais páginas (ver barra_lateral.py)
+filtros = barra_lateral.filtros()
+st.title("Painel de Vendas Açaí - Visão Geral 📈")
 
-# Carregar dados com base nos filtros
-df_filtrado = app_utils.carregar_dados_base(data_inicio, data_fim, formas_pagamento_selecionadas, clientes_selecionados)
+# Carregar os agregados (cubo) com base nos filtros; as demais páginas leem o mesmo cubo (em cache)
+desempenho.secao("Carregamento dos dados")
+cubo = app_utils.carregar_cubo(filtros)
 
-# Adicionar colunas úteis de data/hora se df_filtrado não estiver vazio
-if not df_filtrado.empty:
-    df_filtrado['hora_venda'] = df_filtrado['data_venda'].dt.hour
-    df_filtrado['dia_semana_venda'] = df_filtrado['data_venda'].dt.day_name()
-    df_filtrado['mes_ano_venda'] = df_filtrado['data_venda'].dt.to_period('M').astype(str) # Para agrupar por mês/ano
-    
-    st.session_state.df_filtrado = df_filtrado 
-else:
+if cubo['dia'].empty:
     st.warning("Nenhum dado encontrado para os filtros selecionados.")
     # st.stop() # Opcional: parar se não houver dados, ou permitir que a página exiba "sem dados"
 
-st.title("Painel de Vendas Açaí - Visão Geral 📈")
+# --- Hoje ao Vivo ---
+# Fragmento: a cada intervalo só este bloco é reexecutado (não a página), relendo apenas o dia corrente
+@st.fragment(run_every=app_utils.INTERVALO_AO_VIVO_SEGUNDOS or None)
+def kpis_ao_vivo():
+    kpis_dia = app_utils.carregar_kpis_dia()
+    st.subheader(f"Hoje ao Vivo ⚡ ({kpis_dia['dia']:%d/%m/%Y})")
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Vendas do Dia", f"R$ {kpis_dia['total_vendas_valor']:,.2f}")
+    col2.metric("Ticket Médio", f"R$ {kpis_dia['ticket_medio']:,.2f}")
+    col3.metric("Transações", f"{kpis_dia['num_transacoes']:,}")
+    col4.metric("Clientes Únicos", f"{kpis_dia['clientes_unicos']:,}")
+    atualizacao = f", atualizado a cada {app_utils.INTERVALO_AO_VIVO_SEGUNDOS} s" if app_utils.INTERVALO_AO_VIVO_SEGUNDOS else ""
+    st.caption(f"Último dia com vendas, sem os filtros da barra lateral. Lido às {datetime.now():%H:%M:%S}{atualizacao}.")
+
+desempenho.secao("Hoje ao Vivo")
+kpis_ao_vivo()
 
-if not df_filtrado.empty:
+if not cubo['dia'].empty:
     # --- KPIs ---
+    desempenho.secao("KPIs")
     st.subheader("Indicadores Chave 📊")
-    total_vendas_valor = df_filtrado['valor_total'].sum()
-    num_transacoes = df_filtrado['venda_id'].nunique() # Assumindo que venda_id é único por transação
-    ticket_medio = total_vendas_valor / num_transacoes if num_transacoes > 0 else 0
-    quantidade_vendida = df_filtrado['quantidade'].sum()
-    clientes_unicos = df_filtrado['cliente'].nunique()
+    clientes_unicos_exatos = barra_lateral.clientes_unicos_exatos()
+    clientes_unicos = app_utils.contar_clientes_unicos(filtros, exato=clientes_unicos_exatos)
+    resultados = analises.visao_geral(cubo, clientes_unicos)
+    kpis = resultados['kpis']
 
-    col1, col2, col3 = st.columns(3)
-    col1.metric("Total de Vendas", f"R$ {total_vendas_valor:,.2f}")
-    col2.metric("Ticket Médio", f"R$ {ticket_medio:,.2f}")
-    col3.metric("Itens Vendidos", f"{quantidade_vendida:,}")
-    # st.metric("Clientes Únicos", f"{clientes_unicos}") # Pode ser um KPI aqui ou na página de clientes
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Total de Vendas", f"R$ {kpis['total_vendas_valor']:,.2f}")
+    col2.metric("Ticket Médio", f"R$ {kpis['ticket_medio']:,.2f}")
+    col3.metric("Itens Vendidos", f"{kpis['quantidade_vendida']:,}")
+    col4.metric("Clientes Únicos", f"{kpis['clientes_unicos']:,}",
+                help=None if clientes_unicos_exatos else f"Estimativa (erro típico de ~{app_utils.hll.ERRO_PADRAO:.1%}).")
+    desempenho.primeiro_conteudo()
 
     # --- Evolução das Vendas ---
+    desempenho.secao("Evolução das Vendas")
     st.subheader("Evolução das Vendas no Período 📅")
-    # Agrupar por dia para o gráfico de evolução
-    vendas_por_dia = df_filtrado.groupby(df_filtrado['data_venda'].dt.date)['valor_total'].sum()
+    # Períodos longos viram semanas/meses (ou LTTB): o gráfico tem no máximo amostragem.MAX_PONTOS pontos
+    vendas_por_dia, reducao = amostragem.serie_adaptativa(resultados['vendas_por_dia'])
+    vendas_por_dia.index = vendas_por_dia.index.date
     st.line_chart(vendas_por_dia)
+    if reducao:
+        st.caption(reducao)
 
     # --- Quick Insights (Top Produtos/Categorias) ---
+    desempenho.secao("Quick Insights (Top Produtos/Categorias)")
     st.subheader("Destaques Rápidos 🏆")
     col_prod, col_cat = st.columns(2)
 
     with col_prod:
         st.markdown("#### Top 5 Produtos (por Quantidade)")
-        top_produtos_qtd = df_filtrado.groupby('produto_nome')['quantidade'].sum().nlargest(5)
-        st.bar_chart(top_produtos_qtd)
+        st.bar_chart(resultados['top_produtos_quantidade'])
 
     with col_cat:
         st.markdown("#### Top 3 Categorias (por Lucratividade)") # Lucratividade = valor_total
-        top_categorias_valor = df_filtrado.groupby('categoria_nome')['valor_total'].sum().nlargest(3)
-        st.bar_chart(top_categorias_valor)
+        st.bar_chart(resultados['top_categorias_valor'])
+
+    # --- Vendas do Período (linha a linha) ---
+    # Só sob demanda: as vendas vêm do cache compartilhado entre as sessões (app_utils.carregar_dados_base),
+    # então gerentes com os mesmos filtros usam o mesmo DataFrame
+    desempenho.secao("Vendas do Período")
+    st.subheader("Vendas do Período 🧾")
+    if st.toggle("Mostrar vendas linha a linha", key='mostrar_vendas'):
+        df_vendas = app_utils.carregar_dados_base(filtros['data_inicio'], filtros['data_fim'],
+                                                  filtros['formas_pagamento'], filtros['clientes'])
+        vendas_recentes = df_vendas.nlargest(1000, 'data_venda') # A tabela mostra só as mais recentes
+        st.caption(f"{len(df_vendas):,} vendas no período; as {len(vendas_recentes):,} mais recentes abaixo.")
+        st.dataframe(vendas_recentes[['data_venda', 'cliente', 'produto_nome', 'categoria_nome', 'forma_pagamento_nome',
+                                      'quantidade', 'preco_unitario', 'valor_total']], hide_index=True)
 else:
-    st.info("Não há dados para exibir com os filtros atuais.")
\ No newline at end of file
+    st.info("Não há dados para exibir com os filtros atuais.")
+
+# --- Estado dos caches (no fim da página, para já contar as consultas desta execução) ---
+with st.sidebar.expander("Cache 🗄️"):
+    df_cache, cache_vendas = app_utils.estatisticas_cache()
+    st.caption(f"Versão dos dados: {app_utils.versao_dados()}")
+    st.dataframe(df_cache, hide_index=True)
+    st.caption(f"Vendas em memória: {cache_vendas['entradas']} conjuntos de filtros, "
+               f"{cache_vendas['memoria_mb']:.1f} MB ({cache_vendas['bytes_por_linha']:.0f} bytes por venda), "
+               f"{cache_vendas['sessoes']} sessões")
+
+desempenho.finalizar_execucao()
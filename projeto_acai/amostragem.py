@@ -0,0 +1,83 @@
+"""
+Séries temporais com resolução adaptativa para os gráficos de linha: um período
+longo (vários anos, várias lojas) não manda um ponto por dia para o navegador.
+serie_adaptativa() escolhe o grão (dia, semana ou mês) pelo tamanho do período,
+somando as vendas de cada intervalo, ou mantém o grão diário e reduz a série com
+LTTB (Largest-Triangle-Three-Buckets), que preserva picos e vales. Em qualquer
+modo o gráfico recebe no máximo MAX_PONTOS pontos.
+Usado pelas páginas; os relatórios (analises.py) continuam com a série diária completa.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+# Máximo de pontos por gráfico (padrão: um ano inteiro ainda é diário)
+MAX_PONTOS = int(os.environ.get('ACAI_MAX_PONTOS_GRAFICO', '366'))
+# 'agregar' (padrão): soma por semana/mês quando o período não cabe; 'lttb': mantém o dia e reduz com LTTB
+MODO = os.environ.get('ACAI_REDUCAO_GRAFICOS', 'agregar')
+
+# Grão -> frequência do pandas; semanas começam na segunda e são rotuladas por ela
+GRAOS = {'dia': 'D', 'semana': 'W-MON', 'mês': 'MS'}
+
+def escolher_grao(dias, max_pontos=MAX_PONTOS):
+    """O grão mais fino em que um período de 'dias' dias cabe em max_pontos pontos."""
+    if dias <= max_pontos:
+        return 'dia'
+    if dias / 7 <= max_pontos:
+        return 'semana'
+    return 'mês'
+
+def reamostrar(serie, grao):
+    """Soma a série diária (índice de datas) por semana ou mês; no grão 'dia', a própria série."""
+    if grao == 'dia':
+        return serie
+    return serie.resample(GRAOS[grao], label='left', closed='left').sum()
+
+def lttb(serie, max_pontos):
+    """
+    Reduz a série a max_pontos pontos com LTTB: mantém o primeiro e o último e, de cada
+    faixa intermediária, o ponto que forma o maior triângulo com o ponto já escolhido e
+    a média da faixa seguinte. Retorna um subconjunto da série original (valores reais).
+    """
+    n = len(serie)
+    if max_pontos >= n or max_pontos < 3:
+        return serie
+    # x em dias desde o primeiro ponto: números pequenos, sem perder precisão no float
+    x = (serie.index.asi8 - serie.index.asi8[0]) / (86400 * 10**9)
+    y = serie.to_numpy(dtype=np.float64)
+    bordas = np.linspace(1, n - 1, max_pontos - 1).astype(np.intp) # max_pontos - 2 faixas entre as pontas
+    escolhidos = [0]
+    anterior = 0
+    for i in range(max_pontos - 2):
+        inicio, fim = bordas[i], bordas[i + 1]
+        if i + 2 < len(bordas):
+            x_medio, y_medio = x[fim:bordas[i + 2]].mean(), y[fim:bordas[i + 2]].mean()
+        else:
+            x_medio, y_medio = x[-1], y[-1]
+        areas = np.abs((x[anterior] - x_medio) * (y[inicio:fim] - y[anterior])
+                       - (x[anterior] - x[inicio:fim]) * (y_medio - y[anterior]))
+        anterior = inicio + int(np.argmax(areas))
+        escolhidos.append(anterior)
+    escolhidos.append(n - 1)
+    return serie.iloc[escolhidos]
+
+def serie_adaptativa(serie_diaria, max_pontos=MAX_PONTOS, modo=MODO):
+    """
+    Série de um gráfico de linha a partir de vendas por dia (índice de datas). Retorna
+    (série, descrição da redução para legenda, ou None se a série foi mantida).
+    """
+    if serie_diaria.empty:
+        return serie_diaria, None
+    serie = serie_diaria.copy()
+    serie.index = pd.DatetimeIndex(pd.to_datetime(serie.index))
+    serie = serie.sort_index()
+    dias = (serie.index[-1] - serie.index[0]).days + 1
+    grao = 'dia' if modo == 'lttb' else escolher_grao(dias, max_pontos)
+    reduzida = reamostrar(serie, grao)
+    # Limite rígido: mesmo por mês (ou dia a dia no modo 'lttb') o gráfico não passa de max_pontos
+    reduzida = lttb(reduzida, max_pontos)
+    if grao == 'dia' and len(reduzida) == len(serie):
+        return reduzida, None
+    descricao = f"Um ponto por {grao}" if grao != 'dia' else "Dias mais representativos (LTTB)"
+    return reduzida, f"{descricao}: {len(reduzida):,} pontos para {dias:,} dias."
@@ -0,0 +1,140 @@
+"""
+Cálculos de cada página do dashboard (KPIs, rankings, comparativos mês a mês e
+ano a ano etc.) sobre os agregados do app_utils, sem elementos de tela: as páginas
+só exibem os resultados, e scripts/gerar_relatorios.py gera os mesmos números em
+lote, fora de uma sessão do navegador (relatorio_completo).
+"""
+import pandas as pd
+
+import app_utils
+
+def visao_geral(cubo, clientes_unicos):
+    """KPIs do período, evolução diária e destaques (top produtos e categorias)."""
+    return {
+        'kpis': {**cubo['totais'], 'clientes_unicos': clientes_unicos},
+        'vendas_por_dia': cubo['dia']['valor_total'],
+        'top_produtos_quantidade': cubo['produto_nome']['quantidade'].nlargest(5),
+        'top_categorias_valor': cubo['categoria_nome']['valor_total'].nlargest(3), # Lucratividade = valor_total
+    }
+
+def analise_clientes(df_por_cliente, tamanho_ranking=10):
+    """Clientes únicos, rankings por valor gasto e por frequência e ticket médio de cada cliente."""
+    valor_total_cliente = df_por_cliente['valor_total']
+    num_vendas_cliente = df_por_cliente['num_vendas'] # Cada venda é uma visita
+    ticket_medio_cliente = (valor_total_cliente / num_vendas_cliente).fillna(0).sort_values(ascending=False)
+    return {
+        'clientes_unicos': len(df_por_cliente), # Contagem exata: todos os clientes estão listados
+        'top_valor': valor_total_cliente.nlargest(tamanho_ranking),
+        'top_frequencia': num_vendas_cliente.nlargest(tamanho_ranking),
+        'ticket_medio': pd.DataFrame({
+            'ticket_medio': ticket_medio_cliente,
+            'valor_total': valor_total_cliente,
+            'num_vendas': num_vendas_cliente,
+        }),
+    }
+
+def comparativo_mensal(vendas_por_mes):
+    """Últimos dois meses do período (MoM): dict com mes_atual, mes_anterior, seus valores e a variação %."""
+    if len(vendas_por_mes) < 2:
+        return None
+    atual, anterior = vendas_por_mes.iloc[-1], vendas_por_mes.iloc[-2]
+    return {
+        'mes_atual': vendas_por_mes.index[-1],
+        'valor_atual': atual,
+        'mes_anterior': vendas_por_mes.index[-2],
+        'valor_anterior': anterior,
+        'variacao_percentual': ((atual - anterior) / anterior) * 100 if anterior > 0 else float('inf'),
+    }
+
+def analise_temporal(cubo):
+    """Vendas por hora e dia da semana (com picos), evolução mensal, MoM e YoY (só com 2+ anos)."""
+    vendas_por_hora = cubo['hora']['valor_total']
+    # Dias da semana em ordem (0 = segunda) e em português
+    vendas_dia_semana = cubo['dia_semana']['valor_total'].reindex(range(7), fill_value=0)
+    vendas_dia_semana.index = app_utils.NOMES_DIAS_SEMANA
+    vendas_por_mes = cubo['mes_ano']['valor_total'].sort_index()
+
+    vendas_yoy = None
+    if len(cubo['ano']) >= 2:
+        # Tabela pivot: meses nas linhas (em ordem), anos nas colunas
+        vendas_yoy = cubo['ano_mes']['valor_total'].unstack('ano', fill_value=0).reindex(range(1, 13)).dropna()
+        vendas_yoy.index = vendas_yoy.index.map(app_utils.NOMES_MESES)
+    return {
+        'vendas_por_hora': vendas_por_hora,
+        'hora_pico': vendas_por_hora.idxmax() if not vendas_por_hora.empty else None,
+        'vendas_dia_semana': vendas_dia_semana,
+        'dia_mais_forte': vendas_dia_semana.idxmax() if not cubo['dia_semana'].empty else None,
+        'vendas_por_mes': vendas_por_mes,
+        'comparativo_mensal': comparativo_mensal(vendas_por_mes),
+        'vendas_yoy': vendas_yoy,
+    }
+
+def analise_pagamentos(df_por_fp, clientes_por_fp):
+    """Forma de pagamento mais popular e resumo por forma (valor, transações, ticket médio, clientes únicos)."""
+    valor_total = df_por_fp['valor_total']
+    num_vendas = df_por_fp['num_vendas'] # Cada venda é uma transação
+    ticket_medio = (valor_total / num_vendas).fillna(0)
+    resumo = pd.DataFrame({
+        'valor_total': valor_total,
+        'num_vendas': num_vendas,
+        'ticket_medio': ticket_medio,
+        'clientes_unicos': clientes_por_fp,
+    }).rename_axis('forma_pagamento_nome').sort_values('valor_total', ascending=False)
+    return {
+        'mais_popular': num_vendas.idxmax() if not num_vendas.empty else None,
+        'resumo': resumo,
+    }
+
+def analise_produtos(cubo, tamanho_ranking=10):
+    """Destaques e rankings de produtos e desempenho por categoria (faturamento, itens, preço médio)."""
+    df_por_produto = cubo['produto_nome']
+    df_por_categoria = cubo['categoria_nome']
+    qtd_por_produto = df_por_produto['quantidade']
+    valor_por_produto = df_por_produto['valor_total']
+    vazio = df_por_produto.empty
+    return {
+        'mais_vendido': None if vazio else {'produto': qtd_por_produto.idxmax(), 'quantidade': qtd_por_produto.max()},
+        'mais_rentavel': None if vazio else {'produto': valor_por_produto.idxmax(), 'valor_total': valor_por_produto.max()},
+        'top_valor': valor_por_produto.nlargest(tamanho_ranking),
+        'top_quantidade': qtd_por_produto.nlargest(tamanho_ranking),
+        'faturamento_categoria': df_por_categoria['valor_total'].sort_values(ascending=False),
+        'itens_categoria': df_por_categoria['quantidade'].sort_values(ascending=False),
+        'preco_medio_categoria': (df_por_categoria['valor_total'] / df_por_categoria['quantidade']).fillna(0).sort_values(ascending=False),
+    }
+
+def analise_produto(filtros, produto):
+    """Desempenho de um produto: KPIs, vendas por dia, por dia da semana e por hora."""
+    df_produto = app_utils.agregar(['dia', 'dia_semana', 'hora'], ['quantidade', 'valor_total'],
+                                   {**filtros, 'produtos': [produto]})
+    valor_total = df_produto['valor_total'].sum()
+    quantidade = df_produto['quantidade'].sum()
+    vendas_dia_semana = df_produto.groupby('dia_semana')['valor_total'].sum().reindex(range(7), fill_value=0)
+    vendas_dia_semana.index = app_utils.NOMES_DIAS_SEMANA
+    return {
+        'kpis': {'valor_total': valor_total, 'quantidade': quantidade,
+                 'preco_medio': valor_total / quantidade if quantidade > 0 else 0},
+        'vendas_por_dia': df_produto.groupby(df_produto['dia'].dt.date)['valor_total'].sum(),
+        'vendas_dia_semana': vendas_dia_semana,
+        'vendas_por_hora': df_produto.groupby('hora')['valor_total'].sum(),
+    }
+
+def relatorio_completo(filtros, exato=True):
+    """
+    Resultados de todas as páginas para um conjunto de filtros (um dict por página;
+    'produtos' inclui a análise individual de cada produto). exato: contagem de
+    clientes únicos, como em app_utils.contar_clientes_unicos; exata por padrão, para
+    os totais da visão geral e dos pagamentos baterem com a seção de clientes.
+    """
+    cubo = app_utils.carregar_cubo(filtros)
+    return {
+        'visao_geral': visao_geral(cubo, app_utils.contar_clientes_unicos(filtros, exato=exato)),
+        'clientes': analise_clientes(app_utils.carregar_clientes(filtros)),
+        'pagamentos': analise_pagamentos(
+            cubo['forma_pagamento_nome'],
+            app_utils.contar_clientes_unicos(filtros, por='forma_pagamento_nome', exato=exato)),
+        'temporal': analise_temporal(cubo),
+        'produtos': {
+            **analise_produtos(cubo),
+            'individual': {produto: analise_produto(filtros, produto) for produto in sorted(cubo['produto_nome'].index)},
+        },
+    }
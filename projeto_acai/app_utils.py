@@ -1,30 +1,640 @@
 import streamlit as st 
 import pandas as pd
 import sqlite3 
+import functools
+import os
+import queue
+import re
+import sys
+import threading
+import time
+import urllib.parse
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime, timedelta 
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 
-DB_NAME = 'acai.db'
+import desempenho
+import hll
+from desempenho import cronometrado
 
-@st.cache_data # Cache para otimizar o carregamento
+# Caminhos absolutos (como em scripts/setup_database.py): não dependem do diretório de onde o streamlit foi iniciado
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+DB_NAME = os.path.join(PROJECT_ROOT, 'acai.db')
+# Backend de leitura das vendas: 'sqlite' (padrão), 'parquet' (snapshot gerado por setup_database.py --parquet)
+# ou 'particionado' (acai.db mais as partições mensais gravadas por setup_database.py --particoes)
+BACKEND = os.environ.get('ACAI_BACKEND', 'sqlite')
+PARQUET_DIR = os.path.join(PROJECT_ROOT, 'parquet', 'vendas')
+PARTICOES_DIR = os.path.join(PROJECT_ROOT, 'particoes', 'acai')
+# Threads que consultam as partições de um período ao mesmo tempo
+THREADS_PARTICOES = int(os.environ.get('ACAI_THREADS_PARTICOES', str(min(8, os.cpu_count() or 1))))
+# Conexões somente leitura mantidas abertas para o acai.db (compartilhadas pelas threads do Streamlit)
+TAMANHO_POOL_CONEXOES = int(os.environ.get('ACAI_POOL_CONEXOES', '4'))
+# Motor de consulta: 'padrao' (SQLite para o acai.db, pandas/pyarrow para o Parquet) ou
+# 'duckdb' (motor vetorizado e multi-thread, lendo a mesma fonte escolhida em ACAI_BACKEND)
+MOTOR = os.environ.get('ACAI_MOTOR', 'padrao')
+COLUNAS_VENDAS = ['venda_id', 'data_venda', 'cliente', 'quantidade', 'preco_unitario', 'valor_total',
+                  'produto_nome', 'categoria_nome', 'forma_pagamento_nome',
+                  'hora_venda', 'dia_semana_venda', 'ano_mes_venda']
+# Colunas de calendário gravadas na ingestão (setup_database.py): hora, dia da semana (0 = segunda) e mês (AAAAMM)
+TIPOS_COLUNAS_CALENDARIO = {'hora_venda': 'int8', 'dia_semana_venda': 'int8', 'ano_mes_venda': 'int32'}
+# Textos repetidos em muitas vendas, guardados como 'category' por carregar_dados_base
+COLUNAS_CATEGORICAS = ['cliente', 'produto_nome', 'categoria_nome', 'forma_pagamento_nome']
+# Cache de vendas compartilhado entre as sessões: orçamento de memória e por quanto tempo
+# uma sessão sem novos acessos ainda "segura" o DataFrame que pediu
+ORCAMENTO_CACHE_MB = float(os.environ.get('ACAI_CACHE_MB', '256'))
+VALIDADE_REFERENCIA_SEGUNDOS = 30 * 60
+# Limites dos caches de consultas (ver _cache_consulta); novas cargas já os invalidam via versao_dados()
+CACHE_TTL_SEGUNDOS = int(os.environ.get('ACAI_CACHE_TTL', '3600'))
+CACHE_MAX_ENTRADAS = int(os.environ.get('ACAI_CACHE_ENTRADAS', '256'))
+# Orçamento de memória de cada cache de consultas (resultados, blocos mensais, partições)
+ORCAMENTO_CACHE_CONSULTAS_MB = float(os.environ.get('ACAI_CACHE_CONSULTAS_MB', '128'))
+# Máximo de nomes exibidos no filtro de clientes (o restante é alcançado pela busca por prefixo)
+LIMITE_BUSCA_CLIENTES = 500
+# Blocos mensais guardados pelo cache de agregações por dia (ver _agregar_por_blocos)
+CACHE_MAX_BLOCOS = int(os.environ.get('ACAI_CACHE_BLOCOS', '4096'))
+# Clientes únicos: 'aproximado' une os esboços HyperLogLog diários do acai.db (erro padrão
+# de ~1.6%, ver hll.py) sempre que os filtros permitem; 'exato' sempre conta sobre as vendas
+CLIENTES_UNICOS_APROXIMADOS = os.environ.get('ACAI_CLIENTES_UNICOS', 'aproximado') == 'aproximado'
+# Intervalo (segundos) em que o painel "ao vivo" da visão geral relê os KPIs do dia; 0 desliga
+INTERVALO_AO_VIVO_SEGUNDOS = int(os.environ.get('ACAI_AO_VIVO_SEGUNDOS', '10'))
+
+if int(pd.__version__.split('.')[0]) < 3:
+    # No pandas 3 o copy-on-write já é o padrão: quem altera um DataFrame do cache altera só a sua cópia
+    pd.set_option('mode.copy_on_write', True)
+
+# Rótulos em português, indexados por dia da semana (0 = segunda) e por mês (1 a 12)
+NOMES_DIAS_SEMANA = ["Segunda", "Terça", "Quarta", "Quinta", "Sexta", "Sábado", "Domingo"]
+NOMES_MESES = {1: "Jan", 2: "Fev", 3: "Mar", 4: "Abr", 5: "Mai", 6: "Jun",
+               7: "Jul", 8: "Ago", 9: "Set", 10: "Out", 11: "Nov", 12: "Dez"}
+
+def _tabela_existe(conn, nome_tabela):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (nome_tabela,)).fetchone() is not None
+
+def _coluna_existe(conn, nome_tabela, nome_coluna):
+    return any(linha[1] == nome_coluna for linha in conn.execute(f"PRAGMA table_info({nome_tabela})"))
+
+def versao_dados():
+    """
+    Token que muda sempre que a fonte de dados muda; faz parte da chave de todos os
+    caches, então novas cargas aparecem no dashboard sem reiniciar o servidor.
+    """
+    if BACKEND == 'parquet':
+        return max((os.path.getmtime(os.path.join(raiz, nome)) for raiz, _, nomes in os.walk(PARQUET_DIR) for nome in nomes), default=0)
+    with _conexao_leitura() as conn:
+        # Sequência incrementada pelo setup_database.py a cada carga
+        if _tabela_existe(conn, 'metadados'):
+            linha = conn.execute("SELECT valor FROM metadados WHERE chave = 'versao_dados'").fetchone()
+            if linha:
+                return linha[0]
+    # Bancos sem metadados: data de modificação do arquivo e do WAL
+    return tuple(os.path.getmtime(caminho) if os.path.exists(caminho) else 0 for caminho in (DB_NAME, DB_NAME + '-wal'))
+
+def versoes_meses():
+    """
+    Versão de cada mês dos dados: (versão base, {ano_mes AAAAMM: versão}), gravadas pelo
+    setup_database.py a cada carga. Um mês sem versão própria está na versão base.
+    None se a fonte não registra versões por mês (vale versao_dados() para todos).
+    """
+    if BACKEND == 'parquet':
+        return None
+    with _conexao_leitura() as conn:
+        if not _tabela_existe(conn, 'metadados'):
+            return None
+        linhas = conn.execute(
+            "SELECT chave, valor FROM metadados WHERE chave = 'versao_reconstrucao' OR chave LIKE 'versao_mes_%'"
+        ).fetchall()
+    versoes = dict(linhas)
+    if 'versao_reconstrucao' not in versoes:
+        return None
+    base = int(versoes.pop('versao_reconstrucao'))
+    return base, {int(chave[len('versao_mes_'):]): int(valor) for chave, valor in versoes.items()}
+
+def _versao_do_mes(versoes, mes, versao):
+    """Versão dos dados de um mês (pd.Period) segundo versoes_meses(); sem versões por mês, a versão geral."""
+    if versoes is None:
+        return versao
+    base, por_mes = versoes
+    return max(base, por_mes.get(mes.year * 100 + mes.month, base))
+
+@st.cache_resource
+def _contadores_cache():
+    """Chamadas e consultas efetivas (falhas de cache) por função, somadas em todas as sessões."""
+    return {'trava': threading.Lock(), 'funcoes': {}}
+
+def _registrar_cache(funcao, evento, quantidade=1):
+    contadores = _contadores_cache()
+    with contadores['trava']:
+        contagem = contadores['funcoes'].setdefault(funcao, {'chamadas': 0, 'falhas': 0})
+        contagem[evento] += quantidade
+    desempenho.contar_cache(evento, quantidade)
+
+def estatisticas_cache():
+    """Acertos/falhas e memória de cada cache do dashboard, mais o estado do cache compartilhado de vendas."""
+    contadores = _contadores_cache()
+    with contadores['trava']:
+        linhas = [
+            {'funcao': funcao, 'chamadas': c['chamadas'], 'acertos': c['chamadas'] - c['falhas'], 'falhas': c['falhas']}
+            for funcao, c in contadores['funcoes'].items()
+        ]
+    df = pd.DataFrame(linhas, columns=['funcao', 'chamadas', 'acertos', 'falhas'])
+    df['taxa_acerto'] = (df['acertos'] / df['chamadas']).fillna(0)
+    memoria = {nome: lru['bytes'] / (1024 * 1024) for nome, lru in list(_caches_consultas()['lrus'].items())}
+    df['memoria_mb'] = df['funcao'].map(memoria).fillna(0.0)
+    return df, estatisticas_cache_vendas()
+
+def limpar_caches():
+    """Esvazia todos os caches de dados (as estatísticas são mantidas)."""
+    for lru in list(_caches_consultas()['lrus'].values()):
+        _lru_descartar(lru, lambda chave: True)
+    limpar_cache_vendas()
+
+def usar_banco(caminho_db):
+    """Passa a ler caminho_db (ex: scripts com um banco por loja), descartando conexões e caches do banco anterior."""
+    global DB_NAME, PARTICOES_DIR
+    DB_NAME = caminho_db
+    # Partições do banco: particoes/<nome do banco>/ ao lado dele (ex: particoes/acai/)
+    PARTICOES_DIR = os.path.join(os.path.dirname(caminho_db), 'particoes', os.path.splitext(os.path.basename(caminho_db))[0])
+    pool = _pool_conexoes()
+    while not pool['livres'].empty():
+        pool['livres'].get_nowait().close()
+    _pool_conexoes.clear()
+    _conexao_duckdb.clear()
+    limpar_caches()
+
+def _abrir_conexao_leitura():
+    # mode=ro: o dashboard nunca escreve. Sem immutable=1, pois o setup_database.py continua
+    # gravando novas cargas e as conexões precisam enxergá-las.
+    conn = sqlite3.connect(f"file:{urllib.parse.quote(DB_NAME)}?mode=ro", uri=True,
+                           check_same_thread=False, cached_statements=256)
+    conn.execute("PRAGMA query_only = ON;")
+    conn.execute("PRAGMA mmap_size = 268435456;") # Até 256MB do arquivo mapeados em memória
+    conn.execute("PRAGMA cache_size = -32768;") # 32MB de cache de páginas por conexão
+    return conn
+
+@st.cache_resource
+def _pool_conexoes():
+    """Pool de conexões somente leitura do processo, criadas sob demanda até TAMANHO_POOL_CONEXOES."""
+    return {'livres': queue.LifoQueue(), 'criadas': 0, 'trava': threading.Lock()}
+
+@contextmanager
+def _conexao_leitura():
+    """
+    Empresta uma conexão do pool. As conexões ficam abertas entre as consultas, então o
+    cache de páginas e as instruções já preparadas (cached_statements) são reaproveitados.
+    """
+    pool = _pool_conexoes()
+    try:
+        conn = pool['livres'].get_nowait()
+    except queue.Empty:
+        with pool['trava']:
+            criar = pool['criadas'] < TAMANHO_POOL_CONEXOES
+            if criar:
+                pool['criadas'] += 1
+        try:
+            # Pool cheio: espera outra thread devolver uma conexão
+            conn = _abrir_conexao_leitura() if criar else pool['livres'].get()
+        except Exception:
+            if criar:
+                with pool['trava']:
+                    pool['criadas'] -= 1
+            raise
+    try:
+        yield conn
+    finally:
+        pool['livres'].put(conn)
+
+# --- Partições mensais (ACAI_BACKEND=particionado) ---
+# Cada mês exportado por setup_database.py --particoes é um SQLite próprio, com o mesmo esquema do
+# acai.db, chamado vendas_AAAAMM_v<versão>.db. A versão é a do mês no acai.db (versoes_meses):
+# uma partição com a versão atual do seu mês responde pelo mês; senão (mês ainda sem partição ou
+# com cargas mais novas, como o mês corrente durante a ingestão contínua) o mês é lido do acai.db.
+
+def _particoes_atuais(versoes):
+    """Partições com a versão atual do seu mês: {pd.Period do mês: caminho}."""
+    if versoes is None or not os.path.isdir(PARTICOES_DIR):
+        return {}
+    particoes = {}
+    for nome in os.listdir(PARTICOES_DIR):
+        encontrado = re.fullmatch(r'vendas_(\d{6})_v(\d+)\.db', nome)
+        if encontrado:
+            ano_mes, versao_particao = int(encontrado[1]), int(encontrado[2])
+            mes = pd.Period(year=ano_mes // 100, month=ano_mes % 100, freq='M')
+            if versao_particao == _versao_do_mes(versoes, mes, None):
+                particoes[mes] = os.path.join(PARTICOES_DIR, nome)
+    return particoes
+
+def _partes(filtros):
+    """
+    Divide o período dos filtros pelas fontes que o cobrem: [(caminho da partição ou
+    None para o acai.db, filtros da parte)]. Com ACAI_BACKEND=particionado há uma parte
+    por mês com partição atual e uma por sequência de meses lidos do acai.db; nos demais
+    backends, uma única parte (o acai.db).
+    """
+    if BACKEND != 'particionado':
+        return [(None, filtros)]
+    inicio = pd.to_datetime(filtros['data_inicio']).normalize()
+    fim = pd.to_datetime(filtros['data_fim']).normalize()
+    particoes = _particoes_atuais(versoes_meses())
+    partes = []
+    for mes in pd.period_range(inicio, fim, freq='M'):
+        caminho = particoes.get(mes)
+        data_inicio = max(inicio, mes.start_time).date()
+        data_fim = min(fim, mes.end_time.normalize()).date()
+        if caminho is None and partes and partes[-1][0] is None:
+            partes[-1][1]['data_fim'] = data_fim
+        else:
+            partes.append((caminho, {**filtros, 'data_inicio': data_inicio, 'data_fim': data_fim}))
+    return partes or [(None, filtros)]
+
+def _abrir_particao(caminho):
+    # immutable=1: o arquivo nunca é alterado (uma nova versão do mês é outro arquivo),
+    # então o SQLite dispensa travas e a verificação de mudanças a cada leitura
+    conn = sqlite3.connect(f"file:{urllib.parse.quote(caminho)}?mode=ro&immutable=1", uri=True)
+    conn.execute("PRAGMA query_only = ON;")
+    return conn
+
+@st.cache_resource
+def _executor_particoes():
+    """Pool de threads do processo para as consultas às partições (o sqlite3 libera o GIL enquanto consulta)."""
+    return ThreadPoolExecutor(max_workers=THREADS_PARTICOES, thread_name_prefix='particoes')
+
+def _consultar_partes(consulta, partes):
+    """
+    Executa consulta(conn, filtros da parte) em cada parte de _partes(), em paralelo quando
+    há mais de uma: as partições são abertas só para a consulta, o acai.db usa o pool de
+    conexões. Retorna os resultados na ordem das partes.
+    """
+    def executar(parte):
+        caminho, filtros_parte = parte
+        if caminho is None:
+            with _conexao_leitura() as conn:
+                return consulta(conn, filtros_parte)
+        conn = _abrir_particao(caminho)
+        try:
+            return consulta(conn, filtros_parte)
+        finally:
+            conn.close()
+    if len(partes) == 1:
+        return [executar(partes[0])]
+    return list(_executor_particoes().map(executar, partes))
+
+def _concatenar(frames):
+    com_dados = [df for df in frames if not df.empty]
+    if len(com_dados) == 1:
+        return com_dados[0]
+    return pd.concat(com_dados, ignore_index=True) if com_dados else frames[0]
+
+def _epoch_para_datetime(serie):
+    """Segundos desde 1970 (data_venda_epoch) para datetime: conversão direta, sem interpretar texto."""
+    return pd.to_datetime(serie.astype('int64'), unit='s').astype('datetime64[us]')
+
+def _filtro_periodo(conn, start_date, end_date):
+    """
+    Retorna (condição SQL, parâmetros) para o intervalo de datas em 'vendas v'.
+    Usa a coluna inteira data_venda_epoch (indexada) quando o banco já foi migrado.
+    """
+    inicio = pd.to_datetime(start_date)
+    fim = pd.to_datetime(end_date) + pd.Timedelta(days=1) - pd.Timedelta(seconds=1) # Incluir o dia todo
+    if _coluna_existe(conn, 'vendas', 'data_venda_epoch'):
+        epoch = pd.Timestamp('1970-01-01')
+        return "v.data_venda_epoch BETWEEN ? AND ?", [(inicio - epoch) // pd.Timedelta(seconds=1), (fim - epoch) // pd.Timedelta(seconds=1)]
+    return "v.data_venda BETWEEN ? AND ?", [inicio.strftime('%Y-%m-%d %H:%M:%S'), fim.strftime('%Y-%m-%d %H:%M:%S')]
+
+def _filtros_parquet(filtros):
+    """
+    Filtros do pyarrow em forma normal disjuntiva: uma conjunção por mês do
+    intervalo, o que faz o pyarrow abrir só as partições ano=/mes= necessárias.
+    """
+    inicio = pd.to_datetime(filtros['data_inicio'])
+    fim = pd.to_datetime(filtros['data_fim']) + pd.Timedelta(days=1)
+    condicoes_linha = [('data_venda', '>=', inicio), ('data_venda', '<', fim)]
+    for chave, coluna in (('formas_pagamento', 'forma_pagamento_nome'), ('clientes', 'cliente'), ('produtos', 'produto_nome')):
+        if filtros.get(chave):
+            condicoes_linha.append((coluna, 'in', list(filtros[chave])))
+    meses = pd.period_range(inicio, fim - pd.Timedelta(seconds=1), freq='M')
+    return [[('ano', '=', mes.year), ('mes', '=', mes.month)] + condicoes_linha for mes in meses]
+
+def _ler_parquet(colunas, filtros):
+    """Lê do snapshot Parquet apenas as colunas e partições necessárias."""
+    with desempenho.medir('parquet', 'sql') as medicao:
+        return desempenho.anotar(medicao, pd.read_parquet(PARQUET_DIR, columns=colunas, filters=_filtros_parquet(filtros)))
+
+# --- Motor DuckDB ---
+# As duas fontes são expostas ao DuckDB como a mesma view 'vendas_completas'
+# (uma linha por venda, já com os nomes de produto/categoria/forma de pagamento).
+DIMENSOES_DUCKDB = {
+    'produto_nome': 'produto_nome',
+    'categoria_nome': 'categoria_nome',
+    'forma_pagamento_nome': 'forma_pagamento_nome',
+    'cliente': 'cliente',
+    'dia': 'CAST(data_venda AS DATE)',
+    'hora': 'hora_venda',
+    'dia_semana': 'dia_semana_venda', # 0 = segunda
+    'mes': 'ano_mes_venda % 100',
+    'ano': 'ano_mes_venda // 100',
+    'mes_ano': 'ano_mes_venda', # AAAAMM, rotulado em agregar()
+}
+METRICAS_DUCKDB = {
+    'valor_total': 'SUM(valor_total)',
+    'quantidade': 'CAST(SUM(quantidade) AS BIGINT)',
+    'num_vendas': 'COUNT(*)',
+    'clientes_unicos': 'COUNT(DISTINCT cliente)',
+}
+
+@st.cache_resource
+def _conexao_duckdb():
+    """Conexão DuckDB do processo (banco em memória com views sobre a fonte de dados)."""
+    import duckdb # Dependência opcional, só necessária com ACAI_MOTOR=duckdb
+    conn = duckdb.connect()
+    if BACKEND == 'parquet':
+        arquivos = os.path.join(PARQUET_DIR, '**', '*.parquet').replace("'", "''")
+        conn.execute(f"""
+            CREATE VIEW vendas_completas AS
+            SELECT * FROM read_parquet('{arquivos}', hive_partitioning = true)
+        """)
+    else:
+        # Requer a extensão sqlite do DuckDB (instalada automaticamente na primeira vez)
+        caminho_db = DB_NAME.replace("'", "''")
+        conn.execute(f"ATTACH '{caminho_db}' AS acai (TYPE SQLITE, READ_ONLY)")
+        with _conexao_leitura() as conn_sqlite:
+            migrado = _coluna_existe(conn_sqlite, 'vendas', 'ano_mes')
+        # Com a coluna inteira o DuckDB monta o TIMESTAMP sem interpretar o texto de cada venda
+        data_venda = "make_timestamp(v.data_venda_epoch * 1000000)" if migrado else "CAST(v.data_venda AS TIMESTAMP)"
+        # Bancos não migrados: as colunas de calendário são calculadas pelo próprio DuckDB
+        colunas_calendario = (
+            "v.hora as hora_venda, v.dia_semana as dia_semana_venda, v.ano_mes as ano_mes_venda" if migrado else
+            "hour(CAST(v.data_venda AS TIMESTAMP)) as hora_venda, isodow(CAST(v.data_venda AS TIMESTAMP)) - 1 as dia_semana_venda, "
+            "year(CAST(v.data_venda AS TIMESTAMP)) * 100 + month(CAST(v.data_venda AS TIMESTAMP)) as ano_mes_venda"
+        )
+        conn.execute(f"""
+            CREATE VIEW vendas_completas AS
+            SELECT
+                v.id as venda_id, {data_venda} as data_venda, v.cliente,
+                v.quantidade, v.preco_unitario, v.valor_total,
+                p.nome as produto_nome,
+                c.nome as categoria_nome,
+                fp.nome as forma_pagamento_nome,
+                {colunas_calendario}
+            FROM acai.vendas v
+            JOIN acai.produtos p ON v.produto_id = p.id
+            JOIN acai.categorias c ON p.categoria_id = c.id
+            JOIN acai.formas_pagamento fp ON v.forma_pagamento_id = fp.id
+        """)
+    return conn
+
+def _consultar_duckdb(query, params=None):
+    # Cada consulta usa seu próprio cursor: a conexão base é compartilhada entre threads do Streamlit
+    with desempenho.medir('duckdb', 'sql') as medicao:
+        return desempenho.anotar(medicao, _conexao_duckdb().cursor().execute(query, params or []).df())
+
+def _where_duckdb(filtros):
+    inicio = pd.to_datetime(filtros['data_inicio'])
+    fim = pd.to_datetime(filtros['data_fim']) + pd.Timedelta(days=1)
+    condicoes = ["data_venda >= ?", "data_venda < ?"]
+    params = [inicio.to_pydatetime(), fim.to_pydatetime()]
+    if BACKEND == 'parquet':
+        # Filtro na coluna de partição: o DuckDB nem abre os arquivos de outros anos
+        condicoes.append("ano BETWEEN ? AND ?")
+        params.extend([inicio.year, fim.year])
+    for chave, coluna in (('formas_pagamento', 'forma_pagamento_nome'), ('clientes', 'cliente'), ('produtos', 'produto_nome')):
+        if filtros.get(chave):
+            condicoes.append(f"{coluna} IN ({','.join(['?'] * len(filtros[chave]))})")
+            params.extend(filtros[chave])
+    return " AND ".join(condicoes), params
+
+def _agregar_duckdb(dimensoes, metricas, filtros):
+    where, params = _where_duckdb(filtros)
+    colunas = [f"{DIMENSOES_DUCKDB[d]} as {d}" for d in dimensoes] + [f"{METRICAS_DUCKDB[m]} as {m}" for m in metricas]
+    query = f"SELECT {', '.join(colunas)} FROM vendas_completas WHERE {where}"
+    if dimensoes:
+        # GROUP BY ALL: os aliases 'ano'/'mes' colidiriam com as colunas de partição do Parquet
+        query += " GROUP BY ALL"
+    return _consultar_duckdb(query, params)
+
+def _carregar_duckdb(filtros):
+    where, params = _where_duckdb(filtros)
+    return _consultar_duckdb(f"SELECT {', '.join(COLUNAS_VENDAS)} FROM vendas_completas WHERE {where}", params)
+
+def _opcoes_filtro_duckdb():
+    formas_pagamento = _consultar_duckdb("SELECT DISTINCT forma_pagamento_nome as nome FROM vendas_completas ORDER BY nome")['nome'].tolist()
+    min_max_data = _consultar_duckdb("SELECT MIN(data_venda) as min_d, MAX(data_venda) as max_d FROM vendas_completas")
+    return formas_pagamento, min_max_data
+
+@st.cache_resource
+def _cache_vendas():
+    """Estado do cache de vendas, único no processo (compartilhado por todas as sessões)."""
+    return {
+        'frames': OrderedDict(), # chave do filtro -> (DataFrame, bytes), do menos para o mais recente
+        'sessoes': {}, # id da sessão -> (chave em uso, momento do último acesso)
+        'trava': threading.Lock(),
+    }
+
+def _id_sessao():
+    ctx = get_script_run_ctx()
+    return ctx.session_id if ctx else None
+
+def _liberar_memoria(cache):
+    """Descarta os DataFrames menos usados recentemente (e que nenhuma sessão segura) até caber no orçamento."""
+    agora = time.monotonic()
+    for sessao, (_, acesso) in list(cache['sessoes'].items()):
+        if agora - acesso >= VALIDADE_REFERENCIA_SEGUNDOS: # Sessão encerrada ou parada: solta a referência
+            del cache['sessoes'][sessao]
+    em_uso = {chave for chave, _ in cache['sessoes'].values()}
+    total = sum(tamanho for _, tamanho in cache['frames'].values())
+    for chave in list(cache['frames']):
+        if total <= ORCAMENTO_CACHE_MB * 1024 * 1024:
+            break
+        if chave not in em_uso:
+            total -= cache['frames'].pop(chave)[1]
+
+@cronometrado
 def carregar_dados_base(start_date, end_date, formas_pagamento_selecionadas=None, clientes_selecionados=None):
-    conn = sqlite3.connect(DB_NAME)
-    # Ajustar end_date para incluir o dia todo
-    end_date_sql = (pd.to_datetime(end_date) + pd.Timedelta(days=1) - pd.Timedelta(seconds=1)).strftime('%Y-%m-%d %H:%M:%S')
-    start_date_sql = pd.to_datetime(start_date).strftime('%Y-%m-%d %H:%M:%S')
+    """
+    Vendas linha a linha do período e filtros, em representação compacta (ver compactar_tipos).
+    Sessões com os mesmos filtros recebem o mesmo DataFrame (somente leitura: com o
+    copy-on-write do pandas, alterações nunca chegam ao objeto guardado no cache).
+    """
+    versao = versao_dados()
+    chave = (versao, str(start_date), str(end_date), tuple(sorted(formas_pagamento_selecionadas or [])), tuple(sorted(clientes_selecionados or [])))
+    cache = _cache_vendas()
+    _registrar_cache('carregar_dados_base', 'chamadas')
+    with cache['trava']:
+        encontrado = cache['frames'].get(chave)
+        if encontrado:
+            cache['frames'].move_to_end(chave)
+    if encontrado is None:
+        # Consulta fora da trava: uma carga lenta não bloqueia sessões que já estão no cache
+        _registrar_cache('carregar_dados_base', 'falhas')
+        df = _consultar_vendas(start_date, end_date, formas_pagamento_selecionadas, clientes_selecionados)
+        encontrado = (df, int(df.memory_usage(deep=True).sum()))
+    with cache['trava']:
+        for chave_antiga in [c for c in cache['frames'] if c[0] != versao]:
+            del cache['frames'][chave_antiga] # Dados de uma versão anterior do banco
+        encontrado = cache['frames'].setdefault(chave, encontrado)
+        cache['frames'].move_to_end(chave)
+        cache['sessoes'][_id_sessao()] = (chave, time.monotonic())
+        _liberar_memoria(cache)
+    return encontrado[0].copy(deep=False)
 
-    query = """
+def estatisticas_cache_vendas():
+    """Resumo do cache compartilhado de vendas: DataFrames guardados, memória e sessões."""
+    cache = _cache_vendas()
+    with cache['trava']:
+        memoria = sum(tamanho for _, tamanho in cache['frames'].values())
+        linhas = sum(len(df) for df, _ in cache['frames'].values())
+        return {
+            'entradas': len(cache['frames']),
+            'memoria_mb': memoria / (1024 * 1024),
+            'bytes_por_linha': memoria / linhas if linhas else 0,
+            'sessoes': len(cache['sessoes']),
+        }
+
+def limpar_cache_vendas():
+    cache = _cache_vendas()
+    with cache['trava']:
+        cache['frames'].clear()
+        cache['sessoes'].clear()
+
+_AUSENTE = object() # Chave fora do cache (None pode ser um resultado guardado)
+
+@st.cache_resource
+def _caches_consultas():
+    """LRUs das consultas (um por função), únicos no processo (compartilhados por todas as sessões)."""
+    return {'trava': threading.Lock(), 'lrus': {}}
+
+def _lru(nome, max_entradas):
+    caches = _caches_consultas()
+    with caches['trava']:
+        return caches['lrus'].setdefault(nome, {
+            'itens': OrderedDict(), # chave -> (valor, bytes, momento), do menos para o mais recente
+            'bytes': 0,
+            'max_entradas': max_entradas,
+            'trava': threading.Lock(),
+        })
+
+def _tamanho_em_bytes(valor):
+    """Memória de um resultado em cache: memory_usage(deep=True) dos DataFrames/Series que ele contém."""
+    if isinstance(valor, pd.DataFrame):
+        return int(valor.memory_usage(deep=True).sum())
+    if isinstance(valor, pd.Series):
+        return int(valor.memory_usage(deep=True))
+    if isinstance(valor, dict):
+        return sys.getsizeof(valor) + sum(_tamanho_em_bytes(v) for v in valor.values())
+    if isinstance(valor, (list, tuple)):
+        return sys.getsizeof(valor) + sum(_tamanho_em_bytes(v) for v in valor)
+    return sys.getsizeof(valor)
+
+def _lru_obter(lru, chave, ttl=None):
+    """Valor guardado em chave (ou _AUSENTE), marcado como o mais recente."""
+    with lru['trava']:
+        item = lru['itens'].get(chave)
+        if item is None:
+            return _AUSENTE
+        if ttl is not None and time.monotonic() - item[2] > ttl:
+            lru['bytes'] -= lru['itens'].pop(chave)[1]
+            return _AUSENTE
+        lru['itens'].move_to_end(chave)
+        return item[0]
+
+def _lru_guardar(lru, chave, valor):
+    """Guarda valor e descarta os menos usados recentemente até caber em ORCAMENTO_CACHE_CONSULTAS_MB e max_entradas."""
+    tamanho = _tamanho_em_bytes(valor)
+    orcamento = ORCAMENTO_CACHE_CONSULTAS_MB * 1024 * 1024
+    with lru['trava']:
+        if chave in lru['itens']:
+            lru['bytes'] -= lru['itens'].pop(chave)[1]
+        if tamanho > orcamento: # Sozinho já estouraria o orçamento: não fica em cache
+            return
+        lru['itens'][chave] = (valor, tamanho, time.monotonic())
+        lru['bytes'] += tamanho
+        while lru['bytes'] > orcamento or len(lru['itens']) > lru['max_entradas']:
+            lru['bytes'] -= lru['itens'].popitem(last=False)[1][1]
+
+def _lru_descartar(lru, condicao):
+    """Remove as entradas cuja chave satisfaz condicao (ex: de uma versão anterior dos dados)."""
+    with lru['trava']:
+        for chave in [c for c in lru['itens'] if condicao(c)]:
+            lru['bytes'] -= lru['itens'].pop(chave)[1]
+
+def _chave_hashavel(valor):
+    if isinstance(valor, dict):
+        return tuple((chave, _chave_hashavel(v)) for chave, v in sorted(valor.items()))
+    if isinstance(valor, (list, tuple)):
+        return tuple(_chave_hashavel(v) for v in valor)
+    return valor
+
+def _copia_rasa(valor):
+    """Cópia rasa de um resultado em cache: com o copy-on-write do pandas, alterá-la não altera o cache."""
+    if isinstance(valor, (pd.DataFrame, pd.Series)):
+        return valor.copy(deep=False)
+    if isinstance(valor, dict):
+        return {chave: _copia_rasa(v) for chave, v in valor.items()}
+    if isinstance(valor, (list, tuple)):
+        return type(valor)(_copia_rasa(v) for v in valor)
+    return valor
+
+def _cache_consulta(nome):
+    """
+    Cache de resultados compartilhado entre as sessões, no lugar do st.cache_data (que só
+    limita o número de entradas): expira em CACHE_TTL_SEGUNDOS e descarta os resultados
+    menos usados recentemente além de CACHE_MAX_ENTRADAS ou de ORCAMENTO_CACHE_CONSULTAS_MB.
+    """
+    def decorador(funcao):
+        @functools.wraps(funcao)
+        def com_cache(*args):
+            lru = _lru(nome, CACHE_MAX_ENTRADAS)
+            chave = _chave_hashavel(args)
+            valor = _lru_obter(lru, chave, CACHE_TTL_SEGUNDOS)
+            if valor is _AUSENTE:
+                # Consulta fora da trava: uma consulta lenta não bloqueia as demais
+                valor = funcao(*args)
+                _lru_guardar(lru, chave, valor)
+            return _copia_rasa(valor)
+        return com_cache
+    return decorador
+
+def _consultar_vendas(start_date, end_date, formas_pagamento_selecionadas, clientes_selecionados):
+    if MOTOR == 'duckdb':
+        df = _carregar_duckdb(montar_filtros(start_date, end_date, formas_pagamento_selecionadas, clientes_selecionados))
+    elif BACKEND == 'parquet':
+        df = _ler_parquet(COLUNAS_VENDAS, montar_filtros(start_date, end_date, formas_pagamento_selecionadas, clientes_selecionados))
+    else:
+        df = _carregar_sqlite(start_date, end_date, formas_pagamento_selecionadas, clientes_selecionados)
+    with desempenho.medir('colunas derivadas e tipos compactos', 'pandas'):
+        return compactar_tipos(adicionar_colunas_derivadas(df))
+
+def _carregar_sqlite(start_date, end_date, formas_pagamento_selecionadas, clientes_selecionados):
+    partes = _partes(montar_filtros(start_date, end_date, formas_pagamento_selecionadas, clientes_selecionados))
+    if len(partes) == 1:
+        return _consultar_partes(_ler_vendas, partes)[0]
+    with desempenho.medir(f"vendas ({len(partes)} partes em paralelo)", 'sql') as medicao:
+        return desempenho.anotar(medicao, _concatenar(_consultar_partes(_ler_vendas, partes)))
+
+def _ler_vendas(conn, filtros):
+    """Vendas linha a linha de uma fonte (acai.db ou partição), com data_venda já em datetime."""
+    formas_pagamento_selecionadas, clientes_selecionados = filtros['formas_pagamento'], filtros['clientes']
+    filtro_periodo, params = _filtro_periodo(conn, filtros['data_inicio'], filtros['data_fim'])
+    # Bancos ainda não migrados não têm as colunas de calendário: calculadas depois, em adicionar_colunas_derivadas
+    migrado = _coluna_existe(conn, 'vendas', 'ano_mes')
+    usar_epoch = _coluna_existe(conn, 'vendas', 'data_venda_epoch')
+    colunas_calendario = ", v.hora as hora_venda, v.dia_semana as dia_semana_venda, v.ano_mes as ano_mes_venda" if migrado else ""
+    # O inteiro vira datetime sem interpretar texto (o texto custa ~50x mais em to_datetime)
+    coluna_data = "v.data_venda_epoch as data_venda" if usar_epoch else "v.data_venda"
+
+    query = f"""
         SELECT
-            v.id as venda_id, v.data_venda, v.cliente, v.quantidade, v.preco_unitario, v.valor_total,
+            v.id as venda_id, {coluna_data}, v.cliente, v.quantidade, v.preco_unitario, v.valor_total,
             p.nome as produto_nome,
             c.nome as categoria_nome,
-            fp.nome as forma_pagamento_nome
+            fp.nome as forma_pagamento_nome{colunas_calendario}
         FROM vendas v
         JOIN produtos p ON v.produto_id = p.id
         JOIN categorias c ON p.categoria_id = c.id
         JOIN formas_pagamento fp ON v.forma_pagamento_id = fp.id
-        WHERE v.data_venda BETWEEN ? AND ?
+        WHERE {filtro_periodo}
     """
-    params = [start_date_sql, end_date_sql]
 
     if formas_pagamento_selecionadas:
         placeholders = ','.join(['?'] * len(formas_pagamento_selecionadas))
@@ -36,28 +646,559 @@ def carregar_dados_base(start_date, end_date, formas_pagamento_selecionadas=None
         query += f" AND v.cliente IN ({placeholders})"
         params.extend(clientes_selecionados)
 
-    df = pd.read_sql_query(query, conn, params=params)
-    conn.close()
-    if not df.empty:
-        df['data_venda'] = pd.to_datetime(df['data_venda'])
+    with desempenho.medir('vendas', 'sql') as medicao:
+        df = desempenho.anotar(medicao, pd.read_sql_query(query, conn, params=params))
+    with desempenho.medir('data_venda (epoch)' if usar_epoch else 'data_venda (to_datetime)', 'pandas'):
+        df['data_venda'] = _epoch_para_datetime(df['data_venda']) if usar_epoch else pd.to_datetime(df['data_venda'])
     return df
 
-@st.cache_data
+@cronometrado
 def obter_opcoes_filtro():
-    conn = sqlite3.connect(DB_NAME)
-    formas_pagamento = pd.read_sql_query("SELECT DISTINCT nome FROM formas_pagamento ORDER BY nome", conn)['nome'].tolist()
-    clientes = pd.read_sql_query("SELECT DISTINCT cliente FROM vendas ORDER BY cliente", conn)['cliente'].tolist()
-    min_max_data = pd.read_sql_query("SELECT MIN(data_venda) as min_d, MAX(data_venda) as max_d FROM vendas", conn)
-    conn.close()
-    min_date = pd.to_datetime(min_max_data['min_d'][0]) if not min_max_data.empty and min_max_data['min_d'][0] else datetime.now() - timedelta(days=30)
-    max_date = pd.to_datetime(min_max_data['max_d'][0]) if not min_max_data.empty and min_max_data['max_d'][0] else datetime.now()
-    return formas_pagamento, clientes, min_date, max_date
+    """Formas de pagamento e datas mínima/máxima para os filtros. Clientes: ver buscar_clientes."""
+    _registrar_cache('obter_opcoes_filtro', 'chamadas')
+    return _obter_opcoes_filtro(versao_dados())
+
+@_cache_consulta('obter_opcoes_filtro')
+def _obter_opcoes_filtro(versao):
+    _registrar_cache('obter_opcoes_filtro', 'falhas')
+    if MOTOR == 'duckdb':
+        formas_pagamento, min_max_data = _opcoes_filtro_duckdb()
+    else:
+        with _conexao_leitura() as conn, desempenho.medir('opções de filtro', 'sql'):
+            formas_pagamento = pd.read_sql_query("SELECT DISTINCT nome FROM formas_pagamento ORDER BY nome", conn)['nome'].tolist()
+            if _tabela_existe(conn, 'metadados'):
+                # Limites mantidos pelo setup_database.py a cada carga (sem varrer 'vendas')
+                min_max_data = pd.read_sql_query("""
+                    SELECT MAX(CASE WHEN chave = 'data_venda_min' THEN valor END) as min_d,
+                           MAX(CASE WHEN chave = 'data_venda_max' THEN valor END) as max_d
+                    FROM metadados WHERE chave IN ('data_venda_min', 'data_venda_max')
+                """, conn)
+            else:
+                min_max_data = pd.read_sql_query("SELECT MIN(data_venda) as min_d, MAX(data_venda) as max_d FROM vendas", conn)
+    min_date = pd.to_datetime(min_max_data['min_d'][0]) if not min_max_data.empty and pd.notna(min_max_data['min_d'][0]) else datetime.now() - timedelta(days=30)
+    max_date = pd.to_datetime(min_max_data['max_d'][0]) if not min_max_data.empty and pd.notna(min_max_data['max_d'][0]) else datetime.now()
+    return formas_pagamento, min_date, max_date
+
+@cronometrado
+def buscar_clientes(prefixo='', limite=LIMITE_BUSCA_CLIENTES):
+    """
+    Até 'limite' clientes cujo nome começa com 'prefixo' (sem diferenciar maiúsculas),
+    em ordem alfabética. A busca roda no banco, sobre a dimensão de clientes.
+    """
+    _registrar_cache('buscar_clientes', 'chamadas')
+    return _buscar_clientes(prefixo.strip(), limite, versao_dados())
+
+@_cache_consulta('buscar_clientes')
+def _buscar_clientes(prefixo, limite, versao):
+    _registrar_cache('buscar_clientes', 'falhas')
+    if MOTOR == 'duckdb':
+        return _consultar_duckdb(
+            "SELECT DISTINCT cliente FROM vendas_completas WHERE starts_with(lower(cliente), lower(?)) ORDER BY cliente LIMIT ?",
+            [prefixo, limite])['cliente'].tolist()
+    with _conexao_leitura() as conn:
+        if _tabela_existe(conn, 'clientes'):
+            # Intervalo sobre idx_clientes_nome_nocase: lê só os nomes com o prefixo
+            query = """
+                SELECT nome FROM clientes
+                WHERE nome COLLATE NOCASE >= ? AND nome COLLATE NOCASE < ?
+                ORDER BY nome COLLATE NOCASE LIMIT ?
+            """
+            params = [prefixo, prefixo + '\U0010ffff', limite]
+        else:
+            query = "SELECT DISTINCT cliente FROM vendas WHERE substr(cliente, 1, ?) = ? COLLATE NOCASE ORDER BY cliente LIMIT ?"
+            params = [len(prefixo), prefixo, limite]
+        with desempenho.medir('clientes por prefixo', 'sql') as medicao:
+            return desempenho.anotar(medicao, [linha[0] for linha in conn.execute(query, params)])
 
 def adicionar_colunas_derivadas(df):
-    if df is None or df.empty:
-        return pd.DataFrame() # Retorna DAtaframe vazio se o input for None ou vazio
-    df_copy = df.copy()
-    df_copy['hora_venda'] = df_copy['data_venda'].dt.hour
-    df_copy['dia_semana_venda'] = df_copy['data_venda'].dt.day_name()
-    df_copy['mes_ano_venda'] = df_copy['data_venda'].dt.to_period('M').astype(str)
-    return df_copy
\ No newline at end of file
+    """
+    Garante as colunas de calendário inteiras das vendas (hora_venda, dia_semana_venda
+    e ano_mes_venda). Elas já vêm gravadas do banco/Parquet; só são calculadas aqui,
+    de forma vetorizada e sem copiar o DataFrame, para bancos ainda não migrados.
+    """
+    if df is None:
+        return pd.DataFrame() # Retorna DataFrame vazio se o input for None
+    calculadas = {
+        'hora_venda': lambda datas: datas.hour,
+        'dia_semana_venda': lambda datas: datas.dayofweek,
+        'ano_mes_venda': lambda datas: datas.year * 100 + datas.month,
+    }
+    for coluna, calcular in calculadas.items():
+        if coluna not in df:
+            df[coluna] = calcular(df['data_venda'].dt)
+    return df.astype(TIPOS_COLUNAS_CALENDARIO)
+
+def compactar_tipos(df):
+    """
+    Reduz a memória das vendas: textos repetidos como 'category', inteiros no menor
+    tipo que comporta os valores e valores monetários em float32.
+    """
+    tipos = {coluna: 'float32' for coluna in ('preco_unitario', 'valor_total') if coluna in df}
+    for coluna in COLUNAS_CATEGORICAS:
+        # 'category' só compensa quando os valores se repetem (ex: cliente com poucas compras no período)
+        if coluna in df and df[coluna].nunique() <= len(df) // 2:
+            tipos[coluna] = 'category'
+    df = df.astype(tipos)
+    for coluna in ('venda_id', 'quantidade'):
+        if coluna in df:
+            df[coluna] = pd.to_numeric(df[coluna], downcast='integer')
+    return df
+
+def rotulos_mes_ano(ano_mes):
+    """Converte uma Series de meses AAAAMM (inteiros) em rótulos 'AAAA-MM', formatando cada mês uma única vez."""
+    return ano_mes.map({k: f"{k // 100}-{k % 100:02d}" for k in ano_mes.unique()})
+
+# Dimensões e métricas aceitas por agregar(): nome da coluna -> expressão SQL.
+# Sobre a tabela de vendas ('v') e sobre a tabela de resumo ('r'), quando o resumo consegue responder.
+DIMENSOES_SQL = {
+    'produto_nome': 'p.nome',
+    'categoria_nome': 'c.nome',
+    'forma_pagamento_nome': 'fp.nome',
+    'cliente': 'v.cliente',
+    'dia': 'date(v.data_venda)',
+    'hora': "CAST(strftime('%H', v.data_venda) AS INTEGER)",
+    'dia_semana': "(CAST(strftime('%w', v.data_venda) AS INTEGER) + 6) % 7", # 0 = segunda
+    'mes': "CAST(strftime('%m', v.data_venda) AS INTEGER)",
+    'ano': "CAST(strftime('%Y', v.data_venda) AS INTEGER)",
+    'mes_ano': "CAST(strftime('%Y%m', v.data_venda) AS INTEGER)", # AAAAMM, rotulado em agregar()
+}
+# Em bancos migrados as colunas de calendário já estão gravadas em 'vendas'
+DIMENSOES_SQL_CALENDARIO = {
+    **DIMENSOES_SQL,
+    'dia': 'v.data_venda_epoch - v.data_venda_epoch % 86400', # meia-noite do dia, em epoch; convertido em agregar()
+    'hora': 'v.hora',
+    'dia_semana': 'v.dia_semana',
+    'mes': 'v.ano_mes % 100',
+    'ano': 'v.ano_mes / 100',
+    'mes_ano': 'v.ano_mes',
+}
+DIMENSOES_SQL_RESUMO = {
+    'produto_nome': 'p.nome',
+    'categoria_nome': 'c.nome',
+    'forma_pagamento_nome': 'fp.nome',
+    'dia': 'r.dia',
+    'hora': 'r.hora',
+    'dia_semana': "(CAST(strftime('%w', r.dia) AS INTEGER) + 6) % 7",
+    'mes': "CAST(strftime('%m', r.dia) AS INTEGER)",
+    'ano': "CAST(strftime('%Y', r.dia) AS INTEGER)",
+    'mes_ano': "CAST(strftime('%Y%m', r.dia) AS INTEGER)",
+}
+METRICAS_SQL = {
+    'valor_total': 'SUM(v.valor_total)',
+    'quantidade': 'SUM(v.quantidade)',
+    'num_vendas': 'COUNT(*)', # Cada venda (venda_id) é uma transação
+    'clientes_unicos': 'COUNT(DISTINCT v.cliente)',
+}
+METRICAS_SQL_RESUMO = {
+    'valor_total': 'SUM(r.valor_total)',
+    'quantidade': 'SUM(r.quantidade)',
+    'num_vendas': 'SUM(r.num_vendas)',
+}
+
+def montar_filtros(data_inicio, data_fim, formas_pagamento=None, clientes=None, produtos=None):
+    """Filtros no formato esperado por agregar() e carregar_resumo()."""
+    return {
+        'data_inicio': data_inicio,
+        'data_fim': data_fim,
+        'formas_pagamento': list(formas_pagamento or []),
+        'clientes': list(clientes or []),
+        'produtos': list(produtos or []),
+    }
+
+def _sql_agregacao(conn, dimensoes, metricas, filtros):
+    """Monta (sql, parâmetros) do GROUP BY, lendo do resumo diário sempre que ele basta."""
+    usar_resumo = (
+        not filtros.get('clientes')
+        and all(d in DIMENSOES_SQL_RESUMO for d in dimensoes)
+        and all(m in METRICAS_SQL_RESUMO for m in metricas)
+        and _tabela_existe(conn, 'vendas_resumo_diario')
+    )
+    if usar_resumo:
+        dimensoes_sql, metricas_sql = DIMENSOES_SQL_RESUMO, METRICAS_SQL_RESUMO
+        origem = "vendas_resumo_diario r JOIN produtos p ON r.produto_id = p.id"
+        filtro_periodo = "r.dia BETWEEN ? AND ?"
+        params = [pd.to_datetime(filtros['data_inicio']).strftime('%Y-%m-%d'), pd.to_datetime(filtros['data_fim']).strftime('%Y-%m-%d')]
+        coluna_fp = "r.forma_pagamento_id"
+    else:
+        dimensoes_sql = DIMENSOES_SQL_CALENDARIO if _coluna_existe(conn, 'vendas', 'ano_mes') else DIMENSOES_SQL
+        metricas_sql = METRICAS_SQL
+        origem = "vendas v JOIN produtos p ON v.produto_id = p.id"
+        filtro_periodo, params = _filtro_periodo(conn, filtros['data_inicio'], filtros['data_fim'])
+        coluna_fp = "v.forma_pagamento_id"
+
+    colunas = [f"{dimensoes_sql[d]} as {d}" for d in dimensoes] + [f"{metricas_sql[m]} as {m}" for m in metricas]
+    query = f"""
+        SELECT {', '.join(colunas)}
+        FROM {origem}
+        JOIN categorias c ON p.categoria_id = c.id
+        JOIN formas_pagamento fp ON {coluna_fp} = fp.id
+        WHERE {filtro_periodo}
+    """
+    for chave, coluna in (('formas_pagamento', 'fp.nome'), ('clientes', 'v.cliente'), ('produtos', 'p.nome')):
+        if filtros.get(chave):
+            placeholders = ','.join(['?'] * len(filtros[chave]))
+            query += f" AND {coluna} IN ({placeholders})"
+            params.extend(filtros[chave])
+    if dimensoes:
+        query += f" GROUP BY {', '.join(dimensoes)}"
+    return query, params
+
+def _agregar_dataframe(df, dimensoes, metricas):
+    """Mesma semântica de agregar(), calculada em pandas sobre vendas linha a linha."""
+    calculadas = {
+        'dia': lambda: df['data_venda'].dt.normalize(),
+        'hora': lambda: df['hora_venda'],
+        'dia_semana': lambda: df['dia_semana_venda'],
+        'mes': lambda: df['ano_mes_venda'] % 100,
+        'ano': lambda: df['ano_mes_venda'] // 100,
+        'mes_ano': lambda: df['ano_mes_venda'],
+    }
+    base = pd.DataFrame({d: calculadas[d]() if d in calculadas else df[d] for d in dimensoes}, index=df.index)
+    especificacoes = {
+        'valor_total': ('valor_total', 'sum'),
+        'quantidade': ('quantidade', 'sum'),
+        'num_vendas': ('valor_total', 'size'),
+        'clientes_unicos': ('cliente', 'nunique'),
+    }
+    for coluna in {especificacoes[m][0] for m in metricas}:
+        base[coluna] = df[coluna]
+    agregacoes = {m: especificacoes[m] for m in metricas}
+    if dimensoes:
+        resultado = base.groupby(dimensoes, observed=True).agg(**agregacoes).reset_index()
+    elif base.empty:
+        resultado = pd.DataFrame(columns=metricas)
+    else:
+        resultado = base.assign(_total=0).groupby('_total').agg(**agregacoes).reset_index(drop=True)
+    return resultado
+
+# Coluna do Parquet de onde sai cada dimensão de calendário
+COLUNAS_PARQUET_CALENDARIO = {'dia': 'data_venda', 'hora': 'hora_venda', 'dia_semana': 'dia_semana_venda',
+                              'mes': 'ano_mes_venda', 'ano': 'ano_mes_venda', 'mes_ano': 'ano_mes_venda'}
+
+def _agregar_parquet(dimensoes, metricas, filtros):
+    colunas = {COLUNAS_PARQUET_CALENDARIO.get(d, d) for d in dimensoes}
+    colunas |= {'valor_total' if m in ('valor_total', 'num_vendas') else 'cliente' if m == 'clientes_unicos' else m for m in metricas}
+    df = _ler_parquet(sorted(colunas), filtros)
+    with desempenho.medir('agregação em pandas', 'pandas'):
+        return _agregar_dataframe(df, dimensoes, metricas)
+
+@cronometrado
+def agregar(dimensoes, metricas, filtros):
+    """
+    Agrega as vendas no banco (GROUP BY) e retorna só o resultado: uma linha por
+    combinação de dimensoes, com uma coluna por métrica. Sem dimensões, retorna
+    uma linha com os totais.
+    Ex: agregar(['forma_pagamento_nome'], ['valor_total', 'num_vendas'], filtros)
+    """
+    desconhecidas = [d for d in dimensoes if d not in DIMENSOES_SQL] + [m for m in metricas if m not in METRICAS_SQL]
+    if desconhecidas:
+        raise ValueError(f"Dimensões/métricas não suportadas: {desconhecidas}")
+    if 'dia' in dimensoes:
+        # Cada grupo pertence a um único dia: o resultado pode ser montado com blocos mensais já em cache
+        return _agregar_por_blocos(dimensoes, metricas, filtros, versao_dados())
+    _registrar_cache('agregar', 'chamadas')
+    return _agregar(dimensoes, metricas, filtros, versao_dados())
+
+@_cache_consulta('agregar')
+def _agregar(dimensoes, metricas, filtros, versao):
+    _registrar_cache('agregar', 'falhas')
+    return _executar_agregacao(dimensoes, metricas, filtros)
+
+def _cache_blocos():
+    """Blocos mensais de agregações por dia, compartilhados entre as sessões (LRU)."""
+    return _lru('agregar (blocos mensais)', CACHE_MAX_BLOCOS)
+
+def _agregar_por_blocos(dimensoes, metricas, filtros, versao):
+    """
+    agregar() para agrupamentos que incluem 'dia': guarda o resultado em blocos de um
+    mês e responde qualquer intervalo juntando os blocos em cache, consultando só os
+    meses que faltam. Mover a data de início/fim dentro de meses já vistos não consulta o banco.
+    Cada bloco vale para a versão do seu mês (versoes_meses): uma carga que só traz
+    vendas de hoje invalida apenas o bloco do mês corrente.
+    """
+    inicio = pd.to_datetime(filtros['data_inicio']).normalize()
+    fim = pd.to_datetime(filtros['data_fim']).normalize()
+    outros_filtros = tuple((chave, tuple(valor)) for chave, valor in sorted(filtros.items()) if chave not in ('data_inicio', 'data_fim'))
+    base = (tuple(dimensoes), tuple(metricas), outros_filtros)
+    meses = list(pd.period_range(inicio, fim, freq='M'))
+    if not meses:
+        return _executar_agregacao(dimensoes, metricas, filtros)
+    versoes = versoes_meses()
+    chaves = {mes: base + (mes, _versao_do_mes(versoes, mes, versao)) for mes in meses}
+    cache = _cache_blocos()
+    encontrados = {mes: _lru_obter(cache, chaves[mes]) for mes in meses}
+    encontrados = {mes: bloco for mes, bloco in encontrados.items() if bloco is not _AUSENTE}
+    faltando = [mes for mes in meses if mes not in encontrados]
+    _registrar_cache('agregar (blocos mensais)', 'chamadas', len(meses))
+    _registrar_cache('agregar (blocos mensais)', 'falhas', len(faltando))
+
+    # Meses consecutivos que faltam são buscados em uma única consulta e separados por mês
+    sequencias = []
+    for mes in faltando:
+        if sequencias and sequencias[-1][-1] + 1 == mes:
+            sequencias[-1].append(mes)
+        else:
+            sequencias.append([mes])
+    novos = {}
+    for sequencia in sequencias:
+        filtros_sequencia = {**filtros, 'data_inicio': sequencia[0].start_time.date(), 'data_fim': sequencia[-1].end_time.date()}
+        df = _executar_agregacao(dimensoes, metricas, filtros_sequencia)
+        mes_da_linha = df['dia'].dt.to_period('M')
+        for mes in sequencia:
+            novos[mes] = df[mes_da_linha == mes].reset_index(drop=True)
+    if novos:
+        # Blocos de uma versão anterior do seu mês (chave: ..., mês, versão)
+        _lru_descartar(cache, lambda c: c[-1] != _versao_do_mes(versoes, c[-2], versao))
+        for mes, bloco in novos.items():
+            _lru_guardar(cache, chaves[mes], bloco)
+
+    blocos = [encontrados.get(mes, novos.get(mes)) for mes in meses]
+    com_dados = [bloco for bloco in blocos if not bloco.empty]
+    if not com_dados:
+        return blocos[0].copy()
+    df = pd.concat(com_dados, ignore_index=True) if len(com_dados) > 1 else com_dados[0]
+    # Os blocos das pontas cobrem o mês inteiro: recorta o intervalo pedido
+    return df[(df['dia'] >= inicio) & (df['dia'] <= fim)].reset_index(drop=True)
+
+def _cache_particoes():
+    """
+    Agregações de cada partição (LRU, compartilhado entre as sessões). Não expira: o
+    arquivo de uma partição nunca muda, e uma nova versão do mês tem outro caminho.
+    """
+    return _lru('agregar (partições)', CACHE_MAX_BLOCOS)
+
+def _agregar_particionado(dimensoes, metricas, filtros):
+    """
+    agregar() com ACAI_BACKEND=particionado: agrega cada parte do período (_partes) em
+    paralelo e junta os resultados. Partições já agregadas com os mesmos filtros vêm do
+    cache; só as demais, e os meses lidos do acai.db, são consultadas.
+    """
+    # Clientes únicos não se somam entre meses: cada parte devolve os pares (grupo, cliente)
+    contar_clientes = 'clientes_unicos' in metricas
+    metricas_parte = [m for m in metricas if m != 'clientes_unicos']
+    dimensoes_parte = list(dimensoes) + (['cliente'] if contar_clientes and 'cliente' not in dimensoes else [])
+    partes = _partes(filtros)
+    chaves = [(caminho, tuple(dimensoes_parte), tuple(metricas_parte),
+               tuple((chave, tuple(valor) if isinstance(valor, list) else valor) for chave, valor in sorted(filtros_parte.items())))
+              for caminho, filtros_parte in partes]
+    cache = _cache_particoes()
+    encontrados = {i: _lru_obter(cache, chave) for i, chave in enumerate(chaves)}
+    encontrados = {i: df for i, df in encontrados.items() if df is not _AUSENTE}
+    faltando = [i for i in range(len(partes)) if i not in encontrados]
+    particoes = sum(caminho is not None for caminho, _ in partes)
+    _registrar_cache('agregar (partições)', 'chamadas', particoes)
+    _registrar_cache('agregar (partições)', 'falhas', sum(partes[i][0] is not None for i in faltando))
+
+    def consulta(conn, filtros_parte):
+        query, params = _sql_agregacao(conn, dimensoes_parte, metricas_parte, filtros_parte)
+        return pd.read_sql_query(query, conn, params=params)
+    with desempenho.medir(f"agregação por {', '.join(dimensoes) or 'total'} ({len(faltando)} de {len(partes)} partes)", 'sql') as medicao:
+        novos = dict(zip(faltando, _consultar_partes(consulta, [partes[i] for i in faltando])))
+        medicao['linhas'] = sum(len(df) for df in novos.values())
+    for i, df in novos.items():
+        if partes[i][0] is not None: # O acai.db muda a cada carga: só partições ficam em cache
+            _lru_guardar(cache, chaves[i], df)
+    resultados = [encontrados[i] if i in encontrados else novos[i] for i in range(len(partes))]
+    if len(resultados) == 1 and not contar_clientes:
+        return resultados[0]
+    with desempenho.medir('junção das partes', 'pandas'):
+        return _juntar_partes(resultados, dimensoes, metricas)
+
+def _juntar_partes(resultados, dimensoes, metricas):
+    """Soma os grupos que aparecem em mais de uma parte e conta os clientes únicos sobre os pares (grupo, cliente)."""
+    metricas_soma = [m for m in metricas if m != 'clientes_unicos']
+    if not dimensoes and 'clientes_unicos' not in metricas:
+        # Sem GROUP BY cada parte retorna uma linha; partes sem vendas vêm com os SUMs nulos
+        resultados = [df[df[metricas_soma].notna().all(axis=1)] for df in resultados]
+    df = _concatenar(resultados)
+    agregacoes = {m: (m, 'sum') for m in metricas_soma}
+    if 'clientes_unicos' in metricas and 'cliente' not in dimensoes:
+        agregacoes['clientes_unicos'] = ('cliente', 'nunique')
+    if df.empty:
+        return pd.DataFrame(columns=list(dimensoes) + list(metricas))
+    if not agregacoes:
+        resultado = df[list(dimensoes)].drop_duplicates().reset_index(drop=True)
+    elif dimensoes:
+        resultado = df.groupby(list(dimensoes), as_index=False).agg(**agregacoes)
+    else:
+        resultado = df.assign(_total=0).groupby('_total').agg(**agregacoes).reset_index(drop=True)
+    if 'clientes_unicos' in metricas and 'cliente' in dimensoes:
+        resultado['clientes_unicos'] = 1 # Cada grupo é um único cliente
+    return resultado[list(dimensoes) + list(metricas)]
+
+def _executar_agregacao(dimensoes, metricas, filtros):
+    if MOTOR == 'duckdb':
+        df = _agregar_duckdb(dimensoes, metricas, filtros)
+    elif BACKEND == 'parquet':
+        df = _agregar_parquet(dimensoes, metricas, filtros)
+    elif BACKEND == 'particionado':
+        df = _agregar_particionado(dimensoes, metricas, filtros)
+    else:
+        with _conexao_leitura() as conn:
+            query, params = _sql_agregacao(conn, dimensoes, metricas, filtros)
+            with desempenho.medir(f"agregação por {', '.join(dimensoes) or 'total'}", 'sql') as medicao:
+                df = desempenho.anotar(medicao, pd.read_sql_query(query, conn, params=params))
+    if not dimensoes and df[metricas].isna().to_numpy().any():
+        # Sem GROUP BY o SQL sempre retorna uma linha; sem vendas no filtro os SUMs vêm nulos
+        df = df.iloc[0:0]
+    if 'dia' in df.columns:
+        df['dia'] = _epoch_para_datetime(df['dia']) if pd.api.types.is_integer_dtype(df['dia']) else pd.to_datetime(df['dia'])
+    if 'mes_ano' in df.columns:
+        df['mes_ano'] = rotulos_mes_ano(df['mes_ano'])
+    return df
+
+@cronometrado
+def carregar_resumo(filtros):
+    """
+    Retorna as vendas agregadas no grão dia x hora x produto x forma de pagamento,
+    com as colunas quantidade, valor_total e num_vendas (mais colunas de calendário).
+    Vem da tabela de resumo mantida pelo setup_database.py, exceto com filtro de
+    cliente (o resumo não guarda clientes), quando agrega a tabela 'vendas'.
+    """
+    df = agregar(['dia', 'hora', 'produto_nome', 'categoria_nome', 'forma_pagamento_nome'],
+                 ['quantidade', 'valor_total', 'num_vendas'], filtros)
+    if not df.empty:
+        # Colunas de calendário inteiras sobre o resumo (poucas linhas); texto só por mês distinto
+        with desempenho.medir('colunas de calendário', 'pandas'):
+            df['dia_semana'] = df['dia'].dt.dayofweek
+            df['mes'] = df['dia'].dt.month
+            df['ano'] = df['dia'].dt.year
+            df['mes_ano'] = rotulos_mes_ano(df['ano'] * 100 + df['mes'])
+    return df
+
+def calcular_kpis(df_resumo):
+    """Calcula os KPIs da visão geral a partir do DataFrame de carregar_resumo."""
+    total_vendas_valor = df_resumo['valor_total'].sum()
+    num_transacoes = df_resumo['num_vendas'].sum()
+    return {
+        'total_vendas_valor': total_vendas_valor,
+        'num_transacoes': num_transacoes,
+        'ticket_medio': total_vendas_valor / num_transacoes if num_transacoes > 0 else 0,
+        'quantidade_vendida': df_resumo['quantidade'].sum(),
+    }
+
+# Fatias do cubo de carregar_cubo(): nome -> dimensões (todas com quantidade, valor_total e num_vendas)
+FATIAS_CUBO = {
+    'produto_nome': ['produto_nome'],
+    'categoria_nome': ['categoria_nome'],
+    'forma_pagamento_nome': ['forma_pagamento_nome'],
+    'dia': ['dia'],
+    'hora': ['hora'],
+    'dia_semana': ['dia_semana'],
+    'mes_ano': ['mes_ano'],
+    'ano': ['ano'],
+    'ano_mes': ['ano', 'mes'],
+}
+
+@cronometrado
+def carregar_cubo(filtros):
+    """
+    Agregados de um conjunto de filtros, calculados uma vez e lidos por todas as páginas.
+    Retorna um dicionário com uma fatia por entrada de FATIAS_CUBO (DataFrames
+    indexados pelas dimensões, com quantidade, valor_total e num_vendas) e 'totais'
+    (KPIs do período). Clientes ficam em carregar_clientes e contar_clientes_unicos.
+    """
+    _registrar_cache('carregar_cubo', 'chamadas')
+    return _carregar_cubo(filtros, versao_dados())
+
+@_cache_consulta('carregar_cubo')
+def _carregar_cubo(filtros, versao):
+    _registrar_cache('carregar_cubo', 'falhas')
+    metricas = ['quantidade', 'valor_total', 'num_vendas']
+    # Uma consulta no grão do resumo (dia x hora x produto x pagamento) alimenta todas as fatias sem cliente
+    df_resumo = carregar_resumo(filtros)
+    with desempenho.medir('fatias do cubo', 'pandas'):
+        cubo = {
+            nome: df_resumo.groupby(dimensoes)[metricas].sum() if not df_resumo.empty
+            else pd.DataFrame(columns=dimensoes + metricas).set_index(dimensoes)
+            for nome, dimensoes in FATIAS_CUBO.items()
+        }
+        cubo['totais'] = calcular_kpis(df_resumo)
+    return cubo
+
+@cronometrado
+def carregar_kpis_dia(dia=None):
+    """
+    KPIs de um único dia (padrão: o último dia com vendas, que durante a ingestão
+    contínua é hoje), sem os filtros da barra lateral. Lê só o resumo e os esboços
+    de clientes desse dia, então o painel ao vivo da visão geral pode ser relido a
+    cada poucos segundos sem consultar o período inteiro.
+    """
+    if dia is None:
+        _, _, ultimo_dia = obter_opcoes_filtro()
+        dia = ultimo_dia.date()
+    filtros = montar_filtros(dia, dia)
+    kpis = calcular_kpis(agregar([], ['quantidade', 'valor_total', 'num_vendas'], filtros))
+    kpis['clientes_unicos'] = contar_clientes_unicos(filtros)
+    kpis['dia'] = dia
+    return kpis
+
+@cronometrado
+def carregar_clientes(filtros):
+    """Vendas agregadas por cliente (índice 'cliente'; quantidade, valor_total e num_vendas)."""
+    # Clientes não estão no resumo: consulta própria, feita só pelas páginas que listam clientes
+    df = agregar(['cliente'], ['quantidade', 'valor_total', 'num_vendas'], filtros)
+    return df.set_index('cliente')
+
+@cronometrado
+def contar_clientes_unicos(filtros, por=None, exato=None):
+    """
+    Clientes únicos do período: um inteiro ou, com por='forma_pagamento_nome', uma
+    Series por forma de pagamento. exato=None segue ACAI_CLIENTES_UNICOS. No modo
+    aproximado e sem filtro de cliente/produto, une os esboços HyperLogLog de cada
+    dia x forma de pagamento (erro padrão hll.ERRO_PADRAO); senão, conta exatamente.
+    """
+    if exato is None:
+        exato = not CLIENTES_UNICOS_APROXIMADOS
+    _registrar_cache('contar_clientes_unicos', 'chamadas')
+    return _contar_clientes_unicos(filtros, por, exato, versao_dados())
+
+@_cache_consulta('contar_clientes_unicos')
+def _contar_clientes_unicos(filtros, por, exato, versao):
+    _registrar_cache('contar_clientes_unicos', 'falhas')
+    if not exato and not filtros.get('clientes') and not filtros.get('produtos'):
+        esbocos = _ler_esbocos_clientes(filtros)
+        if esbocos is not None:
+            with desempenho.medir('união dos esboços HyperLogLog', 'pandas'):
+                if por is None:
+                    return hll.estimar(hll.unir([r for lista in esbocos.values() for r in lista]))
+                return pd.Series({fp: hll.estimar(hll.unir(lista)) for fp, lista in esbocos.items()},
+                                 dtype='int64').rename_axis(por).rename('clientes_unicos')
+    df = agregar([por] if por else [], ['clientes_unicos'], filtros)
+    if por is None:
+        return int(df['clientes_unicos'].iloc[0]) if not df.empty else 0
+    return df.set_index(por)['clientes_unicos']
+
+def _ler_esbocos_clientes(filtros):
+    """Esboços do período agrupados por forma de pagamento, ou None se a fonte não os tiver."""
+    if BACKEND == 'parquet':
+        return None # O snapshot Parquet não leva os esboços
+    esbocos = {}
+    with desempenho.medir('esboços de clientes', 'sql') as medicao:
+        for esbocos_parte in _consultar_partes(_ler_esbocos, _partes(filtros)):
+            if esbocos_parte is None:
+                return None
+            for forma_pagamento, lista in esbocos_parte.items():
+                esbocos.setdefault(forma_pagamento, []).extend(lista)
+        medicao['linhas'] = sum(len(lista) for lista in esbocos.values())
+        medicao['bytes'] = medicao['linhas'] * hll.NUM_REGISTRADORES
+    return esbocos
+
+def _ler_esbocos(conn, filtros):
+    """Esboços de uma fonte (acai.db ou partição), ou None se ela não os tiver."""
+    if not _tabela_existe(conn, 'vendas_clientes_hll'):
+        return None
+    query = """
+        SELECT fp.nome, h.registradores
+        FROM vendas_clientes_hll h
+        JOIN formas_pagamento fp ON h.forma_pagamento_id = fp.id
+        WHERE h.dia BETWEEN ? AND ?
+    """
+    params = [pd.to_datetime(filtros['data_inicio']).strftime('%Y-%m-%d'), pd.to_datetime(filtros['data_fim']).strftime('%Y-%m-%d')]
+    if filtros.get('formas_pagamento'):
+        query += f" AND fp.nome IN ({','.join(['?'] * len(filtros['formas_pagamento']))})"
+        params.extend(filtros['formas_pagamento'])
+    esbocos = {}
+    for forma_pagamento, registradores in conn.execute(query, params):
+        esbocos.setdefault(forma_pagamento, []).append(hll.de_bytes(registradores))
+    return esbocos
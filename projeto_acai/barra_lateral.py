@@ -0,0 +1,76 @@
+"""
+Filtros da barra lateral, compartilhados por todas as páginas: qualquer página
+aberta diretamente (pela URL, sem passar pela visão geral) desenha os mesmos
+filtros, com os valores escolhidos em outra página, e consulta só os agregados
+de que precisa.
+"""
+import streamlit as st
+
+import app_utils
+
+def _chave_widget(chave, padrao):
+    """
+    Chave do widget de um filtro. O Streamlit descarta o estado de um widget ao trocar
+    de página, então o valor fica guardado também em st.session_state[chave]
+    (ver _guardar) e volta para o widget quando outra página o desenha.
+    """
+    chave_widget = f"_{chave}"
+    if chave_widget not in st.session_state:
+        st.session_state[chave_widget] = st.session_state.get(chave, padrao)
+    return chave_widget
+
+def _guardar(chave):
+    st.session_state[chave] = st.session_state[f"_{chave}"]
+
+def _limitar(data, minimo, maximo):
+    return min(max(data, minimo), maximo)
+
+def filtros():
+    """Desenha os filtros na barra lateral e retorna o dict de app_utils.montar_filtros."""
+    st.sidebar.header("Filtros 🎛️")
+    formas_pagamento_opcoes, min_data_bd, max_data_bd = app_utils.obter_opcoes_filtro()
+    min_data_bd, max_data_bd = min_data_bd.date(), max_data_bd.date()
+
+    # Datas guardadas podem ter ficado fora do intervalo do banco (ex: banco recarregado)
+    for chave in ('data_inicio', 'data_fim', '_data_inicio', '_data_fim'):
+        if chave in st.session_state:
+            st.session_state[chave] = _limitar(st.session_state[chave], min_data_bd, max_data_bd)
+    data_inicio = st.sidebar.date_input("Data Início", min_value=min_data_bd, max_value=max_data_bd,
+                                        key=_chave_widget('data_inicio', min_data_bd))
+    data_fim = st.sidebar.date_input("Data Fim", min_value=min_data_bd, max_value=max_data_bd,
+                                     key=_chave_widget('data_fim', max_data_bd))
+    _guardar('data_inicio')
+    _guardar('data_fim')
+
+    if data_inicio > data_fim:
+        st.sidebar.error("Data de início não pode ser maior que a data de fim.")
+        st.stop()
+
+    formas_pagamento_selecionadas = st.sidebar.multiselect(
+        "Forma de Pagamento",
+        options=formas_pagamento_opcoes,
+        key=_chave_widget('formas_pagamento_selecionadas', [])
+    )
+    _guardar('formas_pagamento_selecionadas')
+    # Com muitos clientes a lista completa não cabe no seletor: a busca por prefixo roda no banco
+    busca_cliente = st.sidebar.text_input("Buscar cliente", placeholder="Início do nome",
+                                          key=_chave_widget('busca_cliente', ''))
+    _guardar('busca_cliente')
+    chave_clientes = _chave_widget('clientes_selecionados', [])
+    # Clientes já escolhidos continuam entre as opções mesmo fora da busca atual
+    clientes_opcoes = sorted(set(app_utils.buscar_clientes(busca_cliente)) | set(st.session_state[chave_clientes]))
+    clientes_selecionados = st.sidebar.multiselect("Cliente", options=clientes_opcoes, key=chave_clientes)
+    _guardar('clientes_selecionados')
+    # Contagem exata de clientes únicos lê todas as vendas do período; a aproximada usa os esboços diários
+    st.sidebar.toggle(
+        "Clientes únicos exatos",
+        key=_chave_widget('clientes_unicos_exatos', not app_utils.CLIENTES_UNICOS_APROXIMADOS),
+        help=f"Desligado: estimativa HyperLogLog, com erro típico de ~{app_utils.hll.ERRO_PADRAO:.1%}."
+    )
+    _guardar('clientes_unicos_exatos')
+
+    return app_utils.montar_filtros(data_inicio, data_fim, formas_pagamento_selecionadas, clientes_selecionados)
+
+def clientes_unicos_exatos():
+    """Escolha do seletor "Clientes únicos exatos" (desenhado por filtros())."""
+    return st.session_state.get('clientes_unicos_exatos', not app_utils.CLIENTES_UNICOS_APROXIMADOS)
@@ -0,0 +1,183 @@
+"""
+Medição leve de cada execução (rerun) do dashboard: tempo de SQL e linhas/bytes
+lidos, tempo de pandas, acertos de cache e tempo dos blocos de cada página.
+As páginas chamam iniciar_execucao() no começo, secao() antes de cada bloco
+e finalizar_execucao() no fim; finalizar_execucao() mostra o painel "Desempenho" na barra lateral e, com
+ACAI_LOG_DESEMPENHO=<arquivo> (ou '-' para a saída de erro), grava a execução
+como uma linha JSON. Fora de uma execução (ex: scripts), nada é registrado.
+As páginas também chamam primeiro_conteudo() logo após exibir o primeiro
+indicador: esse tempo é comparado com ORCAMENTO_PRIMEIRO_CONTEUDO_MS
+(ver scripts/medir_paginas.py).
+"""
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+
+import pandas as pd
+import streamlit as st
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+# Tipos de medição: chamadas ao app_utils (incluem as medições internas), leitura da
+# fonte de dados (SQLite, Parquet ou DuckDB), cálculo em pandas e blocos das páginas
+TIPOS = ['funcao', 'sql', 'pandas', 'pagina']
+ARQUIVO_LOG = os.environ.get('ACAI_LOG_DESEMPENHO')
+PAINEL = os.environ.get('ACAI_PAINEL_DESEMPENHO', '1') == '1'
+# Tempo máximo (ms) do início da execução até o primeiro indicador de cada página
+ORCAMENTO_PRIMEIRO_CONTEUDO_MS = float(os.environ.get('ACAI_ORCAMENTO_PRIMEIRO_CONTEUDO_MS', '1500'))
+
+# Cada execução de página roda inteira em uma thread do Streamlit
+_local = threading.local()
+
+def _execucao():
+    return getattr(_local, 'execucao', None)
+
+def iniciar_execucao(pagina):
+    """Começa a registrar as medições desta execução da página."""
+    _local.execucao = {'pagina': pagina, 'inicio': time.perf_counter(), 'medicoes': [], 'abertas': [],
+                       'secao': None, 'cache': {'chamadas': 0, 'falhas': 0}, 'primeiro_conteudo_ms': None}
+
+def secao(etapa):
+    """
+    Começa um bloco da página (cálculos e gráficos até a próxima seção ou o fim da
+    execução). As chamadas ao app_utils feitas no bloco aparecem dentro dele.
+    """
+    execucao = _execucao()
+    if execucao is None:
+        return
+    _fechar_secao(execucao)
+    registro = {'etapa': etapa, 'tipo': 'pagina', 'ms': 0.0, 'linhas': None, 'bytes': None,
+                'aninhada': False, 'nivel': 0, 'inicio': time.perf_counter()}
+    execucao['medicoes'].append(registro)
+    execucao['abertas'].append(registro)
+    execucao['secao'] = registro
+
+def _fechar_secao(execucao):
+    registro = execucao['secao']
+    if registro is not None:
+        registro['ms'] = (time.perf_counter() - registro['inicio']) * 1000
+        execucao['abertas'].remove(registro)
+        execucao['secao'] = None
+
+def primeiro_conteudo():
+    """Marca que a página já exibiu seu primeiro indicador (só a primeira chamada conta)."""
+    execucao = _execucao()
+    if execucao is not None and execucao['primeiro_conteudo_ms'] is None:
+        execucao['primeiro_conteudo_ms'] = (time.perf_counter() - execucao['inicio']) * 1000
+
+@contextmanager
+def medir(etapa, tipo):
+    """
+    Mede o bloco. Retorna o registro da medição, onde o bloco pode anotar
+    o resultado (ver anotar) para contar linhas e bytes.
+    """
+    execucao = _execucao()
+    registro = {'etapa': etapa, 'tipo': tipo, 'ms': 0.0, 'linhas': None, 'bytes': None}
+    if execucao is None:
+        yield registro
+        return
+    # Medições dentro de outra do mesmo tipo não entram de novo no total do tipo
+    registro['aninhada'] = any(aberta['tipo'] == tipo for aberta in execucao['abertas'])
+    registro['nivel'] = len(execucao['abertas'])
+    execucao['medicoes'].append(registro)
+    execucao['abertas'].append(registro)
+    inicio = time.perf_counter()
+    try:
+        yield registro
+    finally:
+        registro['ms'] = (time.perf_counter() - inicio) * 1000
+        execucao['abertas'].pop()
+
+def anotar(registro, resultado):
+    """Linhas e bytes (memória do DataFrame, sem o texto das strings) de um resultado."""
+    if isinstance(resultado, (pd.DataFrame, pd.Series)):
+        registro['linhas'] = len(resultado)
+        registro['bytes'] = int(resultado.memory_usage(index=False).sum()) if isinstance(resultado, pd.DataFrame) \
+            else int(resultado.memory_usage(index=False))
+    elif isinstance(resultado, list):
+        registro['linhas'] = len(resultado)
+    return resultado
+
+def cronometrado(funcao):
+    """Decorador das funções públicas do app_utils: mede cada chamada, com ou sem acerto de cache."""
+    @wraps(funcao)
+    def medida(*args, **kwargs):
+        with medir(funcao.__name__, 'funcao') as registro:
+            return anotar(registro, funcao(*args, **kwargs))
+    return medida
+
+def contar_cache(evento, quantidade=1):
+    """Chamadas e falhas de cache desta execução (ver app_utils._registrar_cache)."""
+    execucao = _execucao()
+    if execucao is not None:
+        execucao['cache'][evento] += quantidade
+
+def resumo_execucao(execucao):
+    """
+    Totais da execução: ms por tipo, linhas e bytes lidos da fonte, acertos de cache e o
+    tempo até o primeiro conteúdo (o total, se a página não o marcou) comparado ao orçamento.
+    """
+    medicoes = execucao['medicoes']
+    total_ms = (time.perf_counter() - execucao['inicio']) * 1000
+    primeiro_conteudo_ms = execucao['primeiro_conteudo_ms'] if execucao['primeiro_conteudo_ms'] is not None else total_ms
+    return {
+        'pagina': execucao['pagina'],
+        'total_ms': total_ms,
+        'primeiro_conteudo_ms': primeiro_conteudo_ms,
+        'dentro_do_orcamento': primeiro_conteudo_ms <= ORCAMENTO_PRIMEIRO_CONTEUDO_MS,
+        **{f"{tipo}_ms": sum(m['ms'] for m in medicoes if m['tipo'] == tipo and not m['aninhada']) for tipo in TIPOS},
+        'linhas_lidas': sum(m['linhas'] or 0 for m in medicoes if m['tipo'] == 'sql'),
+        'bytes_lidos': sum(m['bytes'] or 0 for m in medicoes if m['tipo'] == 'sql'),
+        'cache_chamadas': execucao['cache']['chamadas'],
+        'cache_acertos': execucao['cache']['chamadas'] - execucao['cache']['falhas'],
+    }
+
+@st.cache_resource
+def _logger():
+    logger = logging.getLogger('acai.desempenho')
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    handler = logging.StreamHandler(sys.stderr) if ARQUIVO_LOG == '-' else logging.FileHandler(ARQUIVO_LOG, encoding='utf-8')
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(handler)
+    return logger
+
+def finalizar_execucao():
+    """Encerra a execução: grava o log estruturado e mostra o painel "Desempenho" na barra lateral."""
+    execucao = _execucao()
+    if execucao is None:
+        return
+    _local.execucao = None
+    _fechar_secao(execucao)
+    resumo = resumo_execucao(execucao)
+    medicoes = execucao['medicoes']
+
+    if ARQUIVO_LOG:
+        contexto = get_script_run_ctx()
+        _logger().info(json.dumps({
+            'momento': datetime.now().isoformat(timespec='milliseconds'),
+            'sessao': contexto.session_id if contexto else None,
+            **resumo,
+            'medicoes': [{**{chave: m[chave] for chave in ('etapa', 'tipo', 'nivel', 'linhas', 'bytes')}, 'ms': round(m['ms'], 2)}
+                         for m in medicoes],
+        }, ensure_ascii=False))
+
+    if PAINEL:
+        with st.sidebar.expander("Desempenho ⏱️"):
+            alerta = "" if resumo['dentro_do_orcamento'] else " ⚠️ acima do orçamento"
+            st.caption(f"Primeiro conteúdo em {resumo['primeiro_conteudo_ms']:.0f} ms "
+                       f"(orçamento: {ORCAMENTO_PRIMEIRO_CONTEUDO_MS:.0f} ms){alerta}.")
+            st.caption(f"Esta execução: {resumo['total_ms']:.0f} ms. SQL {resumo['sql_ms']:.0f} ms "
+                       f"({resumo['linhas_lidas']:,} linhas, {resumo['bytes_lidos'] / (1024 * 1024):.1f} MB), "
+                       f"pandas {resumo['pandas_ms']:.0f} ms; blocos da página (incluindo SQL e pandas) {resumo['pagina_ms']:.0f} ms. "
+                       f"Cache: {resumo['cache_acertos']} de {resumo['cache_chamadas']} chamadas sem consulta.")
+            if medicoes:
+                df = pd.DataFrame(medicoes)
+                df['etapa'] = [(' ' * nivel + '↳ ' if nivel else '') + etapa for nivel, etapa in zip(df['nivel'], df['etapa'])]
+                st.dataframe(df[['etapa', 'tipo', 'ms', 'linhas', 'bytes']], hide_index=True,
+                             column_config={'ms': st.column_config.NumberColumn(format="%.1f")})
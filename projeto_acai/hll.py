@@ -0,0 +1,65 @@
+"""
+HyperLogLog: contagem aproximada de valores distintos (ex: clientes únicos) com
+memória fixa. Cada esboço tem 2**PRECISAO registradores de 1 byte e pode ser unido
+a outros (máximo registrador a registrador), então esboços por dia somam qualquer
+intervalo de datas sem reler as vendas.
+
+Erro padrão relativo: 1.04 / sqrt(2**PRECISAO) = ~1.6% com PRECISAO = 12
+(~95% das estimativas ficam a menos de 3.3% do valor exato).
+Usado por scripts/setup_database.py (gravação) e app_utils.py (consulta).
+"""
+import numpy as np
+import pandas as pd
+
+PRECISAO = 12
+NUM_REGISTRADORES = 1 << PRECISAO
+ERRO_PADRAO = 1.04 / np.sqrt(NUM_REGISTRADORES)
+_BITS_RESTANTES = 64 - PRECISAO
+
+def _indices_e_postos(valores):
+    """Para cada valor: registrador (primeiros PRECISAO bits do hash) e posição do primeiro bit 1 no restante."""
+    # Hash de 64 bits estável entre execuções (não usa o hash() do Python, que muda por processo)
+    hashes = pd.util.hash_pandas_object(pd.Series(valores, dtype=object), index=False).to_numpy(np.uint64)
+    indices = (hashes >> np.uint64(_BITS_RESTANTES)).astype(np.intp)
+    restante = hashes & np.uint64((1 << _BITS_RESTANTES) - 1)
+    # Número de bits de 'restante' (exato em float64, pois restante < 2**53)
+    _, num_bits = np.frexp(restante.astype(np.float64))
+    postos = (_BITS_RESTANTES - num_bits + 1).astype(np.uint8)
+    return indices, postos
+
+def esbocos_por_grupo(grupos, valores, num_grupos):
+    """
+    Um esboço por grupo: 'grupos' são códigos inteiros (0 a num_grupos - 1) alinhados
+    com 'valores'. Retorna uma matriz uint8 (num_grupos x NUM_REGISTRADORES).
+    """
+    registradores = np.zeros((num_grupos, NUM_REGISTRADORES), dtype=np.uint8)
+    if len(valores):
+        indices, postos = _indices_e_postos(valores)
+        np.maximum.at(registradores, (np.asarray(grupos, dtype=np.intp), indices), postos)
+    return registradores
+
+def unir(esbocos):
+    """União de esbocos (matriz n x NUM_REGISTRADORES ou lista de vetores): máximo por registrador."""
+    if len(esbocos) == 0:
+        return np.zeros(NUM_REGISTRADORES, dtype=np.uint8)
+    esbocos = np.asarray(esbocos, dtype=np.uint8)
+    if esbocos.ndim == 1:
+        return esbocos
+    return esbocos.max(axis=0)
+
+def estimar(registradores):
+    """Número estimado de valores distintos de um esboço."""
+    registradores = np.asarray(registradores, dtype=np.float64)
+    alfa = 0.7213 / (1 + 1.079 / NUM_REGISTRADORES)
+    estimativa = alfa * NUM_REGISTRADORES ** 2 / np.sum(np.exp2(-registradores))
+    vazios = np.count_nonzero(registradores == 0)
+    if estimativa <= 2.5 * NUM_REGISTRADORES and vazios > 0:
+        # Poucos valores: contagem linear pelos registradores vazios é mais precisa
+        estimativa = NUM_REGISTRADORES * np.log(NUM_REGISTRADORES / vazios)
+    return int(round(estimativa))
+
+def para_bytes(registradores):
+    return np.asarray(registradores, dtype=np.uint8).tobytes()
+
+def de_bytes(dados):
+    return np.frombuffer(dados, dtype=np.uint8)
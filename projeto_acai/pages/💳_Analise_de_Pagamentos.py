@@ -1,6 +1,9 @@
 # pages/💳_Analise_de_Pagamentos.py
 import streamlit as st
-import pandas as pd
+import analises
+import app_utils
+import barra_lateral
+import desempenho
 
 # Define o layout da página e o título que aparece na aba do navegador
 #st.set_page_config(layout="wide", page_title="Análise de Pagamentos")
@@ -8,36 +11,48 @@ import pandas as pd
 # Título principal da página
 st.title("Análise por Forma de Pagamento 💳")
 
-# --- Bloco de Verificação e Carregamento dos Dados ---
-# Este bloco padrão garante que os dados filtrados existam antes de prosseguir.
-# Ele lê os dados que foram carregados e processados no script principal (Visao_Geral.py).
-if 'df_filtrado' not in st.session_state or st.session_state.df_filtrado.empty:
-    st.warning("Não há dados para exibir. Por favor, ajuste os filtros na página principal ou aguarde o carregamento.")
+desempenho.iniciar_execucao("Análise de Pagamentos")
+
+# --- Filtros ---
+desempenho.secao("Filtros")
+# Os mesmos filtros da página principal: a página também abre direto pela URL
+filtros = barra_lateral.filtros()
+
+# --- Carregamento dos Dados ---
+desempenho.secao("Carregamento dos dados")
+# Lê o cubo de agregados dos filtros (o mesmo da página principal, em cache)
+df_por_fp = app_utils.carregar_cubo(filtros)['forma_pagamento_nome']
+
+if df_por_fp.empty:
+    st.warning("Não há dados para exibir. Por favor, ajuste os filtros na barra lateral.")
     st.stop()
-elif 'data_inicio' in st.session_state and 'data_fim' in st.session_state and st.session_state.data_inicio > st.session_state.data_fim:
-     st.error("Data de início não pode ser maior que a data de fim. Ajuste os filtros na sidebar.")
-     st.stop()
-else:
-    df_display = st.session_state.df_filtrado
 
 # --- Cálculos Principais ---
+desempenho.secao("Cálculos Principais")
 # É uma boa prática fazer os cálculos uma vez no início e reutilizar os resultados.
-vendas_por_fp_valor = df_display.groupby('forma_pagamento_nome')['valor_total'].sum()
-transacoes_por_fp = df_display.groupby('forma_pagamento_nome')['venda_id'].nunique()
-ticket_medio_fp = (vendas_por_fp_valor / transacoes_por_fp).fillna(0)
+# Segue o seletor "Clientes únicos exatos" da barra lateral (estimativa HyperLogLog quando desligado)
+clientes_por_fp = app_utils.contar_clientes_unicos(
+    filtros, por='forma_pagamento_nome', exato=barra_lateral.clientes_unicos_exatos())
+resultados = analises.analise_pagamentos(df_por_fp, clientes_por_fp)
+resumo_fp = resultados['resumo']
+vendas_por_fp_valor = resumo_fp['valor_total']
+transacoes_por_fp = resumo_fp['num_vendas'] # Cada venda é uma transação
+ticket_medio_fp = resumo_fp['ticket_medio']
 
 
 # --- KPI (Indicador Chave) em Destaque ---
+desempenho.secao("KPI (Indicador Chave) em Destaque")
 st.subheader("Destaque Principal")
 if not transacoes_por_fp.empty:
-    # Identifica a forma de pagamento com o maior número de transações
-    fp_mais_usada = transacoes_por_fp.idxmax()
-    st.metric("Forma de Pagamento Mais Popular", fp_mais_usada)
+    # Forma de pagamento com o maior número de transações
+    st.metric("Forma de Pagamento Mais Popular", resultados['mais_popular'])
 else:
     st.metric("Forma de Pagamento Mais Popular", "N/A")
+desempenho.primeiro_conteudo()
 
 
 # --- Análise Comparativa: Volume vs. Valor ---
+desempenho.secao("Análise Comparativa: Volume vs. Valor")
 st.subheader("Comparativo de Formas de Pagamento")
 st.markdown("Entenda como cada forma de pagamento contribui em valor total (R$) e em número de transações.")
 
@@ -67,6 +82,7 @@ st.info("""
 
 
 # --- Análise de Ticket Médio ---
+desempenho.secao("Análise de Ticket Médio")
 st.subheader("Ticket Médio por Forma de Pagamento 💵")
 st.markdown("Veja o valor médio que os clientes gastam em uma transação com cada método.")
 
@@ -75,14 +91,14 @@ if not ticket_medio_fp.empty:
 
     # --- Tabela Detalhada para dados precisos ---
     st.markdown("##### Dados Detalhados")
-    df_pagamentos_summary = pd.DataFrame({
-        'Valor Total (R$)': vendas_por_fp_valor,
-        'Nº de Transações': transacoes_por_fp,
-        'Ticket Médio (R$)': ticket_medio_fp
-    }).reset_index().rename(columns={'forma_pagamento_nome': 'Forma de Pagamento'})
-    
-    # Ordenar pela coluna desejada, por exemplo, por Valor Total
-    df_pagamentos_summary = df_pagamentos_summary.sort_values('Valor Total (R$)', ascending=False)
+    # O resumo já vem ordenado por Valor Total
+    df_pagamentos_summary = resumo_fp.reset_index().rename(columns={
+        'forma_pagamento_nome': 'Forma de Pagamento',
+        'valor_total': 'Valor Total (R$)',
+        'num_vendas': 'Nº de Transações',
+        'ticket_medio': 'Ticket Médio (R$)',
+        'clientes_unicos': 'Clientes Únicos'
+    })
     
     # Usar column_config para formatar os números como moeda, melhorando a leitura
     st.dataframe(
@@ -99,4 +115,6 @@ else:
 
 st.info("""
     💡 **Ação:** Formas de pagamento com **ticket médio alto** (ex: Cartão de Crédito) podem ser um bom canal para incentivar compras maiores, talvez com opções de parcelamento. Já formas com **ticket médio baixo** (ex: Dinheiro ou Pix) são importantes para garantir troco e agilidade no caixa para compras rápidas.
-""")
\ No newline at end of file
+""")
+
+desempenho.finalizar_execucao()
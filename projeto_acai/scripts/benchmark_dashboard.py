@@ -0,0 +1,239 @@
+"""
+Benchmark do dashboard: gera vendas sintéticas no mesmo formato de
+data/dados_vendas_acai.csv (clientes, produtos, pagamentos e horários com
+distribuições realistas), ingere com o setup_database.py e mede as funções do
+app_utils usadas pelas páginas: opções de filtro, cargas filtradas com várias
+seletividades e as agregações de cada página, com cache frio e quente.
+Os resultados são gravados em JSON para acompanhar regressões entre versões.
+
+Uso: python scripts/benchmark_dashboard.py [--tamanhos 10000 100000 1000000] [--repeticoes 3] [--saida benchmark_dashboard.json]
+(ACAI_MOTOR=duckdb também é respeitado; 10**8 vendas geram ~8 GB de CSV e levam horas.)
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import setup_database
+import streamlit.logger
+streamlit.logger.set_log_level('error')  # Sem servidor, o st.cache_* avisa a cada chamada
+import app_utils  # setup_database já colocou a raiz do projeto no sys.path
+
+# Produto -> (categoria, preço, peso nas vendas)
+PRODUTOS = {
+    'Açaí 300ml': ('Açaí', 10.0, 0.22), 'Açaí 500ml': ('Açaí', 15.0, 0.20), 'Açaí 700ml': ('Açaí', 20.0, 0.10),
+    'Açaí Bowl': ('Açaí', 22.0, 0.08), 'Banana Split': ('Sobremesa', 18.0, 0.07),
+    'Milkshake': ('Bebida', 12.0, 0.15), 'Sorvete Casquinha': ('Sorvete', 5.0, 0.18),
+}
+FORMAS_PAGAMENTO = {'Pix': 0.40, 'Cartão Débito': 0.25, 'Cartão Crédito': 0.22, 'Dinheiro': 0.13}
+# Loja aberta das 10h às 22h, com picos no início da tarde e à noite
+PESOS_HORAS = {10: 2, 11: 4, 12: 6, 13: 8, 14: 9, 15: 10, 16: 10, 17: 9, 18: 9, 19: 11, 20: 12, 21: 7}
+PESOS_DIAS_SEMANA = [0.8, 0.8, 0.85, 0.9, 1.1, 1.4, 1.3]  # Segunda a domingo
+PESOS_QUANTIDADE = {1: 0.55, 2: 0.30, 3: 0.10, 4: 0.05}
+INICIO_DADOS = pd.Timestamp('2023-01-01')
+DIAS_DADOS = 730
+LINHAS_POR_ARQUIVO = 1_000_000  # Vendas por CSV gerado (como arquivos de várias lojas/dias)
+
+
+def _normalizar(pesos):
+    pesos = np.asarray(list(pesos), dtype=float)
+    return pesos / pesos.sum()
+
+
+def gerar_csvs(pasta, n_linhas, semente=42, linhas_por_arquivo=LINHAS_POR_ARQUIVO):
+    """
+    Grava n_linhas vendas sintéticas em CSVs de até linhas_por_arquivo linhas.
+    Clientes seguem uma distribuição de cauda longa (poucos muito frequentes).
+    Retorna os caminhos dos arquivos.
+    """
+    rng = np.random.default_rng(semente)
+    n_clientes = max(200, n_linhas // 50)
+    frequencia_clientes = _normalizar(rng.lognormal(0, 1.2, n_clientes))
+    dias = pd.date_range(INICIO_DADOS, periods=DIAS_DADOS, freq='D')
+    pesos_dias = _normalizar(np.array(PESOS_DIAS_SEMANA)[dias.dayofweek])
+    nomes_produtos = list(PRODUTOS)
+    categorias = np.array([PRODUTOS[p][0] for p in nomes_produtos])
+    precos = np.array([PRODUTOS[p][1] for p in nomes_produtos])
+
+    caminhos = []
+    for numero, inicio in enumerate(range(0, n_linhas, linhas_por_arquivo)):
+        n = min(linhas_por_arquivo, n_linhas - inicio)
+        datas = (dias[rng.choice(DIAS_DADOS, n, p=pesos_dias)]
+                 + pd.to_timedelta(rng.choice(list(PESOS_HORAS), n, p=_normalizar(PESOS_HORAS.values())), unit='h')
+                 + pd.to_timedelta(rng.integers(0, 3600, n), unit='s'))
+        produtos = rng.choice(len(nomes_produtos), n, p=_normalizar(p[2] for p in PRODUTOS.values()))
+        quantidades = rng.choice(list(PESOS_QUANTIDADE), n, p=_normalizar(PESOS_QUANTIDADE.values()))
+        df = pd.DataFrame({
+            'data_venda': datas.strftime('%Y-%m-%d %H:%M:%S'),
+            'cliente': 'Cliente ' + pd.Series(rng.choice(n_clientes, n, p=frequencia_clientes) + 1).astype(str),
+            'produto': np.array(nomes_produtos)[produtos],
+            'quantidade': quantidades,
+            'forma_pagamento': rng.choice(list(FORMAS_PAGAMENTO), n, p=_normalizar(FORMAS_PAGAMENTO.values())),
+            'preco_unitario': precos[produtos],
+            'valor_total': quantidades * precos[produtos],
+            'categoria': categorias[produtos],
+        }).sort_values('data_venda')
+        caminho = os.path.join(pasta, f"sintetico_{numero:04d}.csv")
+        df.to_csv(caminho, index=False)
+        caminhos.append(caminho)
+    return caminhos
+
+
+def ingerir(caminho_db, caminhos_csv, processos):
+    """Cria o banco e ingere os CSVs pelo caminho de produção (--todos). Retorna os segundos gastos."""
+    conn = sqlite3.connect(caminho_db)
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            setup_database.configurar_pragmas(conn)
+            setup_database.criar_tabelas(conn)
+            setup_database.migrar_esquema(conn)
+            inicio = time.perf_counter()
+            # CSVs gerados acima, já fechados: nenhuma linha está sendo escrita
+            setup_database.carregar_csvs_paralelo(conn, caminhos_csv, processos=processos, aceitar_linha_incompleta=True)
+            segundos = time.perf_counter() - inicio
+        conn.execute("PRAGMA optimize;")
+    finally:
+        conn.close()
+    return segundos
+
+
+def cenarios(filtros_base, cliente_frequente):
+    """Cargas filtradas do dashboard com seletividades diferentes: (nome, filtros)."""
+    fim = filtros_base['data_fim']
+    por_periodo = [(f"{dias}_dias", {**filtros_base, 'data_inicio': fim - pd.Timedelta(days=dias - 1)})
+                   for dias in (1, 7, 30, 365)]
+    return por_periodo + [
+        ('tudo', filtros_base),
+        ('30_dias_pix', {**filtros_base, 'data_inicio': fim - pd.Timedelta(days=29), 'formas_pagamento': ['Pix']}),
+        ('tudo_1_cliente', {**filtros_base, 'clientes': [cliente_frequente]}),
+    ]
+
+
+def paginas(filtros):
+    """Chamadas ao app_utils feitas por cada página do dashboard: nome -> função."""
+    produto = next(iter(PRODUTOS))
+    return {
+        'visao_geral': lambda: (app_utils.carregar_cubo(filtros), app_utils.contar_clientes_unicos(filtros)),
+        'visao_geral_clientes_exatos': lambda: app_utils.contar_clientes_unicos(filtros, exato=True),
+        'pagamentos': lambda: (app_utils.carregar_cubo(filtros),
+                               app_utils.contar_clientes_unicos(filtros, por='forma_pagamento_nome')),
+        'produtos_detalhe': lambda: app_utils.agregar(['dia', 'dia_semana', 'hora'], ['quantidade', 'valor_total'],
+                                                      {**filtros, 'produtos': [produto]}),
+        'temporal': lambda: app_utils.carregar_cubo(filtros),
+        'clientes': lambda: app_utils.carregar_clientes(filtros),
+    }
+
+
+def medir(funcao, repeticoes, frio):
+    """Mediana e mínimo (ms) de funcao(); frio=True esvazia os caches antes de cada execução."""
+    if not frio:
+        funcao()
+    tempos = []
+    for _ in range(repeticoes):
+        if frio:
+            app_utils.limpar_caches()
+        inicio = time.perf_counter()
+        resultado = funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos) * 1000, min(tempos) * 1000, resultado
+
+
+def _linhas(resultado):
+    if isinstance(resultado, tuple):
+        resultado = resultado[0]
+    if isinstance(resultado, dict):
+        resultado = resultado.get('dia', resultado)
+    return len(resultado) if hasattr(resultado, '__len__') else 1
+
+
+def executar(tamanhos, repeticoes, processos):
+    resultados = []
+    with tempfile.TemporaryDirectory() as pasta:
+        for n_linhas in tamanhos:
+            pasta_csv = os.path.join(pasta, f"csv_{n_linhas}")
+            os.makedirs(pasta_csv)
+            print(f"\nGerando {n_linhas:,} vendas sintéticas...")
+            inicio = time.perf_counter()
+            caminhos_csv = gerar_csvs(pasta_csv, n_linhas)
+            print(f"Geração: {time.perf_counter() - inicio:.1f}s em {len(caminhos_csv)} arquivo(s)")
+
+            caminho_db = os.path.join(pasta, f"bench_{n_linhas}.db")
+            segundos = ingerir(caminho_db, caminhos_csv, processos)
+            resultados.append({'linhas_base': n_linhas, 'grupo': 'ingestao', 'nome': 'carregar_csvs_paralelo',
+                               'cache': None, 'mediana_ms': segundos * 1000, 'min_ms': segundos * 1000,
+                               'repeticoes': 1, 'linhas_resultado': n_linhas,
+                               'linhas_por_segundo': n_linhas / segundos if segundos > 0 else None})
+            for caminho in caminhos_csv:
+                os.remove(caminho)
+
+            app_utils.usar_banco(caminho_db)
+            medicoes = []
+            for frio in (True, False):
+                mediana, minimo, (formas, data_min, data_max) = medir(app_utils.obter_opcoes_filtro, repeticoes, frio)
+                medicoes.append(('opcoes_filtro', 'obter_opcoes_filtro', frio, mediana, minimo, len(formas)))
+            filtros_base = app_utils.montar_filtros(pd.Timestamp(data_min), pd.Timestamp(data_max))
+            cliente_frequente = app_utils.carregar_clientes(filtros_base)['num_vendas'].idxmax()
+
+            for nome, filtros in cenarios(filtros_base, cliente_frequente):
+                carga = lambda f=filtros: app_utils.carregar_dados_base(
+                    f['data_inicio'].date(), f['data_fim'].date(), f['formas_pagamento'], f['clientes'])
+                for frio in (True, False):
+                    mediana, minimo, df = medir(carga, repeticoes, frio)
+                    medicoes.append(('carga_filtrada', nome, frio, mediana, minimo, len(df)))
+            app_utils.limpar_cache_vendas()  # Libera a memória antes das agregações
+
+            filtros_30_dias = {**filtros_base, 'data_inicio': filtros_base['data_fim'] - pd.Timedelta(days=29)}
+            for periodo, filtros in (('30_dias', filtros_30_dias), ('tudo', filtros_base)):
+                for nome, funcao in paginas(filtros).items():
+                    for frio in (True, False):
+                        mediana, minimo, resultado = medir(funcao, repeticoes, frio)
+                        medicoes.append(('pagina', f"{nome}/{periodo}", frio, mediana, minimo, _linhas(resultado)))
+
+            print(f"Ingestão: {segundos:.1f}s ({n_linhas / segundos:,.0f} linhas/s)")
+            print(f"{'grupo':<16}{'medição':<42}{'linhas':>10}{'frio (ms)':>12}{'quente (ms)':>13}")
+            for grupo, nome, frio, mediana, minimo, linhas in medicoes:
+                resultados.append({'linhas_base': n_linhas, 'grupo': grupo, 'nome': nome,
+                                   'cache': 'frio' if frio else 'quente', 'mediana_ms': mediana, 'min_ms': minimo,
+                                   'repeticoes': repeticoes, 'linhas_resultado': linhas})
+                if frio:
+                    quente = next(m[3] for m in medicoes if m[:2] == (grupo, nome) and not m[2])
+                    print(f"{grupo:<16}{nome:<42}{linhas:>10,}{mediana:>12.1f}{quente:>13.1f}")
+    return resultados
+
+
+def ambiente():
+    """Versões e configuração da máquina, gravadas junto dos resultados para comparações justas."""
+    return {
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'sqlite': sqlite3.sqlite_version,
+        'plataforma': platform.platform(),
+        'cpus': os.cpu_count(),
+        'motor': app_utils.MOTOR,
+        'clientes_unicos_aproximados': app_utils.CLIENTES_UNICOS_APROXIMADOS,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Latência das consultas e agregações do dashboard sobre dados sintéticos.")
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=[10_000, 100_000, 1_000_000],
+                        help="Números de vendas sintéticas a testar (padrão: 10k, 100k e 1M; até 10**8)")
+    parser.add_argument('--repeticoes', type=int, default=3, help="Execuções por medição (usa a mediana)")
+    parser.add_argument('--processos', type=int, default=None, help="Processos da ingestão (padrão: núcleos da CPU)")
+    parser.add_argument('--saida', default='benchmark_dashboard.json', help="Arquivo JSON com os resultados")
+    args = parser.parse_args()
+    resultados = executar(args.tamanhos, args.repeticoes, args.processos)
+    with open(args.saida, 'w', encoding='utf-8') as arquivo:
+        json.dump({'ambiente': ambiente(), 'resultados': resultados}, arquivo, ensure_ascii=False, indent=2)
+    print(f"\nResultados gravados em '{args.saida}'.")
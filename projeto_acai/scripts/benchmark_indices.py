@@ -0,0 +1,139 @@
+"""
+Benchmark dos índices/esquema de 'vendas': mede a latência das consultas do
+dashboard (mesmo formato de app_utils.carregar_dados_base) antes e depois de
+migrar_esquema, em bancos sintéticos de vários tamanhos.
+
+Uso: python scripts/benchmark_indices.py [--tamanhos 10000 1000000 10000000] [--repeticoes 5]
+"""
+import argparse
+import contextlib
+import io
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import setup_database
+
+PRODUTOS = [('Açaí 300ml', 'Açaí'), ('Açaí 500ml', 'Açaí'), ('Açaí 700ml', 'Açaí'), ('Açaí Bowl', 'Açaí'),
+            ('Banana Split', 'Sobremesa'), ('Milkshake', 'Bebida'), ('Sorvete Casquinha', 'Sorvete')]
+FORMAS_PAGAMENTO = ['Pix', 'Cartão Crédito', 'Cartão Débito', 'Dinheiro']
+INICIO_DADOS = pd.Timestamp('2022-01-01')
+DIAS_DADOS = 730
+LINHAS_POR_INSERT = 200000
+
+CONSULTA_BASE = """
+    SELECT v.id, v.data_venda, v.cliente, v.quantidade, v.preco_unitario, v.valor_total,
+           p.nome, c.nome, fp.nome
+    FROM vendas v
+    JOIN produtos p ON v.produto_id = p.id
+    JOIN categorias c ON p.categoria_id = c.id
+    JOIN formas_pagamento fp ON v.forma_pagamento_id = fp.id
+    WHERE {filtro_periodo}
+"""
+
+
+def popular_sintetico(conn, n_linhas, semente=42):
+    """Cria lookups e n_linhas vendas aleatórias (2 anos, clientes proporcionais ao volume)."""
+    rng = np.random.default_rng(semente)
+    with contextlib.redirect_stdout(io.StringIO()):
+        setup_database.criar_tabelas(conn)
+    # Origem preenchida, como numa carga atual: a migração não trata essas vendas como legadas
+    conn.execute("ALTER TABLE vendas ADD COLUMN arquivo_origem TEXT")
+    conn.execute("ALTER TABLE vendas ADD COLUMN linha_origem INTEGER")
+    conn.executemany("INSERT INTO categorias (nome) VALUES (?)", [(c,) for c in sorted({c for _, c in PRODUTOS})])
+    mapa_categorias = dict(conn.execute("SELECT nome, id FROM categorias").fetchall())
+    conn.executemany("INSERT INTO produtos (nome, categoria_id) VALUES (?, ?)", [(p, mapa_categorias[c]) for p, c in PRODUTOS])
+    conn.executemany("INSERT INTO formas_pagamento (nome) VALUES (?)", [(f,) for f in FORMAS_PAGAMENTO])
+
+    n_clientes = max(200, n_linhas // 50)
+    for inicio in range(0, n_linhas, LINHAS_POR_INSERT):
+        n = min(LINHAS_POR_INSERT, n_linhas - inicio)
+        segundos = rng.integers(0, DIAS_DADOS * 86400, n)
+        datas = (INICIO_DADOS + pd.to_timedelta(segundos, unit='s')).strftime('%Y-%m-%d %H:%M:%S')
+        quantidades = rng.integers(1, 5, n)
+        precos = rng.choice([10.0, 12.0, 15.0, 18.0, 22.0], n)
+        conn.executemany(
+            "INSERT INTO vendas (data_venda, cliente, produto_id, quantidade, forma_pagamento_id, preco_unitario, valor_total, "
+            "arquivo_origem, linha_origem) VALUES (?, ?, ?, ?, ?, ?, ?, 'sintetico.csv', ?)",
+            zip(datas, (f"Cliente {c}" for c in rng.integers(1, n_clientes + 1, n).tolist()),
+                rng.integers(1, len(PRODUTOS) + 1, n).tolist(), quantidades.tolist(),
+                rng.integers(1, len(FORMAS_PAGAMENTO) + 1, n).tolist(), precos.tolist(), (quantidades * precos).tolist(),
+                range(inicio + 1, inicio + n + 1))
+        )
+    conn.commit()
+    return n_clientes
+
+
+def consultas(usar_epoch, n_clientes):
+    """Consultas representativas do dashboard: (nome, sql, parâmetros)."""
+    inicio, fim = INICIO_DADOS + pd.Timedelta(days=300), INICIO_DADOS + pd.Timedelta(days=330)
+    if usar_epoch:
+        filtro = "v.data_venda_epoch BETWEEN ? AND ?"
+        limites = setup_database.datas_para_epoch(pd.Series([inicio, fim])).tolist()
+        limites_total = [0, 2 ** 62]
+    else:
+        filtro = "v.data_venda BETWEEN ? AND ?"
+        limites = [inicio.strftime('%Y-%m-%d %H:%M:%S'), fim.strftime('%Y-%m-%d %H:%M:%S')]
+        limites_total = ['0000', '9999']
+    clientes = [f"Cliente {c}" for c in range(1, n_clientes + 1, max(1, n_clientes // 5))][:5]
+    sql = CONSULTA_BASE.format(filtro_periodo=filtro)
+    placeholders = ','.join(['?'] * len(clientes))
+    return [
+        ('periodo_30_dias', sql, limites),
+        ('periodo_30_dias_pix', sql + " AND fp.nome IN (?)", limites + ['Pix']),
+        ('clientes_historico_total', sql + f" AND v.cliente IN ({placeholders})", limites_total + clientes),
+    ]
+
+
+def medir(conn, sql, params, repeticoes):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        linhas = conn.execute(sql, params).fetchall()
+        tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos) * 1000, len(linhas)
+
+
+def executar(tamanhos, repeticoes):
+    resultados = []
+    with tempfile.TemporaryDirectory() as pasta:
+        for n_linhas in tamanhos:
+            caminho = os.path.join(pasta, f"bench_{n_linhas}.db")
+            conn = sqlite3.connect(caminho)
+            print(f"\nGerando {n_linhas:,} vendas sintéticas...")
+            n_clientes = popular_sintetico(conn, n_linhas)
+
+            antes = {nome: medir(conn, sql, params, repeticoes) for nome, sql, params in consultas(False, n_clientes)}
+            inicio = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                setup_database.configurar_pragmas(conn)
+                setup_database.migrar_esquema(conn)
+            tempo_migracao = time.perf_counter() - inicio
+            # A comparação só vale sobre as mesmas vendas
+            total = conn.execute("SELECT COUNT(*) FROM vendas").fetchone()[0]
+            if total != n_linhas:
+                raise RuntimeError(f"A migração alterou o número de vendas ({n_linhas:,} -> {total:,}); medições descartadas.")
+            depois = {nome: medir(conn, sql, params, repeticoes) for nome, sql, params in consultas(True, n_clientes)}
+            conn.close()
+
+            print(f"Migração (epoch + índices): {tempo_migracao:.1f}s")
+            print(f"{'consulta':<28}{'linhas':>10}{'antes (ms)':>14}{'depois (ms)':>14}{'ganho':>9}")
+            for nome in antes:
+                (ms_antes, linhas), (ms_depois, _) = antes[nome], depois[nome]
+                print(f"{nome:<28}{linhas:>10,}{ms_antes:>14.1f}{ms_depois:>14.1f}{ms_antes / ms_depois:>8.1f}x")
+                resultados.append((n_linhas, nome, linhas, ms_antes, ms_depois))
+    return resultados
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Latência das consultas do dashboard antes/depois dos índices.")
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=[10_000, 1_000_000, 10_000_000],
+                        help="Números de vendas sintéticas a testar (padrão: 10k, 1M e 10M)")
+    parser.add_argument('--repeticoes', type=int, default=5, help="Execuções por consulta (usa a mediana)")
+    args = parser.parse_args()
+    executar(args.tamanhos, args.repeticoes)
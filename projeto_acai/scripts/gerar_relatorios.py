@@ -0,0 +1,183 @@
+"""
+Relatórios em lote, sem o navegador: calcula os resultados de todas as páginas do
+dashboard (analises.relatorio_completo) para vários bancos (um acai.db por loja)
+e/ou vários períodos, em um pool de processos, e grava cada relatório em
+<saida>/<loja>/<inicio>_<fim>/: relatorio.json (valores e tabelas) e uma tabela
+Parquet por gráfico/ranking (requer pyarrow). <saida>/indice.json lista os relatórios.
+
+Uso: python scripts/gerar_relatorios.py [--bancos loja1.db loja2.db] [--periodos 2024-01-01:2024-03-31 ...]
+                                        [--por-mes] [--processos N] [--saida relatorios] [--formatos json parquet]
+                                        [--clientes-aproximados]
+"""
+import argparse
+import json
+import math
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, PROJECT_ROOT)
+import streamlit.logger
+streamlit.logger.set_log_level('error')  # Sem servidor, o st.cache_* avisa a cada chamada
+import analises
+import app_utils
+
+FORMATOS = ['json', 'parquet']
+
+
+def nome_loja(caminho_db):
+    """Nome da loja nas pastas de saída: o nome do arquivo do banco, sem extensão."""
+    return os.path.splitext(os.path.basename(caminho_db))[0]
+
+
+def periodos_do_banco(caminho_db, periodos, por_mes):
+    """
+    Períodos (data_inicio, data_fim) a gerar para um banco: os pedidos ou, sem
+    nenhum, todo o intervalo com vendas. por_mes divide cada período em meses.
+    """
+    app_utils.usar_banco(caminho_db)
+    if not periodos:
+        _, data_min, data_max = app_utils.obter_opcoes_filtro()
+        periodos = [(data_min.date(), data_max.date())]
+    if not por_mes:
+        return periodos
+    return [(max(inicio, mes.start_time.date()), min(fim, mes.end_time.date()))
+            for inicio, fim in periodos for mes in pd.period_range(inicio, fim, freq='M')]
+
+
+def _valor_json(valor):
+    """Escalares do relatório em tipos do JSON (números numpy, datas; infinito vira null)."""
+    if isinstance(valor, np.generic):
+        valor = valor.item()
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    if isinstance(valor, float) and not math.isfinite(valor):
+        return None
+    return valor
+
+
+def _achatar(resultado, nome, valores, tabelas):
+    """Separa o relatório aninhado em valores escalares e tabelas, com nomes 'pagina.item'."""
+    if isinstance(resultado, dict):
+        for chave, item in resultado.items():
+            _achatar(item, f"{nome}.{chave}" if nome else str(chave), valores, tabelas)
+    elif isinstance(resultado, pd.Series):
+        tabelas[nome] = resultado.to_frame(resultado.name or 'valor').reset_index()
+    elif isinstance(resultado, pd.DataFrame):
+        tabela = resultado.reset_index()
+        tabela.columns = tabela.columns.map(str) # Ex: anos como colunas (YoY); o Parquet exige nomes em texto
+        tabelas[nome] = tabela
+    else:
+        valores[nome] = _valor_json(resultado)
+
+
+def gravar_relatorio(relatorio, pasta, formatos, cabecalho):
+    """Grava o relatório em pasta (relatorio.json e/ou <tabela>.parquet). Retorna o número de arquivos."""
+    valores, tabelas = {}, {}
+    _achatar(relatorio, '', valores, tabelas)
+    os.makedirs(pasta, exist_ok=True)
+    arquivos = 0
+    if 'json' in formatos:
+        conteudo = {
+            **cabecalho,
+            'valores': valores,
+            'tabelas': {nome: json.loads(tabela.to_json(orient='records', date_format='iso', force_ascii=False))
+                        for nome, tabela in tabelas.items()},
+        }
+        with open(os.path.join(pasta, 'relatorio.json'), 'w', encoding='utf-8') as arquivo:
+            json.dump(conteudo, arquivo, ensure_ascii=False, indent=2, default=_valor_json)
+        arquivos += 1
+    if 'parquet' in formatos:
+        for nome, tabela in tabelas.items():
+            tabela.to_parquet(os.path.join(pasta, f"{nome.replace(os.sep, '_')}.parquet"), index=False)
+            arquivos += 1
+    return arquivos
+
+
+def gerar_relatorio(caminho_db, data_inicio, data_fim, pasta_saida, formatos, exato):
+    """Tarefa dos processos: um relatório (banco x período). Retorna o resumo para o índice."""
+    if app_utils.DB_NAME != caminho_db:
+        app_utils.usar_banco(caminho_db)
+    inicio = time.perf_counter()
+    relatorio = analises.relatorio_completo(app_utils.montar_filtros(data_inicio, data_fim), exato)
+    loja = nome_loja(caminho_db)
+    pasta = os.path.join(pasta_saida, loja, f"{data_inicio}_{data_fim}")
+    cabecalho = {'loja': loja, 'banco': caminho_db, 'data_inicio': str(data_inicio), 'data_fim': str(data_fim),
+                 'gerado_em': datetime.now().isoformat(timespec='seconds'),
+                 # Visão geral e pagamentos; a seção de clientes lista cada cliente e conta sempre exatamente
+                 'clientes_unicos': 'exato' if exato else f"aproximado (HyperLogLog, erro típico de ~{app_utils.hll.ERRO_PADRAO:.1%})"}
+    arquivos = gravar_relatorio(relatorio, pasta, formatos, cabecalho)
+    kpis = relatorio['visao_geral']['kpis']
+    return {**cabecalho, 'pasta': pasta, 'arquivos': arquivos, 'segundos': time.perf_counter() - inicio,
+            'total_vendas_valor': _valor_json(kpis['total_vendas_valor']), 'num_transacoes': _valor_json(kpis['num_transacoes'])}
+
+
+def gerar_relatorios(bancos, periodos, por_mes, pasta_saida, formatos, processos=None, exato=True):
+    """Gera um relatório por banco x período em até 'processos' processos. Retorna os resumos, na ordem das tarefas."""
+    tarefas = [(caminho_db, inicio, fim) for caminho_db in bancos
+               for inicio, fim in periodos_do_banco(caminho_db, periodos, por_mes)]
+    # Fecha as conexões abertas acima: os processos criados por fork não devem herdá-las
+    app_utils.usar_banco(app_utils.DB_NAME)
+    processos = min(processos or os.cpu_count() or 1, len(tarefas)) or 1
+    print(f"Gerando {len(tarefas)} relatório(s) de {len(bancos)} banco(s) em {processos} processo(s)...")
+    with ProcessPoolExecutor(max_workers=processos) as executor:
+        futuros = [executor.submit(gerar_relatorio, caminho_db, inicio, fim, pasta_saida, formatos, exato)
+                   for caminho_db, inicio, fim in tarefas]
+        resumos = []
+        for futuro in futuros:
+            resumo = futuro.result()
+            print(f"- {resumo['loja']} {resumo['data_inicio']} a {resumo['data_fim']}: "
+                  f"R$ {resumo['total_vendas_valor'] or 0:,.2f} em {resumo['num_transacoes'] or 0:,} vendas "
+                  f"({resumo['arquivos']} arquivo(s), {resumo['segundos']:.2f}s)")
+            resumos.append(resumo)
+    return resumos
+
+
+def _periodo(texto):
+    inicio, _, fim = texto.partition(':')
+    try:
+        return date.fromisoformat(inicio), date.fromisoformat(fim or inicio)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Período inválido '{texto}' (use AAAA-MM-DD:AAAA-MM-DD)")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Gera os relatórios de todas as páginas do dashboard em lote, sem o navegador.")
+    parser.add_argument('--bancos', nargs='+', default=[app_utils.DB_NAME],
+                        help=f"Bancos (um por loja) a relatar (padrão: {app_utils.DB_NAME})")
+    parser.add_argument('--periodos', nargs='+', type=_periodo, default=[],
+                        help="Períodos AAAA-MM-DD:AAAA-MM-DD (padrão: todo o intervalo com vendas de cada banco)")
+    parser.add_argument('--por-mes', action='store_true', help="Um relatório por mês de cada período")
+    parser.add_argument('--processos', type=int, default=None, help="Processos em paralelo (padrão: núcleos da CPU)")
+    parser.add_argument('--saida', default='relatorios', help="Pasta de saída (padrão: relatorios)")
+    parser.add_argument('--formatos', nargs='+', choices=FORMATOS, default=FORMATOS, help="Formatos gravados (padrão: json e parquet)")
+    parser.add_argument('--clientes-aproximados', action='store_true',
+                        help="Estima os clientes únicos da visão geral e dos pagamentos com os esboços HyperLogLog, "
+                             "sem reler as vendas (padrão: contagem exata, igual à da seção de clientes)")
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    formatos = args.formatos
+    if 'parquet' in formatos:
+        try:
+            import pyarrow  # Usado pelo pandas.to_parquet
+        except ImportError:
+            print("  AVISO: pyarrow não está instalado. Saída Parquet ignorada (pip install pyarrow).")
+            formatos = [formato for formato in formatos if formato != 'parquet']
+    bancos = [os.path.abspath(caminho_db) for caminho_db in args.bancos]
+    inicio = time.perf_counter()
+    resumos = gerar_relatorios(bancos, args.periodos, args.por_mes, args.saida, formatos, args.processos,
+                               not args.clientes_aproximados)
+    os.makedirs(args.saida, exist_ok=True)
+    with open(os.path.join(args.saida, 'indice.json'), 'w', encoding='utf-8') as arquivo:
+        json.dump(resumos, arquivo, ensure_ascii=False, indent=2)
+    print(f"\n{len(resumos)} relatório(s) em {time.perf_counter() - inicio:.1f}s, gravados em '{args.saida}'.")
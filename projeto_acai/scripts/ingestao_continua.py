@@ -0,0 +1,96 @@
+"""
+Ingestão contínua: acompanha um CSV de vendas que o PDV vai acrescentando (mesmo
+formato de data/dados_vendas_acai.csv) e grava as linhas novas no acai.db a cada
+poucos segundos, com a mesma carga incremental do setup_database.py (marca d'água,
+resumos diários e esboços de clientes somados lote a lote, versão dos dados por mês).
+Uma linha ainda sem quebra de linha no fim do arquivo fica para o ciclo seguinte.
+Um ciclo com erro (banco bloqueado, CSV malformado) não move a marca d'água: o
+erro é registrado e o mesmo trecho é tentado de novo no ciclo seguinte.
+O dashboard (ACAI_BACKEND=sqlite ou particionado) mostra as vendas do dia no painel "Hoje ao Vivo".
+
+Uso: python scripts/ingestao_continua.py [--arquivo vendas_pdv.csv] [--intervalo 5]
+"""
+import argparse
+import os
+import sqlite3
+import time
+from datetime import datetime
+
+import pandas as pd
+
+import setup_database
+
+INTERVALO_SEGUNDOS = 5
+LINHAS_POR_LOTE = 5000  # Micro-lotes: cada um é gravado (e aparece no dashboard) em uma transação
+
+
+def _assinatura(caminho_csv):
+    """Tamanho e data de modificação do arquivo, ou None se ele ainda não existe."""
+    try:
+        estado = os.stat(caminho_csv)
+    except FileNotFoundError:
+        return None
+    return estado.st_size, estado.st_mtime_ns
+
+
+def acompanhar(conn, caminho_csv, intervalo=INTERVALO_SEGUNDOS, linhas_por_lote=LINHAS_POR_LOTE, ciclos=None):
+    """
+    Ingere as linhas novas de caminho_csv a cada 'intervalo' segundos, só quando o
+    arquivo mudou. ciclos: número de verificações antes de parar (None = sem fim).
+    Retorna o número de vendas inseridas.
+    """
+    mapas_ids = setup_database.carregar_mapas_ids(conn)
+    assinatura_anterior = None
+    total_inseridas = 0
+    ciclo = 0
+    while ciclos is None or ciclo < ciclos:
+        ciclo += 1
+        assinatura = _assinatura(caminho_csv)
+        if assinatura is not None and assinatura != assinatura_anterior:
+            print(f"\n[{datetime.now():%H:%M:%S}] '{os.path.basename(caminho_csv)}' mudou.")
+            try:
+                total_inseridas += setup_database.carregar_csv_incremental(
+                    conn, caminho_csv, linhas_por_lote, aceitar_linha_incompleta=False, mapas_ids=mapas_ids)
+                assinatura_anterior = assinatura
+            except sqlite3.Error as e_sqlite:
+                # Ex: banco bloqueado por uma carga do setup_database.py; o lote é refeito no próximo ciclo
+                print(f"  AVISO: Lote não gravado (SQLite: {e_sqlite}). Nova tentativa em {intervalo}s.")
+            except (pd.errors.ParserError, pd.errors.EmptyDataError, ValueError) as e_csv:
+                # Ex: linha malformada gravada pelo PDV; a marca d'água fica antes dela até o arquivo ser corrigido
+                print(f"  AVISO: CSV não lido ({e_csv}). Nova tentativa em {intervalo}s.")
+            except OSError as e_arquivo:
+                # Ex: arquivo removido ou trocado entre a verificação e a leitura
+                print(f"  AVISO: Arquivo não lido ({e_arquivo}). Nova tentativa em {intervalo}s.")
+        if ciclos is None or ciclo < ciclos:
+            time.sleep(intervalo)
+    return total_inseridas
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Acompanha um CSV do PDV e grava as vendas novas no acai.db continuamente.")
+    parser.add_argument('--arquivo', default=setup_database.ARQUIVO_CSV_PRINCIPAL,
+                        help=f"Nome do CSV dentro de {setup_database.DATA_FOLDER} (padrão: {setup_database.ARQUIVO_CSV_PRINCIPAL})")
+    parser.add_argument('--intervalo', type=float, default=INTERVALO_SEGUNDOS,
+                        help=f"Segundos entre verificações do arquivo (padrão: {INTERVALO_SEGUNDOS})")
+    parser.add_argument('--linhas-por-lote', type=int, default=LINHAS_POR_LOTE,
+                        help=f"Máximo de linhas por transação (padrão: {LINHAS_POR_LOTE})")
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    caminho_csv = os.path.join(setup_database.DATA_FOLDER, args.arquivo)
+    print(f"--- Ingestão contínua de '{caminho_csv}' a cada {args.intervalo}s (Ctrl+C para parar) ---")
+    conn = None
+    try:
+        conn = setup_database.conectar_bd()
+        setup_database.criar_tabelas(conn)
+        setup_database.migrar_esquema(conn, [caminho_csv])
+        acompanhar(conn, caminho_csv, args.intervalo, args.linhas_por_lote)
+    except KeyboardInterrupt:
+        print("\nIngestão contínua interrompida.")
+    finally:
+        if conn:
+            conn.execute("PRAGMA optimize;")
+            conn.close()
+            print(f"Conexão com o banco de Dados '{setup_database.DB_NAME}' fechada.")
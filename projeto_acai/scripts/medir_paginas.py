@@ -0,0 +1,116 @@
+"""
+Tempo até o primeiro conteúdo de cada página do dashboard. Cada página é aberta
+diretamente (como pela URL, sem passar pela visão geral) em um processo novo,
+com o streamlit.testing: a primeira execução mede a partida a frio (imports,
+conexões e caches vazios) e a segunda, com os caches quentes. Os tempos vêm do
+log do desempenho.py (ACAI_LOG_DESEMPENHO) e são comparados com o orçamento
+ACAI_ORCAMENTO_PRIMEIRO_CONTEUDO_MS; o script termina com código 1 se alguma
+página passar do orçamento ou falhar.
+
+Uso: python scripts/medir_paginas.py [--paginas pages/👥_Analise_de_Clientes.py ...] [--orcamento 1500] [--saida medicoes.json]
+"""
+import argparse
+import glob
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+PAGINA_PRINCIPAL = '_Visao_Geral.py'
+
+
+def listar_paginas():
+    """Página principal e as de pages/, como caminhos relativos à raiz do projeto."""
+    return [PAGINA_PRINCIPAL] + sorted(os.path.relpath(caminho, PROJECT_ROOT)
+                                       for caminho in glob.glob(os.path.join(PROJECT_ROOT, 'pages', '*.py')))
+
+
+def _executar_no_processo(pagina, execucoes):
+    """
+    Roda no processo filho: abre a página direto, 'execucoes' vezes, e imprime
+    uma linha JSON por execução (tempo total visto de fora e exceções da página).
+    """
+    from streamlit.testing.v1 import AppTest
+    app = AppTest.from_file(os.path.join(PROJECT_ROOT, PAGINA_PRINCIPAL), default_timeout=120)
+    if pagina != PAGINA_PRINCIPAL:
+        app.switch_page(pagina)
+    for _ in range(execucoes):
+        inicio = time.perf_counter()
+        app.run()
+        print(json.dumps({'execucao_ms': (time.perf_counter() - inicio) * 1000,
+                          'excecoes': [excecao.message for excecao in app.exception]}, ensure_ascii=False))
+
+
+def medir_pagina(pagina, orcamento_ms=None):
+    """Abre a página em um processo novo (execução fria e quente). Retorna um dict por execução."""
+    with tempfile.TemporaryDirectory() as pasta:
+        arquivo_log = os.path.join(pasta, 'desempenho.jsonl')
+        ambiente = {**os.environ, 'ACAI_LOG_DESEMPENHO': arquivo_log}
+        if orcamento_ms is not None:
+            ambiente['ACAI_ORCAMENTO_PRIMEIRO_CONTEUDO_MS'] = str(orcamento_ms)
+        processo = subprocess.run([sys.executable, os.path.abspath(__file__), '--filho', pagina],
+                                  cwd=PROJECT_ROOT, env=ambiente, capture_output=True, text=True, encoding='utf-8')
+        if processo.returncode != 0:
+            raise RuntimeError(f"Falha ao abrir '{pagina}':\n{processo.stderr}")
+        execucoes = [json.loads(linha) for linha in processo.stdout.splitlines() if linha.startswith('{')]
+        registros = []
+        if os.path.exists(arquivo_log):
+            with open(arquivo_log, encoding='utf-8') as arquivo:
+                registros = [json.loads(linha) for linha in arquivo if linha.strip()]
+    medicoes = []
+    for tipo, execucao, registro in zip(['fria', 'quente'], execucoes, registros + [None] * len(execucoes)):
+        medicoes.append({
+            'pagina': pagina, 'execucao': tipo, 'execucao_ms': execucao['execucao_ms'], 'excecoes': execucao['excecoes'],
+            'primeiro_conteudo_ms': registro['primeiro_conteudo_ms'] if registro else None,
+            'total_ms': registro['total_ms'] if registro else None,
+            'dentro_do_orcamento': bool(registro and registro['dentro_do_orcamento'] and not execucao['excecoes']),
+        })
+    return medicoes
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Mede o tempo até o primeiro conteúdo de cada página, aberta direto, a frio e a quente.")
+    parser.add_argument('--paginas', nargs='+', default=None,
+                        help="Páginas a medir, relativas à raiz do projeto (padrão: todas)")
+    parser.add_argument('--orcamento', type=float, default=None,
+                        help="Orçamento em ms (padrão: ACAI_ORCAMENTO_PRIMEIRO_CONTEUDO_MS ou 1500)")
+    parser.add_argument('--saida', default=None, help="Grava as medições neste arquivo JSON")
+    parser.add_argument('--filho', default=None, help=argparse.SUPPRESS)
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    if args.filho:
+        sys.path.insert(0, PROJECT_ROOT)
+        _executar_no_processo(args.filho, execucoes=2)
+        sys.exit(0)
+
+    orcamento_ms = args.orcamento or float(os.environ.get('ACAI_ORCAMENTO_PRIMEIRO_CONTEUDO_MS', '1500'))
+    print(f"--- Primeiro conteúdo por página (orçamento: {orcamento_ms:.0f} ms) ---")
+    print(f"{'Página':<48} {'Execução':<8} {'1º conteúdo':>12} {'Total':>10} {'Com imports':>12}")
+    medicoes = []
+    for pagina in args.paginas or listar_paginas():
+        for medicao in medir_pagina(pagina, orcamento_ms):
+            medicoes.append(medicao)
+            situacao = "" if medicao['dentro_do_orcamento'] else "  <- ACIMA DO ORÇAMENTO"
+            if medicao['excecoes']:
+                situacao = f"  <- ERRO: {medicao['excecoes'][0]}"
+            primeiro = f"{medicao['primeiro_conteudo_ms']:.0f} ms" if medicao['primeiro_conteudo_ms'] is not None else "-"
+            total = f"{medicao['total_ms']:.0f} ms" if medicao['total_ms'] is not None else "-"
+            print(f"{os.path.basename(pagina):<48} {medicao['execucao']:<8} {primeiro:>12} {total:>10} "
+                  f"{medicao['execucao_ms']:>9.0f} ms{situacao}")
+
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as arquivo:
+            json.dump({'orcamento_ms': orcamento_ms, 'medicoes': medicoes}, arquivo, ensure_ascii=False, indent=2)
+        print(f"\nMedições gravadas em '{args.saida}'.")
+    acima = [m for m in medicoes if not m['dentro_do_orcamento']]
+    if acima:
+        print(f"\n  AVISO: {len(acima)} execução(ões) acima do orçamento ou com erro.")
+        sys.exit(1)
+    print("\n  SUCESSO: Todas as páginas dentro do orçamento.")
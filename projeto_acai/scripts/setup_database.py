@@ -1,18 +1,55 @@
 import pandas as pd
 import sqlite3
 import os
+import sys
+import io
+import csv
+import hashlib
+import argparse
+import time
+import glob
+import shutil
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+try:
+    import resource  # Indisponível no Windows
+except ImportError:
+    resource = None
 
 # __file__ é uma variavel q tem o caminho do arquivo do script
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+sys.path.insert(0, PROJECT_ROOT)
+import hll  # Esboços HyperLogLog de clientes únicos, compartilhados com o app_utils
+
 DB_NAME = os.path.join(PROJECT_ROOT, 'acai.db')
 DATA_FOLDER = os.path.join(PROJECT_ROOT, 'data')
+PARQUET_FOLDER = os.path.join(PROJECT_ROOT, 'parquet', 'vendas')  # Snapshot colunar lido pelo app_utils (ACAI_BACKEND=parquet)
+PARTICOES_FOLDER = os.path.join(PROJECT_ROOT, 'particoes', 'acai')  # Um SQLite por mês, lidos pelo app_utils (ACAI_BACKEND=particionado)
 ARQUIVO_CSV_PRINCIPAL = 'dados_vendas_acai.csv'  # Defina o nome do seu CSV principal aqui
+LINHAS_POR_LOTE = 50000  # Cada lote é gravado em uma única transação
+LINHAS_POR_LEITURA_ESBOCOS = 200000  # Vendas lidas por vez ao reconstruir os esboços de clientes
+BYTES_VERIFICACAO = 4096  # Bytes antes da marca d'água usados para detectar arquivo reescrito
+BYTES_POR_TRECHO = 16 * 1024 * 1024  # Na carga paralela, arquivos grandes são divididos em trechos deste tamanho
+FORMATO_DATA_VENDA = r'\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}'  # Texto de 'vendas.data_venda'
+COLUNAS_CSV_OBRIGATORIAS = ['data_venda', 'cliente', 'produto', 'quantidade',
+                            'forma_pagamento', 'preco_unitario', 'valor_total', 'categoria']
+
+def configurar_pragmas(conn):
+    """Ajustes de desempenho do SQLite para cargas em lote e leitura concorrente do dashboard."""
+    conn.execute("PRAGMA page_size = 8192;")  # Só tem efeito em bancos novos (ou após VACUUM)
+    conn.execute("PRAGMA journal_mode = WAL;")  # Leitores (dashboard) não bloqueiam a carga
+    conn.execute("PRAGMA synchronous = NORMAL;")  # Seguro com WAL e bem mais rápido que FULL
+    conn.execute("PRAGMA cache_size = -65536;")  # 64 MB de cache de páginas
+    conn.execute("PRAGMA temp_store = MEMORY;")
 
 def conectar_bd():
     print(f"Tentando conectar ao banco de dados: {DB_NAME}")
     conn = sqlite3.connect(DB_NAME)
     conn.execute("PRAGMA foreign_keys = ON;") # Habilitar checagem de FK
+    configurar_pragmas(conn)
     print("Conexão estabelecida e chaves estrangeiras habilitadas.")
     return conn
 
@@ -62,158 +99,1023 @@ def criar_tabelas(conn):
     """)
     print("- Tabela 'vendas' verificada/criada.")
 
+    # Tabela de resumo (rollup) no grão dia x hora x produto x forma de pagamento.
+    # Os KPIs e gráficos do dashboard leem daqui em vez de agregar a tabela 'vendas'.
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS vendas_resumo_diario(
+        dia TEXT NOT NULL, -- Formato 'YYYY-MM-DD'
+        hora INTEGER NOT NULL,
+        produto_id INTEGER NOT NULL,
+        forma_pagamento_id INTEGER NOT NULL,
+        quantidade INTEGER NOT NULL,
+        valor_total REAL NOT NULL,
+        num_vendas INTEGER NOT NULL,
+        PRIMARY KEY (dia, hora, produto_id, forma_pagamento_id)
+    ) WITHOUT ROWID
+    """)
+    print("- Tabela 'vendas_resumo_diario' verificada/criada.")
+
+    # Marca d'água por arquivo de origem: até onde o CSV já foi ingerido
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS ingestao_controle(
+        arquivo TEXT PRIMARY KEY,
+        offset_bytes INTEGER NOT NULL,
+        linhas_processadas INTEGER NOT NULL,
+        hash_cabecalho TEXT NOT NULL,
+        hash_ultimo_bloco TEXT NOT NULL, -- sha256 dos bytes imediatamente antes do offset
+        max_data_venda TEXT,
+        atualizado_em TEXT NOT NULL
+    )
+    """)
+    print("- Tabela 'ingestao_controle' verificada/criada.")
+
+    # Metadados do banco; 'versao_dados' muda a cada carga e invalida os caches do dashboard
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS metadados(
+        chave TEXT PRIMARY KEY,
+        valor TEXT NOT NULL
+    )
+    """)
+    print("- Tabela 'metadados' verificada/criada.")
+
+    # Dimensão de clientes: opções do filtro e busca por prefixo sem varrer 'vendas'
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS clientes(
+        nome TEXT PRIMARY KEY
+    ) WITHOUT ROWID
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_clientes_nome_nocase ON clientes (nome COLLATE NOCASE)")
+    print("- Tabela 'clientes' verificada/criada.")
+
+    # Esboço HyperLogLog dos clientes de cada dia x forma de pagamento (ver hll.py):
+    # clientes únicos aproximados de qualquer intervalo sem reler 'vendas'
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS vendas_clientes_hll(
+        dia TEXT NOT NULL, -- 'YYYY-MM-DD'
+        forma_pagamento_id INTEGER NOT NULL,
+        registradores BLOB NOT NULL,
+        PRIMARY KEY (dia, forma_pagamento_id)
+    ) WITHOUT ROWID
+    """)
+    print("- Tabela 'vendas_clientes_hll' verificada/criada.")
+
     conn.commit()
     print("--- Criação de tabelas concluída. ---")
 
-def popular_tabela_lookup(conn, nome_tabela_sql, series_de_nomes_unicos, nome_coluna_sql='nome'):
+def _colunas_da_tabela(conn, nome_tabela):
+    return [linha[1] for linha in conn.execute(f"PRAGMA table_info({nome_tabela})")]
+
+def migrar_esquema(conn, caminhos_csv=None):
+    """
+    Aplica as alterações de esquema em bancos criados por versões anteriores
+    do script. Cada passo é idempotente e nenhum apaga vendas. caminhos_csv: CSVs
+    que esta execução vai carregar, com os quais as vendas sem origem registrada
+    são conferidas (padrão: o CSV principal, ver adotar_vendas_legadas).
+    """
+    print("\n--- Migrando esquema (se necessário) ---")
+    colunas_vendas = _colunas_da_tabela(conn, 'vendas')
+    # Origem de cada venda (arquivo + linha) para que recargas não dupliquem registros
+    if 'arquivo_origem' not in colunas_vendas:
+        conn.execute("ALTER TABLE vendas ADD COLUMN arquivo_origem TEXT")
+        print("- Coluna 'vendas.arquivo_origem' adicionada.")
+    if 'linha_origem' not in colunas_vendas:
+        conn.execute("ALTER TABLE vendas ADD COLUMN linha_origem INTEGER")
+        print("- Coluna 'vendas.linha_origem' adicionada.")
+    conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_vendas_origem ON vendas (arquivo_origem, linha_origem)")
+
+    # data_venda como inteiro (segundos desde 1970, sem fuso) para filtros de intervalo ordenáveis
+    if 'data_venda_epoch' not in colunas_vendas:
+        conn.execute("ALTER TABLE vendas ADD COLUMN data_venda_epoch INTEGER")
+        print("- Coluna 'vendas.data_venda_epoch' adicionada.")
+    cursor = conn.execute("""
+        UPDATE vendas SET data_venda_epoch = CAST(strftime('%s', data_venda) AS INTEGER)
+        WHERE data_venda_epoch IS NULL
+    """)
+    if cursor.rowcount > 0:
+        print(f"- {cursor.rowcount} vendas com data_venda_epoch preenchida.")
+
+    indices_existentes = {linha[0] for linha in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    # Colunas de calendário calculadas uma única vez na ingestão (o dashboard não refaz isso a cada rerun):
+    # hora (0-23), dia_semana (0 = segunda) e ano_mes (AAAAMM)
+    for coluna in ('hora', 'dia_semana', 'ano_mes'):
+        if coluna not in colunas_vendas:
+            conn.execute(f"ALTER TABLE vendas ADD COLUMN {coluna} INTEGER")
+            print(f"- Coluna 'vendas.{coluna}' adicionada.")
+    cursor = conn.execute("""
+        UPDATE vendas SET
+            hora = CAST(strftime('%H', data_venda) AS INTEGER),
+            dia_semana = (CAST(strftime('%w', data_venda) AS INTEGER) + 6) % 7,
+            ano_mes = CAST(strftime('%Y%m', data_venda) AS INTEGER)
+        WHERE ano_mes IS NULL
+    """)
+    if cursor.rowcount > 0:
+        print(f"- {cursor.rowcount} vendas com colunas de calendário preenchidas.")
+
+    # Índices alinhados aos filtros do dashboard (app_utils):
+    # intervalo de datas (+ colunas das agregações, para o índice cobrir a consulta),
+    # cliente IN (...) + intervalo, e as chaves estrangeiras usadas nos JOINs.
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_vendas_epoch_cobertura
+        ON vendas (data_venda_epoch, forma_pagamento_id, produto_id, quantidade, valor_total)
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_vendas_cliente_epoch ON vendas (cliente, data_venda_epoch)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_vendas_produto ON vendas (produto_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_vendas_forma_pagamento ON vendas (forma_pagamento_id)")
+    # Bancos anteriores às versões por mês: as vendas atuais formam a versão base de todos os meses
+    conn.execute("""
+        INSERT OR IGNORE INTO metadados (chave, valor)
+        VALUES ('versao_reconstrucao', COALESCE((SELECT valor FROM metadados WHERE chave = 'versao_dados'), '0'))
+    """)
+    # Bancos anteriores à dimensão de clientes e aos limites de data em 'metadados'
+    sem_limites = conn.execute("SELECT 1 FROM metadados WHERE chave = 'data_venda_max'").fetchone() is None
+    if sem_limites and conn.execute("SELECT 1 FROM vendas LIMIT 1").fetchone():
+        recalcular_dimensoes(conn)
+        print("- Dimensão 'clientes' e limites de data preenchidos a partir de 'vendas'.")
+    adotar_vendas_legadas(conn, caminhos_csv or [os.path.join(DATA_FOLDER, ARQUIVO_CSV_PRINCIPAL)])
+    # Bancos anteriores aos resumos e aos esboços de clientes: a reconstrução vem antes de
+    # qualquer carga, que preencheria as tabelas só com as vendas novas e deixaria as antigas de fora
+    if resumos_vazios(conn):
+        atualizar_resumos(conn)
+        incrementar_versao_dados(conn)
+    if esbocos_vazios(conn):
+        atualizar_esbocos_clientes(conn)
+        incrementar_versao_dados(conn)
+    conn.commit()
+    if 'idx_vendas_epoch_cobertura' not in indices_existentes:
+        conn.execute("ANALYZE;")  # Estatísticas para o planejador escolher os índices novos
+    print("- Índices de 'vendas' verificados/criados.")
+    print("--- Migração concluída. ---")
+
+def atualizar_resumos(conn, dia_inicio=None, dia_fim=None):
     """
-    Popula uma tabela de lookup simples (ex: categorias, formas_pagamento)
-    a partir de uma série de nomes únicos.
+    Recalcula a tabela 'vendas_resumo_diario' para os dias entre dia_inicio e
+    dia_fim (strings 'YYYY-MM-DD', inclusivo), lendo só as vendas desses dias
+    (pelo índice de data_venda_epoch). Sem intervalo, reconstrói tudo.
+    Não faz commit: quem chama decide a transação.
     """
-    print(f"\nPopulando tabela de lookup: '{nome_tabela_sql}'")
+    filtro_resumo, filtro_vendas = "", ""
+    params_resumo, params_vendas = [], []
+    if dia_inicio is not None and dia_fim is not None:
+        filtro_resumo = "WHERE dia BETWEEN ? AND ?"
+        params_resumo = [dia_inicio, dia_fim]
+        filtro_vendas = "WHERE data_venda_epoch >= ? AND data_venda_epoch < ?"
+        params_vendas = datas_para_epoch(pd.Series([pd.Timestamp(dia_inicio), pd.Timestamp(dia_fim) + pd.Timedelta(days=1)])).tolist()
+        print(f"\nAtualizando resumos diários de {dia_inicio} a {dia_fim}...")
+    else:
+        print("\nReconstruindo todos os resumos diários...")
+
+    conn.execute(f"DELETE FROM vendas_resumo_diario {filtro_resumo}", params_resumo)
+    cursor = conn.execute(f"""
+        INSERT INTO vendas_resumo_diario
+            (dia, hora, produto_id, forma_pagamento_id, quantidade, valor_total, num_vendas)
+        SELECT date(data_venda) as dia,
+               CAST(strftime('%H', data_venda) AS INTEGER) as hora,
+               produto_id, forma_pagamento_id,
+               SUM(quantidade), SUM(valor_total), COUNT(*)
+        FROM vendas
+        {filtro_vendas}
+        GROUP BY dia, hora, produto_id, forma_pagamento_id
+    """, params_vendas)
+    print(f"  SUCESSO: {cursor.rowcount} linhas de resumo gravadas.")
+
+
+def acumular_resumos(conn, df_vendas_lote):
+    """
+    Soma um lote de vendas recém-inseridas aos resumos existentes (custo
+    proporcional ao lote, não ao histórico). Não faz commit.
+    """
+    df_resumo_lote = (
+        df_vendas_lote.assign(dia=df_vendas_lote['data_venda'].str[:10])
+        .groupby(['dia', 'hora', 'produto_id', 'forma_pagamento_id'], as_index=False)
+        .agg(quantidade=('quantidade', 'sum'), valor_total=('valor_total', 'sum'), num_vendas=('quantidade', 'size'))
+    )
+    conn.executemany("""
+        INSERT INTO vendas_resumo_diario
+            (dia, hora, produto_id, forma_pagamento_id, quantidade, valor_total, num_vendas)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (dia, hora, produto_id, forma_pagamento_id) DO UPDATE SET
+            quantidade = quantidade + excluded.quantidade,
+            valor_total = valor_total + excluded.valor_total,
+            num_vendas = num_vendas + excluded.num_vendas
+    """, df_resumo_lote.itertuples(index=False, name=None))
+
+
+def acumular_esbocos_clientes(conn, dias, formas_pagamento_ids, clientes):
+    """
+    Une os clientes das vendas (séries alinhadas: dia 'YYYY-MM-DD', forma de pagamento,
+    cliente) aos esboços HyperLogLog existentes de cada dia x forma de pagamento. Não faz commit.
+    """
+    codigos, chaves = pd.MultiIndex.from_arrays([dias, formas_pagamento_ids]).factorize()
+    esbocos = hll.esbocos_por_grupo(codigos, clientes.to_numpy(), len(chaves))
+    existentes = dict(((dia, fp), registradores) for dia, fp, registradores in conn.execute(
+        "SELECT dia, forma_pagamento_id, registradores FROM vendas_clientes_hll WHERE dia BETWEEN ? AND ?",
+        (dias.min(), dias.max())))
+    linhas = []
+    for posicao, (dia, forma_pagamento_id) in enumerate(chaves):
+        esboco = esbocos[posicao]
+        anterior = existentes.get((dia, int(forma_pagamento_id)))
+        if anterior is not None:
+            esboco = hll.unir([esboco, hll.de_bytes(anterior)])
+        linhas.append((dia, int(forma_pagamento_id), hll.para_bytes(esboco)))
+    conn.executemany("""
+        INSERT INTO vendas_clientes_hll (dia, forma_pagamento_id, registradores) VALUES (?, ?, ?)
+        ON CONFLICT (dia, forma_pagamento_id) DO UPDATE SET registradores = excluded.registradores
+    """, linhas)
+
+def atualizar_esbocos_clientes(conn):
+    """Reconstrói todos os esboços de clientes a partir de 'vendas', em blocos. Não faz commit."""
+    print("\nReconstruindo esboços de clientes únicos...")
+    conn.execute("DELETE FROM vendas_clientes_hll")
+    consulta = "SELECT date(data_venda) as dia, forma_pagamento_id, cliente FROM vendas"
+    for bloco in pd.read_sql_query(consulta, conn, chunksize=LINHAS_POR_LEITURA_ESBOCOS):
+        acumular_esbocos_clientes(conn, bloco['dia'], bloco['forma_pagamento_id'], bloco['cliente'])
+    total = conn.execute("SELECT COUNT(*) FROM vendas_clientes_hll").fetchone()[0]
+    print(f"  SUCESSO: {total} esboços gravados.")
+
+def esbocos_vazios(conn):
+    """Indica se há vendas sem nenhum esboço de clientes (ex: banco criado antes dos esboços)."""
+    return (conn.execute("SELECT 1 FROM vendas_clientes_hll LIMIT 1").fetchone() is None
+            and conn.execute("SELECT 1 FROM vendas LIMIT 1").fetchone() is not None)
+
+def atualizar_dimensoes(conn, clientes, data_min, data_max):
+    """
+    Registra os clientes e amplia o intervalo de datas ('data_venda_min'/'data_venda_max'
+    em 'metadados') com as vendas de um lote. Não faz commit.
+    """
+    conn.executemany("INSERT OR IGNORE INTO clientes (nome) VALUES (?)", ((nome,) for nome in clientes))
+    # Datas em texto 'AAAA-MM-DD HH:MM:SS': a ordem do texto é a ordem cronológica
+    conn.executemany("""
+        INSERT INTO metadados (chave, valor) VALUES (?, ?)
+        ON CONFLICT(chave) DO UPDATE SET valor = CASE WHEN chave = 'data_venda_min' THEN MIN(valor, excluded.valor)
+                                                      ELSE MAX(valor, excluded.valor) END
+    """, [('data_venda_min', data_min), ('data_venda_max', data_max)])
+
+def recalcular_dimensoes(conn):
+    """Reconstrói a dimensão de clientes e os limites de data a partir de 'vendas'. Não faz commit."""
+    conn.execute("DELETE FROM clientes")
+    conn.execute("INSERT INTO clientes (nome) SELECT DISTINCT cliente FROM vendas")
+    conn.execute("DELETE FROM metadados WHERE chave IN ('data_venda_min', 'data_venda_max')")
+    conn.execute("""
+        INSERT INTO metadados (chave, valor)
+        SELECT 'data_venda_min', (SELECT MIN(data_venda) FROM vendas) WHERE EXISTS (SELECT 1 FROM vendas)
+        UNION ALL
+        SELECT 'data_venda_max', (SELECT MAX(data_venda) FROM vendas) WHERE EXISTS (SELECT 1 FROM vendas)
+    """)
+
+def incrementar_versao_dados(conn, meses=None):
+    """
+    Avança a versão dos dados lida pelo dashboard (app_utils.versao_dados) e registra
+    quais meses mudaram (ano_mes AAAAMM, em 'versao_mes_AAAAMM'): o dashboard só
+    descarta os blocos mensais em cache desses meses. Sem meses, a carga vale para
+    todos ('versao_reconstrucao'). Não faz commit.
+    """
+    conn.execute("""
+        INSERT INTO metadados (chave, valor) VALUES ('versao_dados', '1')
+        ON CONFLICT(chave) DO UPDATE SET valor = CAST(valor AS INTEGER) + 1
+    """)
+    chaves = ['versao_reconstrucao'] if meses is None else [f"versao_mes_{int(mes)}" for mes in meses]
+    conn.executemany("""
+        INSERT INTO metadados (chave, valor) SELECT ?, valor FROM metadados WHERE chave = 'versao_dados'
+        ON CONFLICT(chave) DO UPDATE SET valor = excluded.valor
+    """, [(chave,) for chave in chaves])
+
+def versoes_meses(conn):
+    """Versão atual de cada mês com vendas ({ano_mes AAAAMM: versão}), como em app_utils.versoes_meses."""
+    versoes = dict(conn.execute(
+        "SELECT chave, valor FROM metadados WHERE chave = 'versao_reconstrucao' OR chave LIKE 'versao_mes_%'").fetchall())
+    base = int(versoes.pop('versao_reconstrucao', 0))
+    por_mes = {int(chave[len('versao_mes_'):]): int(valor) for chave, valor in versoes.items()}
+    meses = [linha[0] for linha in conn.execute(
+        "SELECT DISTINCT CAST(replace(substr(dia, 1, 7), '-', '') AS INTEGER) FROM vendas_resumo_diario ORDER BY 1")]
+    return {ano_mes: max(base, por_mes.get(ano_mes, base)) for ano_mes in meses}
+
+def resumos_vazios(conn):
+    """Indica se há vendas sem nenhum resumo calculado (ex: banco criado antes dos resumos)."""
+    tem_vendas = conn.execute("SELECT 1 FROM vendas LIMIT 1").fetchone() is not None
+    tem_resumo = conn.execute("SELECT 1 FROM vendas_resumo_diario LIMIT 1").fetchone() is not None
+    return tem_vendas and not tem_resumo
+
+
+def _sha256(dados):
+    return hashlib.sha256(dados).hexdigest()
+
+def _hash_antes_do_offset(arquivo, inicio_dados, offset):
+    inicio = max(inicio_dados, offset - BYTES_VERIFICACAO)
+    arquivo.seek(inicio)
+    return _sha256(arquivo.read(offset - inicio))
+
+def ler_marca_dagua(conn, nome_arquivo):
+    linha = conn.execute(
+        "SELECT offset_bytes, linhas_processadas, hash_cabecalho, hash_ultimo_bloco FROM ingestao_controle WHERE arquivo = ?",
+        (nome_arquivo,)
+    ).fetchone()
+    if linha is None:
+        return None
+    return dict(zip(['offset_bytes', 'linhas_processadas', 'hash_cabecalho', 'hash_ultimo_bloco'], linha))
+
+def _gravar_marca_dagua(conn, nome_arquivo, offset, linhas, hash_cabecalho, hash_ultimo_bloco, max_data_venda):
+    conn.execute("""
+        INSERT INTO ingestao_controle
+            (arquivo, offset_bytes, linhas_processadas, hash_cabecalho, hash_ultimo_bloco, max_data_venda, atualizado_em)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (arquivo) DO UPDATE SET
+            offset_bytes = excluded.offset_bytes,
+            linhas_processadas = excluded.linhas_processadas,
+            hash_cabecalho = excluded.hash_cabecalho,
+            hash_ultimo_bloco = excluded.hash_ultimo_bloco,
+            max_data_venda = MAX(COALESCE(max_data_venda, ''), COALESCE(excluded.max_data_venda, '')),
+            atualizado_em = excluded.atualizado_em
+    """, (nome_arquivo, offset, linhas, hash_cabecalho, hash_ultimo_bloco, max_data_venda,
+          datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+
+def carregar_mapas_ids(conn):
+    """
+    Carrega os mapas nome -> id das tabelas de lookup. Os mapas ficam em memória
+    durante a ingestão e crescem à medida que nomes novos aparecem, então cada
+    lote só consulta o banco para nomes ainda desconhecidos.
+    """
+    return {
+        'categorias': dict(conn.execute("SELECT nome, id FROM categorias").fetchall()),
+        'formas_pagamento': dict(conn.execute("SELECT nome, id FROM formas_pagamento").fetchall()),
+        'produtos': dict(conn.execute("SELECT nome, id FROM produtos").fetchall()),
+    }
+
+def _resolver_nomes(conn, mapa, nome_tabela_sql, nomes, colunas_extras=None):
+    """
+    Garante que todos os nomes existam na tabela de lookup e no mapa em memória.
+    colunas_extras: dict opcional nome -> tupla de valores adicionais (ex: categoria_id de produtos).
+    """
+    novos = [n for n in pd.unique(nomes) if isinstance(n, str) and n.strip() != '' and n not in mapa]
+    if not novos:
+        return mapa
+    if colunas_extras is None:
+        conn.executemany(f"INSERT OR IGNORE INTO {nome_tabela_sql} (nome) VALUES (?)", [(n,) for n in novos])
+    else:
+        conn.executemany(f"INSERT OR IGNORE INTO {nome_tabela_sql} (nome, categoria_id) VALUES (?, ?)",
+                         [(n,) + colunas_extras[n] for n in novos])
+    placeholders = ','.join(['?'] * len(novos))
+    mapa.update(conn.execute(f"SELECT nome, id FROM {nome_tabela_sql} WHERE nome IN ({placeholders})", novos).fetchall())
+    return mapa
+
+def converter_datas(serie):
+    """Converte data_venda do CSV: ISO 'YYYY-MM-DD HH:MM:SS' ou, se não for ISO, DD/MM/YYYY."""
     try:
-        if series_de_nomes_unicos.empty:
-            print(f"  AVISO: Nenhuma série de nomes fornecida. Tabela '{nome_tabela_sql}' não populada.")
-            return
+        return pd.to_datetime(serie, format='ISO8601')
+    except (ValueError, TypeError):
+        # Lote com formatos misturados: só as datas que não são ISO são lidas com o dia primeiro
+        # (com dayfirst, '2024-01-06' viraria 1º de junho)
+        datas = pd.to_datetime(serie, format='ISO8601', errors='coerce')
+        nao_iso = datas.isna()
+        datas[nao_iso] = pd.to_datetime(serie[nao_iso], dayfirst=True, format='mixed')
+        return datas
 
-        df_lookup = pd.DataFrame(series_de_nomes_unicos.unique(), columns=[nome_coluna_sql])
-        df_lookup.dropna(subset=[nome_coluna_sql], inplace=True) # Remover NaNs se houver
-        df_lookup = df_lookup[df_lookup[nome_coluna_sql].str.strip() != ''] # Remover strings vazias
+def _texto_canonico(serie):
+    """Indica se as datas do CSV já estão no formato gravado em 'vendas' ('YYYY-MM-DD HH:MM:SS')."""
+    return bool(serie.str.fullmatch(FORMATO_DATA_VENDA).all())
 
-        if df_lookup.empty:
-            print(f"  AVISO: Nenhum valor único válido encontrado. Tabela '{nome_tabela_sql}' não populada.")
+def epoch_para_datas(epoch):
+    """Inverso de datas_para_epoch: datas direto dos inteiros, sem interpretar texto."""
+    return pd.to_datetime(pd.Series(epoch, dtype='int64'), unit='s').astype('datetime64[us]')
+
+def datas_para_epoch(datas):
+    """Segundos desde 1970-01-01 (horário local tratado como UTC, igual a strftime('%s') do SQLite)."""
+    return (datas - pd.Timestamp('1970-01-01')) // pd.Timedelta(seconds=1)
+
+def preparar_lote(df_lote, nome_arquivo, primeira_linha):
+    """
+    Parte do lote que não depende do banco (datas, colunas de calendário, tipos):
+    roda nos processos de carregar_csvs_paralelo. Os nomes de produto, categoria e
+    forma de pagamento ficam como texto até gravar_lote_preparado.
+    """
+    df_lote = df_lote.assign(linha_origem=range(primeira_linha, primeira_linha + len(df_lote)))
+    df_lote = df_lote.dropna(subset=COLUNAS_CSV_OBRIGATORIAS)
+    datas = converter_datas(df_lote['data_venda'])
+    # Texto de data_venda: o próprio CSV quando já está no formato gravado (evita o strftime, que
+    # custa mais que a leitura das datas); senão, formatado a partir das datas convertidas
+    textos = df_lote['data_venda'] if _texto_canonico(df_lote['data_venda']) else datas.dt.strftime('%Y-%m-%d %H:%M:%S')
+    return pd.DataFrame({
+        'data_venda': textos,
+        'data_venda_epoch': datas_para_epoch(datas),
+        'hora': datas.dt.hour,
+        'dia_semana': datas.dt.dayofweek,
+        'ano_mes': datas.dt.year * 100 + datas.dt.month,
+        'cliente': df_lote['cliente'],
+        'produto': df_lote['produto'],
+        'categoria': df_lote['categoria'],
+        'quantidade': df_lote['quantidade'].astype(int),
+        'forma_pagamento': df_lote['forma_pagamento'],
+        'preco_unitario': df_lote['preco_unitario'].astype(float),
+        'valor_total': df_lote['valor_total'].astype(float),
+        'arquivo_origem': nome_arquivo,
+        'linha_origem': df_lote['linha_origem'],
+    })
+
+def gravar_lote_preparado(conn, df_lote, mapas_ids):
+    """
+    Grava um lote de preparar_lote (lookups + vendas + resumos) dentro da transação
+    corrente, usando/atualizando os mapas de carregar_mapas_ids. O lote pode juntar
+    vendas de vários arquivos. Retorna (vendas inseridas, maior data_venda do lote).
+    """
+    if df_lote.empty:
+        return 0, None
+
+    map_categoria_id = _resolver_nomes(conn, mapas_ids['categorias'], 'categorias', df_lote['categoria'])
+    map_forma_pagamento_id = _resolver_nomes(conn, mapas_ids['formas_pagamento'], 'formas_pagamento', df_lote['forma_pagamento'])
+    produtos_novos = df_lote.loc[~df_lote['produto'].isin(mapas_ids['produtos'].keys()), ['produto', 'categoria']].drop_duplicates(subset=['produto'])
+    categoria_por_produto = {nome: (map_categoria_id.get(categoria),) for nome, categoria in zip(produtos_novos['produto'], produtos_novos['categoria'])}
+    map_produto_id = _resolver_nomes(conn, mapas_ids['produtos'], 'produtos', produtos_novos['produto'], categoria_por_produto)
+
+    df_vendas = pd.DataFrame({
+        'data_venda': df_lote['data_venda'],
+        'data_venda_epoch': df_lote['data_venda_epoch'],
+        'hora': df_lote['hora'],
+        'dia_semana': df_lote['dia_semana'],
+        'ano_mes': df_lote['ano_mes'],
+        'cliente': df_lote['cliente'],
+        'produto_id': df_lote['produto'].map(map_produto_id),
+        'quantidade': df_lote['quantidade'],
+        'forma_pagamento_id': df_lote['forma_pagamento'].map(map_forma_pagamento_id),
+        'preco_unitario': df_lote['preco_unitario'],
+        'valor_total': df_lote['valor_total'],
+        'arquivo_origem': df_lote['arquivo_origem'],
+        'linha_origem': df_lote['linha_origem'],
+    })
+    if df_vendas['produto_id'].isnull().any() or df_vendas['forma_pagamento_id'].isnull().any():
+        print("  AVISO: Algumas vendas não puderam ser mapeadas para IDs de produto ou forma_pagamento e não serão inseridas.")
+        df_vendas = df_vendas.dropna(subset=['produto_id', 'forma_pagamento_id'])
+    if df_vendas.empty:
+        return 0, None
+    df_vendas = df_vendas.astype({'produto_id': int, 'forma_pagamento_id': int})
+
+    # INSERT simples (sem OR IGNORE): uma linha já ingerida viola idx_vendas_origem e
+    # desfaz o lote inteiro, em vez de somar a venda duas vezes nos resumos.
+    conn.executemany("""
+        INSERT INTO vendas (data_venda, data_venda_epoch, hora, dia_semana, ano_mes, cliente, produto_id, quantidade,
+                            forma_pagamento_id, preco_unitario, valor_total, arquivo_origem, linha_origem)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, df_vendas.itertuples(index=False, name=None))
+    acumular_resumos(conn, df_vendas)
+    acumular_esbocos_clientes(conn, df_vendas['data_venda'].str[:10], df_vendas['forma_pagamento_id'], df_vendas['cliente'])
+    data_max = df_vendas['data_venda'].max()
+    atualizar_dimensoes(conn, df_vendas['cliente'].unique(), df_vendas['data_venda'].min(), data_max)
+    return len(df_vendas), data_max
+
+def gravar_lote(conn, df_lote, nome_arquivo, primeira_linha, mapas_ids):
+    """Prepara e grava um lote do CSV (ver preparar_lote e gravar_lote_preparado)."""
+    return gravar_lote_preparado(conn, preparar_lote(df_lote, nome_arquivo, primeira_linha), mapas_ids)
+
+def _ler_linhas(arquivo, max_linhas, aceitar_linha_incompleta, fim=None):
+    """Lê até max_linhas linhas completas a partir da posição atual do arquivo, sem passar do byte 'fim'."""
+    linhas = []
+    while len(linhas) < max_linhas:
+        if fim is not None and arquivo.tell() >= fim:
+            break
+        linha = arquivo.readline()
+        if not linha:
+            break
+        if not linha.endswith(b'\n') and not aceitar_linha_incompleta:
+            # Linha ainda sendo escrita: fica para a próxima execução
+            break
+        linhas.append(linha)
+    return linhas
+
+def iniciar_arquivo(conn, caminho_csv):
+    """
+    Confere o cabeçalho e a marca d'água do CSV (recarregando o arquivo se ele foi
+    reescrito) e retorna de onde continuar a ingestão: dict com colunas, offset,
+    linhas_processadas, inicio_dados e hash_cabecalho. None se não há o que ingerir.
+    """
+    nome_arquivo = os.path.basename(caminho_csv)
+    tamanho = os.path.getsize(caminho_csv)
+    with open(caminho_csv, 'rb') as arquivo:
+        cabecalho = arquivo.readline()
+        inicio_dados = len(cabecalho)
+        hash_cabecalho = _sha256(cabecalho)
+        colunas = next(csv.reader([cabecalho.decode('utf-8-sig').strip()]))
+        colunas_faltando = [c for c in COLUNAS_CSV_OBRIGATORIAS if c not in colunas]
+        if colunas_faltando:
+            print(f"  AVISO: Colunas {colunas_faltando} não encontradas em '{nome_arquivo}'. Arquivo ignorado.")
+            return None
+
+        marca = ler_marca_dagua(conn, nome_arquivo)
+        offset, linhas_processadas = inicio_dados, 0
+        if marca is not None:
+            arquivo_intacto = (
+                marca['hash_cabecalho'] == hash_cabecalho
+                and marca['offset_bytes'] <= tamanho
+                and _hash_antes_do_offset(arquivo, inicio_dados, marca['offset_bytes']) == marca['hash_ultimo_bloco']
+            )
+            if arquivo_intacto:
+                offset, linhas_processadas = marca['offset_bytes'], marca['linhas_processadas']
+                print(f"Marca d'água de '{nome_arquivo}': {linhas_processadas} linhas / {offset} bytes já ingeridos.")
+            else:
+                print(f"  AVISO: '{nome_arquivo}' foi reescrito desde a última carga. Suas vendas serão recarregadas.")
+                with conn:
+                    # Só os dias e meses que tinham vendas do arquivo mudam
+                    dia_min, dia_max = conn.execute(
+                        "SELECT date(MIN(data_venda)), date(MAX(data_venda)) FROM vendas WHERE arquivo_origem = ?",
+                        (nome_arquivo,)).fetchone()
+                    meses = [linha[0] for linha in conn.execute(
+                        "SELECT DISTINCT ano_mes FROM vendas WHERE arquivo_origem = ?", (nome_arquivo,))]
+                    conn.execute("DELETE FROM vendas WHERE arquivo_origem = ?", (nome_arquivo,))
+                    conn.execute("DELETE FROM ingestao_controle WHERE arquivo = ?", (nome_arquivo,))
+                    if dia_min is not None:
+                        atualizar_resumos(conn, dia_min, dia_max)
+                    atualizar_esbocos_clientes(conn)
+                    recalcular_dimensoes(conn)
+                    incrementar_versao_dados(conn, meses)
+
+    if offset >= tamanho:
+        print(f"  INFO: Nenhuma linha nova em '{nome_arquivo}'.")
+        return None
+    return {'colunas': colunas, 'offset': offset, 'linhas_processadas': linhas_processadas,
+            'inicio_dados': inicio_dados, 'hash_cabecalho': hash_cabecalho}
+
+def ler_lotes_preparados(caminho_csv, estado, linhas_por_lote=LINHAS_POR_LOTE, aceitar_linha_incompleta=False):
+    """
+    Lê o CSV a partir do offset de iniciar_arquivo, em lotes de linhas_por_lote linhas,
+    e gera (lote de preparar_lote, linhas lidas, marca d'água ao fim do lote), com a
+    marca no formato de _gravar_grupo. Com estado['fim'] (ver dividir_em_trechos), para
+    nesse byte. Uma última linha sem quebra de linha pode estar sendo escrita (ex: PDV):
+    só é lida com aceitar_linha_incompleta, para arquivos que se sabe completos.
+    Não usa o banco, então pode rodar em outro processo.
+    """
+    nome_arquivo = os.path.basename(caminho_csv)
+    offset, linhas_processadas = estado['offset'], estado['linhas_processadas']
+    with open(caminho_csv, 'rb') as arquivo:
+        arquivo.seek(offset)
+        while True:
+            linhas = _ler_linhas(arquivo, linhas_por_lote, aceitar_linha_incompleta, estado.get('fim'))
+            if not linhas:
+                break
+            df_lote = pd.read_csv(io.BytesIO(b''.join(linhas)), header=None, names=estado['colunas'])
+            df_lote = preparar_lote(df_lote, nome_arquivo, linhas_processadas + 1)
+            offset += sum(len(l) for l in linhas)
+            linhas_processadas += len(linhas)
+            hash_ultimo_bloco = _hash_antes_do_offset(arquivo, estado['inicio_dados'], offset)
+            arquivo.seek(offset)
+            yield df_lote, len(linhas), (nome_arquivo, offset, linhas_processadas, estado['hash_cabecalho'], hash_ultimo_bloco)
+
+ORIGEM_LEGADO = 'legado'  # arquivo_origem das vendas antigas que não correspondem a nenhum CSV carregado
+COLUNAS_COMPARADAS_LEGADO = ['data_venda', 'cliente', 'produto', 'quantidade', 'forma_pagamento', 'valor_total']
+
+def _marca_na_linha(caminho_csv, estado, linha):
+    """Marca d'água (no formato de _gravar_grupo) logo após a linha de dados 'linha' do CSV."""
+    with open(caminho_csv, 'rb') as arquivo:
+        arquivo.seek(estado['inicio_dados'])
+        for _ in range(linha):
+            arquivo.readline()
+        offset = arquivo.tell()
+        return (os.path.basename(caminho_csv), offset, linha, estado['hash_cabecalho'],
+                _hash_antes_do_offset(arquivo, estado['inicio_dados'], offset))
+
+def _corresponder_legadas(conn, caminho_csv, estado):
+    """
+    Compara as vendas sem origem (em ordem de id) com as primeiras linhas do CSV (em
+    ordem do arquivo), lote a lote; o CSV pode ter recebido linhas depois da carga antiga.
+    Retorna (ids, linhas de origem, marca d'água após a última linha correspondente,
+    maior data_venda) se todas as vendas correspondem, uma a uma; senão, None.
+    """
+    cursor = conn.execute("""
+        SELECT v.id, v.data_venda, v.cliente, p.nome, v.quantidade, fp.nome, v.valor_total
+        FROM vendas v
+        JOIN produtos p ON v.produto_id = p.id
+        JOIN formas_pagamento fp ON v.forma_pagamento_id = fp.id
+        WHERE v.arquivo_origem IS NULL
+        ORDER BY v.id
+    """)
+    ids, linhas, data_max = [], [], ''
+    # O script antigo lia o arquivo inteiro, inclusive uma última linha sem quebra de linha
+    for df_lote, _, _ in ler_lotes_preparados(caminho_csv, estado, aceitar_linha_incompleta=True):
+        gravadas = pd.DataFrame(cursor.fetchmany(len(df_lote)), columns=['id'] + COLUNAS_COMPARADAS_LEGADO)
+        fim_das_legadas = len(gravadas) < len(df_lote)
+        df_lote = df_lote.iloc[:len(gravadas)]
+        iguais = (gravadas[COLUNAS_COMPARADAS_LEGADO].to_numpy(dtype=object)
+                  == df_lote[COLUNAS_COMPARADAS_LEGADO].to_numpy(dtype=object))
+        if not iguais.all():
+            return None
+        ids.extend(gravadas['id'].tolist())
+        linhas.extend(df_lote['linha_origem'].tolist())
+        if not df_lote.empty:
+            data_max = max(data_max, df_lote['data_venda'].max())
+        if fim_das_legadas:
+            break
+    if not ids or cursor.fetchone() is not None:
+        return None  # Vendas sem origem além das do CSV (ex: script antigo rodado mais de uma vez)
+    return ids, linhas, _marca_na_linha(caminho_csv, estado, linhas[-1]), data_max
+
+def adotar_vendas_legadas(conn, caminhos_csv):
+    """
+    Vendas gravadas pela versão antiga do script não têm arquivo_origem/linha_origem:
+    ela carregava um CSV inteiro, na ordem do arquivo. Se essas vendas correspondem
+    linha a linha ao início de um dos caminhos_csv (ainda sem marca d'água), ganham a
+    origem e o arquivo ganha a marca d'água após a última linha correspondente, então a
+    carga não as duplica. Senão, são mantidas e marcadas com arquivo_origem = ORIGEM_LEGADO
+    (apagadas só com apagar_vendas_legadas, --recarregar-legado). Não faz commit.
+    """
+    legadas = conn.execute("SELECT COUNT(*) FROM vendas WHERE arquivo_origem IS NULL").fetchone()[0]
+    if legadas == 0:
+        return
+    for caminho_csv in caminhos_csv:
+        nome_arquivo = os.path.basename(caminho_csv)
+        # Com marca d'água, o CSV já foi carregado por esta versão do script
+        if not os.path.exists(caminho_csv) or ler_marca_dagua(conn, nome_arquivo) is not None:
+            continue
+        estado = iniciar_arquivo(conn, caminho_csv)
+        correspondencia = _corresponder_legadas(conn, caminho_csv, estado) if estado is not None else None
+        if correspondencia is not None:
+            ids, linhas, marca, data_max = correspondencia
+            conn.executemany("UPDATE vendas SET arquivo_origem = ?, linha_origem = ? WHERE id = ?",
+                             ((nome_arquivo, linha, id_venda) for id_venda, linha in zip(ids, linhas)))
+            _gravar_marca_dagua(conn, *marca, data_max)
+            print(f"- {legadas} vendas sem origem associadas às linhas de '{nome_arquivo}'.")
             return
 
-        # Usar try-except para cada linha para lidar com 'UNIQUE constraint failed' individualmente
-        # ou inserir tudo e capturar o erro (mais simples com pandas, mas menos granular)
-        # Para simplicidade, df.to_sql com if_exists='append' vai tentar inserir.
-        # Erros de UNIQUE serão levantados pelo SQLite se já existirem, o que é bom.
-        try:
-            df_lookup.to_sql(nome_tabela_sql, conn, if_exists='append', index=False)
-            print(f"  SUCESSO (tentativa): Tabela '{nome_tabela_sql}' populada/atualizada com {len(df_lookup)} valores únicos.")
-        except sqlite3.IntegrityError as ie:
-            print(f"  INFO: Alguns ou todos os dados já podem existir em '{nome_tabela_sql}' (erro de integridade: {ie}). Isso é esperado se os dados já foram inseridos.")
-        except Exception as e_to_sql:
-            print(f"  ERRO ao usar to_sql para '{nome_tabela_sql}': {e_to_sql}")
+    # linha_origem = id: mantém a unicidade de idx_vendas_origem
+    conn.execute("UPDATE vendas SET arquivo_origem = ?, linha_origem = id WHERE arquivo_origem IS NULL", (ORIGEM_LEGADO,))
+    nomes = ', '.join(f"'{os.path.basename(c)}'" for c in caminhos_csv)
+    print(f"  AVISO: {legadas} vendas sem origem não correspondem a {nomes}; mantidas com arquivo_origem = '{ORIGEM_LEGADO}'.")
+    print("  Se elas vieram de um CSV que ainda será carregado, serão duplicadas: use --recarregar-legado para apagá-las antes da carga.")
+
+def apagar_vendas_legadas(conn):
+    """
+    Apaga as vendas marcadas com ORIGEM_LEGADO (ver adotar_vendas_legadas), para que a
+    carga as regrave a partir dos CSVs, e refaz resumos, esboços e dimensões. Não faz commit.
+    """
+    cursor = conn.execute("DELETE FROM vendas WHERE arquivo_origem = ?", (ORIGEM_LEGADO,))
+    if cursor.rowcount == 0:
+        print("  INFO: Nenhuma venda legada para apagar.")
+        return
+    print(f"\n{cursor.rowcount} vendas legadas apagadas; serão recarregadas dos CSVs.")
+    atualizar_resumos(conn)
+    atualizar_esbocos_clientes(conn)
+    recalcular_dimensoes(conn)
+    incrementar_versao_dados(conn)
+
+def _gravar_grupo(conn, lotes, marcas, mapas_ids):
+    """Grava lotes preparados e as marcas d'água (nome_arquivo, offset, linhas, hashes) em uma única transação."""
+    df_lote = pd.concat(lotes, ignore_index=True) if len(lotes) > 1 else lotes[0]
+    max_por_arquivo = df_lote.groupby('arquivo_origem')['data_venda'].max().to_dict()
+    try:
+        with conn:
+            inseridas, _ = gravar_lote_preparado(conn, df_lote, mapas_ids)
+            for nome_arquivo, offset, linhas, hash_cabecalho, hash_ultimo_bloco in marcas:
+                _gravar_marca_dagua(conn, nome_arquivo, offset, linhas, hash_cabecalho, hash_ultimo_bloco,
+                                    max_por_arquivo.get(nome_arquivo))
+            if inseridas:
+                incrementar_versao_dados(conn, df_lote['ano_mes'].unique())
+    except Exception:
+        # O rollback pode ter desfeito IDs recém-criados que já estavam nos mapas
+        mapas_ids.update(carregar_mapas_ids(conn))
+        raise
+    num_arquivos = len({marca[0] for marca in marcas})
+    if num_arquivos == 1:
+        print(f"  Lote gravado: {inseridas} vendas (até a linha {marcas[-1][2]} de '{marcas[-1][0]}').")
+    else:
+        print(f"  Lote gravado: {inseridas} vendas de {num_arquivos} arquivos.")
+    return inseridas
+
+def gravar_lotes(conn, lotes, mapas_ids, linhas_por_transacao=LINHAS_POR_LOTE):
+    """
+    Grava os lotes de ler_lotes_preparados (de um ou mais arquivos), cada grupo de
+    lotes (lookups, vendas, resumos e marcas d'água) em uma única transação. Lotes
+    pequenos seguidos, como os de muitos CSVs diários, são juntados até
+    linhas_por_transacao linhas. Retorna o número de vendas inseridas.
+    """
+    total_inseridas = 0
+    grupo, marcas, linhas_grupo = [], [], 0
+    for df_lote, num_linhas, marca in lotes:
+        grupo.append(df_lote)
+        marcas.append(marca)
+        linhas_grupo += num_linhas
+        if linhas_grupo >= linhas_por_transacao:
+            total_inseridas += _gravar_grupo(conn, grupo, marcas, mapas_ids)
+            grupo, marcas, linhas_grupo = [], [], 0
+    if grupo:
+        total_inseridas += _gravar_grupo(conn, grupo, marcas, mapas_ids)
+    return total_inseridas
+
+def carregar_csv_incremental(conn, caminho_csv, linhas_por_lote=LINHAS_POR_LOTE, aceitar_linha_incompleta=False, mapas_ids=None):
+    """
+    Ingere apenas a parte do CSV posterior à marca d'água do arquivo, em lotes
+    de linhas_por_lote linhas (memória limitada pelo tamanho do lote, não do
+    arquivo). Cada lote (lookups, vendas, resumos e marca d'água) é gravado em
+    uma única transação, então o script pode ser reexecutado após uma falha sem
+    duplicar vendas. Retorna o número de vendas inseridas.
+    """
+    if mapas_ids is None:
+        mapas_ids = carregar_mapas_ids(conn)
+    nome_arquivo = os.path.basename(caminho_csv)
+    estado = iniciar_arquivo(conn, caminho_csv)
+    if estado is None:
+        return 0
+    lotes = ler_lotes_preparados(caminho_csv, estado, linhas_por_lote, aceitar_linha_incompleta)
+    total_inseridas = gravar_lotes(conn, lotes, mapas_ids, linhas_por_lote)
+    print(f"  SUCESSO: {total_inseridas} novas vendas ingeridas de '{nome_arquivo}'.")
+    return total_inseridas
+
+def dividir_em_trechos(caminho_csv, estado, bytes_por_trecho=BYTES_POR_TRECHO):
+    """
+    Divide a parte nova do CSV (a partir do offset de iniciar_arquivo) em trechos de
+    ~bytes_por_trecho bytes, sempre em início de linha. Retorna um estado por trecho,
+    no formato de iniciar_arquivo, com o byte final em 'fim' (None no último: lê até o
+    fim do arquivo) e as linhas contadas a partir do início do trecho.
+    """
+    inicios = [estado['offset']]
+    tamanho = os.path.getsize(caminho_csv)
+    with open(caminho_csv, 'rb') as arquivo:
+        posicao = estado['offset'] + bytes_por_trecho
+        while posicao < tamanho:
+            # Avança até o fim da linha em que o trecho cairia
+            arquivo.seek(posicao - 1)
+            arquivo.readline()
+            if arquivo.tell() >= tamanho:
+                break
+            inicios.append(arquivo.tell())
+            posicao = arquivo.tell() + bytes_por_trecho
+    return [{**estado, 'offset': inicio, 'linhas_processadas': 0, 'fim': fim}
+            for inicio, fim in zip(inicios, inicios[1:] + [None])]
+
+def _preparar_trecho(caminho_csv, estado, linhas_por_lote, aceitar_linha_incompleta):
+    """Tarefa dos processos de carregar_csvs_paralelo: os lotes de um trecho (ver dividir_em_trechos)."""
+    return list(ler_lotes_preparados(caminho_csv, estado, linhas_por_lote, aceitar_linha_incompleta))
+
+def carregar_csvs_paralelo(conn, caminhos_csv, linhas_por_lote=LINHAS_POR_LOTE, processos=None, aceitar_linha_incompleta=False):
+    """
+    Ingestão em massa de vários CSVs: a leitura e a preparação dos lotes (ver
+    preparar_lote) rodam em um pool de processos, um trecho de até BYTES_POR_TRECHO
+    bytes por tarefa (um arquivo pequeno é um trecho só), e este
+    processo é o único que grava no banco, na ordem de caminhos_csv. Assim os IDs
+    de lookup são resolvidos sempre pelos mesmos mapas, como na carga serial.
+    Retorna o número de vendas inseridas.
+    """
+    processos = processos or os.cpu_count() or 1
+    mapas_ids = carregar_mapas_ids(conn)
+    # Marca d'água e arquivos reescritos são tratados antes, aqui, pois exigem o banco
+    tarefas = []
+    for caminho_csv in caminhos_csv:
+        estado = iniciar_arquivo(conn, caminho_csv)
+        if estado is not None:
+            tarefas.append((caminho_csv, estado))
+    if not tarefas:
+        return 0
+
+    print(f"Preparando {len(tarefas)} arquivo(s) em {processos} processo(s)...")
+    with ProcessPoolExecutor(max_workers=processos) as executor:
+        lotes = _lotes_em_paralelo(executor, tarefas, linhas_por_lote, 2 * processos, aceitar_linha_incompleta)
+        total_inseridas = gravar_lotes(conn, lotes, mapas_ids, linhas_por_lote)
+    print(f"  SUCESSO: {total_inseridas} novas vendas ingeridas de {len(tarefas)} arquivo(s).")
+    return total_inseridas
+
+def _lotes_em_paralelo(executor, tarefas, linhas_por_lote, janela, aceitar_linha_incompleta):
+    """Gera os lotes dos arquivos na ordem de tarefas, com até 'janela' trechos em preparo ao mesmo tempo."""
+    trechos = deque((caminho_csv, estado, trecho) for caminho_csv, estado in tarefas
+                    for trecho in dividir_em_trechos(caminho_csv, estado))
+    pendentes = deque()
+    linhas_antes = {}  # Arquivo -> linhas dos trechos já gerados
+    while trechos or pendentes:
+        # Janela limitada: a memória não cresce com o tamanho nem com o número de arquivos
+        while trechos and len(pendentes) < janela:
+            caminho_csv, estado, trecho = trechos.popleft()
+            pendentes.append((caminho_csv, estado, executor.submit(_preparar_trecho, caminho_csv, trecho, linhas_por_lote,
+                                                                    aceitar_linha_incompleta)))
+        caminho_csv, estado, futuro = pendentes.popleft()
+        # Os processos numeram as linhas a partir do início do trecho; aqui elas passam à numeração do arquivo
+        base = linhas_antes.get(caminho_csv, estado['linhas_processadas'])
+        linhas_trecho = 0
+        for df_lote, num_linhas, (nome_arquivo, offset, linhas_trecho, hash_cabecalho, hash_ultimo_bloco) in futuro.result():
+            yield (df_lote.assign(linha_origem=df_lote['linha_origem'] + base), num_linhas,
+                   (nome_arquivo, offset, base + linhas_trecho, hash_cabecalho, hash_ultimo_bloco))
+        linhas_antes[caminho_csv] = base + linhas_trecho
+
+def listar_csvs(pasta=DATA_FOLDER):
+    """Todos os CSVs da pasta, em ordem de nome (ex: um arquivo diário por loja)."""
+    return sorted(glob.glob(os.path.join(pasta, '*.csv')))
+
+COLUNAS_DICIONARIO_PARQUET = ['cliente', 'produto_nome', 'categoria_nome', 'forma_pagamento_nome']
+
+def exportar_parquet(conn, destino=PARQUET_FOLDER, meses=None):
+    """
+    Exporta as vendas (já com os nomes de produto/categoria/pagamento) para um
+    dataset Parquet particionado por ano/mês (destino/ano=AAAA/mes=M/), com as
+    colunas de texto codificadas em dicionário. meses: lista de 'AAAA-MM' a
+    reexportar; None exporta todos. Cada mês é lido e gravado separadamente,
+    então a memória é limitada ao maior mês.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        print("  AVISO: pyarrow não está instalado. Exportação Parquet ignorada (pip install pyarrow).")
+        return 0
+
+    if meses is None:
+        meses = [linha[0] for linha in conn.execute("SELECT DISTINCT substr(dia, 1, 7) FROM vendas_resumo_diario ORDER BY 1")]
+        # Exportação completa: remove partições de meses que não existem mais no banco
+        pastas_validas = {os.path.join(destino, f"ano={int(m[:4])}", f"mes={int(m[5:])}") for m in meses}
+        for pasta_mes in glob.glob(os.path.join(destino, 'ano=*', 'mes=*')):
+            if pasta_mes not in pastas_validas:
+                shutil.rmtree(pasta_mes)
+    print(f"\n--- Exportando {len(meses)} mês(es) para Parquet em '{destino}' ---")
+    total = 0
+    for mes_ano in meses:
+        inicio = pd.Timestamp(f"{mes_ano}-01")
+        fim = inicio + pd.offsets.MonthBegin(1)
+        df_mes = pd.read_sql_query("""
+            SELECT
+                v.id as venda_id, v.data_venda_epoch as data_venda, v.cliente, v.quantidade, v.preco_unitario, v.valor_total,
+                p.nome as produto_nome,
+                c.nome as categoria_nome,
+                fp.nome as forma_pagamento_nome,
+                v.hora as hora_venda, v.dia_semana as dia_semana_venda, v.ano_mes as ano_mes_venda
+            FROM vendas v
+            JOIN produtos p ON v.produto_id = p.id
+            JOIN categorias c ON p.categoria_id = c.id
+            JOIN formas_pagamento fp ON v.forma_pagamento_id = fp.id
+            WHERE v.data_venda_epoch >= ? AND v.data_venda_epoch < ?
+            ORDER BY v.data_venda_epoch
+        """, conn, params=datas_para_epoch(pd.Series([inicio, fim])).tolist())
+        df_mes['data_venda'] = epoch_para_datas(df_mes['data_venda']).to_numpy()
+        df_mes = df_mes.astype({'hora_venda': 'int8', 'dia_semana_venda': 'int8', 'ano_mes_venda': 'int32'})
+        for coluna in COLUNAS_DICIONARIO_PARQUET:
+            df_mes[coluna] = df_mes[coluna].astype('category')
+
+        pasta_mes = os.path.join(destino, f"ano={inicio.year}", f"mes={inicio.month}")
+        os.makedirs(pasta_mes, exist_ok=True)
+        caminho = os.path.join(pasta_mes, 'part-0.parquet')
+        # Grava em arquivo temporário e troca de uma vez: leitores nunca veem um mês pela metade
+        pq.write_table(pa.Table.from_pandas(df_mes, preserve_index=False), caminho + '.tmp',
+                       use_dictionary=COLUNAS_DICIONARIO_PARQUET, compression='zstd')
+        os.replace(caminho + '.tmp', caminho)
+        total += len(df_mes)
+        print(f"- {mes_ano}: {len(df_mes)} vendas.")
+    print(f"--- Exportação Parquet concluída: {total} vendas. ---")
+    return total
+
+
+# Tabelas copiadas para cada partição mensal: dimensões inteiras, fatos só do mês
+TABELAS_PARTICAO = ['categorias', 'formas_pagamento', 'produtos', 'vendas', 'vendas_resumo_diario',
+                    'vendas_clientes_hll', 'clientes', 'metadados']
+
+def _gravar_particao(conn, esquema, ano_mes, versao, caminho):
+    """Grava em caminho um banco com o esquema do acai.db e os dados de um mês. Retorna o número de vendas."""
+    if os.path.exists(caminho):
+        os.remove(caminho)
+    conn_particao = sqlite3.connect(caminho)
+    conn_particao.execute("PRAGMA page_size = 8192;")
+    for sql in esquema:
+        conn_particao.execute(sql)
+    conn_particao.commit()
+    conn_particao.close()
+
+    inicio = pd.Timestamp(year=ano_mes // 100, month=ano_mes % 100, day=1)
+    fim = inicio + pd.offsets.MonthBegin(1)
+    dias = (inicio.strftime('%Y-%m-%d'), fim.strftime('%Y-%m-%d'))
+    conn.execute("ATTACH DATABASE ? AS particao", (caminho,))
+    try:
+        with conn:
+            for tabela in ('categorias', 'formas_pagamento', 'produtos'):
+                conn.execute(f"INSERT INTO particao.{tabela} SELECT * FROM main.{tabela}")
+            cursor = conn.execute("INSERT INTO particao.vendas SELECT * FROM main.vendas WHERE data_venda_epoch >= ? AND data_venda_epoch < ?",
+                                  datas_para_epoch(pd.Series([inicio, fim])).tolist())
+            vendas = cursor.rowcount
+            for tabela in ('vendas_resumo_diario', 'vendas_clientes_hll'):
+                conn.execute(f"INSERT INTO particao.{tabela} SELECT * FROM main.{tabela} WHERE dia >= ? AND dia < ?", dias)
+            conn.execute("INSERT INTO particao.clientes (nome) SELECT DISTINCT cliente FROM particao.vendas")
+            # Limites de data do mês e a versão do mês no acai.db quando a partição foi gravada
+            conn.execute("""
+                INSERT INTO particao.metadados (chave, valor)
+                SELECT 'data_venda_min', MIN(data_venda) FROM particao.vendas
+                UNION ALL SELECT 'data_venda_max', MAX(data_venda) FROM particao.vendas
+                UNION ALL SELECT 'versao_particao', ?
+            """, (str(versao),))
+        conn.execute("ANALYZE particao;")
+    finally:
+        conn.execute("DETACH DATABASE particao")
+    return vendas
+
+def exportar_particoes(conn, destino=PARTICOES_FOLDER, meses=None):
+    """
+    Copia cada mês do acai.db para um banco SQLite próprio, destino/vendas_AAAAMM_v<versão>.db,
+    com o mesmo esquema (vendas, resumos e esboços do mês, mais as dimensões). A versão é a
+    do mês no acai.db (versao_mes_AAAAMM): meses que não mudaram desde a última exportação
+    não são regravados, e um mês alterado ganha um arquivo novo, trocado de uma vez. Cada
+    arquivo é, portanto, imutável. meses: lista de AAAAMM a exportar; None exporta todos e
+    apaga partições de meses que não existem mais. Retorna o número de partições gravadas.
+    """
+    versoes = versoes_meses(conn)
+    existentes = {}
+    for caminho in glob.glob(os.path.join(destino, 'vendas_*_v*.db')):
+        existentes.setdefault(int(os.path.basename(caminho)[len('vendas_'):len('vendas_') + 6]), []).append(caminho)
+    if meses is None:
+        meses = list(versoes)
+        existentes_sem_mes = [caminho for ano_mes, caminhos in existentes.items() if ano_mes not in versoes for caminho in caminhos]
+        for caminho in existentes_sem_mes:
+            os.remove(caminho)
+    # O esquema sai do próprio acai.db (já migrado): as partições respondem às mesmas consultas do dashboard
+    esquema = [linha[0] for linha in conn.execute(f"""
+        SELECT sql FROM sqlite_master
+        WHERE sql IS NOT NULL AND tbl_name IN ({','.join(['?'] * len(TABELAS_PARTICAO))})
+        ORDER BY type <> 'table'
+    """, TABELAS_PARTICAO)]
+    os.makedirs(destino, exist_ok=True)
+    print(f"\n--- Exportando partições mensais para '{destino}' ---")
+    gravadas = 0
+    for ano_mes in meses:
+        versao = versoes[ano_mes]
+        caminho = os.path.join(destino, f"vendas_{ano_mes}_v{versao}.db")
+        if not os.path.exists(caminho):
+            # Grava em arquivo temporário e troca de uma vez: leitores nunca veem um mês pela metade
+            vendas = _gravar_particao(conn, esquema, ano_mes, versao, caminho + '.tmp')
+            os.replace(caminho + '.tmp', caminho)
+            gravadas += 1
+            print(f"- {ano_mes}: {vendas} vendas (versão {versao}).")
+        for antigo in existentes.get(ano_mes, []):
+            if antigo != caminho:
+                try:
+                    os.remove(antigo)
+                except OSError:
+                    pass  # Ex: aberto pelo dashboard no Windows; removido na próxima exportação
+    print(f"--- Exportação de partições concluída: {gravadas} de {len(meses)} mês(es) regravados. ---")
+    return gravadas
+
 
+def pico_memoria_mb():
+    """Pico de memória residente (RSS) do processo em MB, ou None se indisponível."""
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta em KB; macOS em bytes
+    return pico / (1024 * 1024) if os.uname().sysname == 'Darwin' else pico / 1024
 
-    except Exception as e:
-        print(f"  ERRO geral ao popular '{nome_tabela_sql}': {e}")
+def imprimir_desempenho(linhas, segundos):
+    vazao = linhas / segundos if segundos > 0 else 0
+    pico = pico_memoria_mb()
+    print(f"\nDesempenho da ingestão: {linhas} linhas em {segundos:.2f}s ({vazao:,.0f} linhas/s).")
+    print(f"Pico de memória (RSS): {pico:,.1f} MB" if pico is not None else "Pico de memória (RSS): indisponível nesta plataforma")
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Cria/atualiza o banco acai.db a partir do CSV de vendas.")
+    parser.add_argument('--arquivo', default=ARQUIVO_CSV_PRINCIPAL,
+                        help=f"Nome do CSV dentro de {DATA_FOLDER} (padrão: {ARQUIVO_CSV_PRINCIPAL})")
+    parser.add_argument('--linhas-por-lote', type=int, default=LINHAS_POR_LOTE,
+                        help=f"Linhas lidas e gravadas por transação (padrão: {LINHAS_POR_LOTE})")
+    parser.add_argument('--parquet', action='store_true',
+                        help=f"Também exporta o snapshot Parquet particionado por ano/mês em {PARQUET_FOLDER}")
+    parser.add_argument('--particoes', action='store_true',
+                        help=f"Também exporta os meses alterados para partições SQLite mensais em {PARTICOES_FOLDER}")
+    parser.add_argument('--todos', action='store_true',
+                        help=f"Ingere todos os CSVs de {DATA_FOLDER} (ignora --arquivo), preparando-os em paralelo")
+    parser.add_argument('--processos', type=int, default=None,
+                        help="Processos usados por --todos para ler e preparar os CSVs (padrão: núcleos da CPU)")
+    parser.add_argument('--recarregar-legado', action='store_true',
+                        help=f"Apaga as vendas antigas marcadas como '{ORIGEM_LEGADO}' (sem CSV correspondente) "
+                             "antes da carga, para regravá-las a partir dos CSVs")
+    parser.add_argument('--arquivos-completos', action='store_true',
+                        help="Ingere também uma última linha sem quebra de linha. Use só com arquivos fechados: "
+                             "por padrão ela fica para a próxima carga, pois o PDV pode estar escrevendo a linha")
+    return parser.parse_args()
 
 
 if __name__ == '__main__':
+    args = parse_args()
     print("--- Iniciando Script de Setup do Banco de Dados ---")
     conn = None
     try:
         conn = conectar_bd()
         criar_tabelas(conn)
+        # Vendas antigas sem origem são conferidas com os CSVs desta carga
+        caminhos_csv = listar_csvs() if args.todos else [os.path.join(DATA_FOLDER, args.arquivo)]
+        migrar_esquema(conn, caminhos_csv)
+        if args.recarregar_legado:
+            with conn:
+                apagar_vendas_legadas(conn)
 
-        print("\n--- Normalizando e Populando Tabelas a partir do CSV Principal ---")
-        caminho_csv_principal = os.path.join(DATA_FOLDER, ARQUIVO_CSV_PRINCIPAL)
-
-        if not os.path.exists(caminho_csv_principal):
-            print(f"  AVISO CRÍTICO: Arquivo CSV Principal '{ARQUIVO_CSV_PRINCIPAL}' NÃO ENCONTRADO em '{DATA_FOLDER}'.")
-            print("  O script não pode popular as tabelas.")
+        if args.todos:
+            print(f"\n--- Normalizando e Populando Tabelas a partir de {len(caminhos_csv)} CSV(s) em '{DATA_FOLDER}' ---")
+            inicio = time.perf_counter()
+            inseridas = carregar_csvs_paralelo(conn, caminhos_csv, args.linhas_por_lote, args.processos,
+                                               args.arquivos_completos)
+            imprimir_desempenho(inseridas, time.perf_counter() - inicio)
         else:
-            print(f"Lendo CSV Principal: {caminho_csv_principal}")
-            # Ajuste dayfirst=True se suas datas no CSV são DD/MM/YYYY
-            df_principal = pd.read_csv(caminho_csv_principal, parse_dates=['data_venda'], dayfirst=True)
-            print(f"Lido CSV Principal. {len(df_principal)} linhas encontradas.")
+            print("\n--- Normalizando e Populando Tabelas a partir do CSV Principal ---")
+            caminho_csv_principal = caminhos_csv[0]
 
-            if df_principal.empty:
-                print("  AVISO: O CSV Principal está vazio. Nada para popular.")
+            if not os.path.exists(caminho_csv_principal):
+                print(f"  AVISO CRÍTICO: Arquivo CSV Principal '{args.arquivo}' NÃO ENCONTRADO em '{DATA_FOLDER}'.")
+                print("  O script não pode popular as tabelas.")
             else:
-                # 1. Popular Categorias
-                if 'categoria' in df_principal.columns:
-                    popular_tabela_lookup(conn, 'categorias', df_principal['categoria'])
-                else:
-                    print("  AVISO: Coluna 'categoria' não encontrada no CSV principal. Tabela 'categorias' não populada.")
-
-                # 2. Popular Formas de Pagamento
-                if 'forma_pagamento' in df_principal.columns:
-                    popular_tabela_lookup(conn, 'formas_pagamento', df_principal['forma_pagamento'])
-                else:
-                    print("  AVISO: Coluna 'forma_pagamento' não encontrada no CSV principal. Tabela 'formas_pagamento' não populada.")
-
-                # 3. Popular Produtos (requer lookup de categoria_id)
-                print("\nPopulando tabela 'produtos'...")
-                if 'produto' in df_principal.columns and 'categoria' in df_principal.columns:
-                    try:
-                        df_categorias_bd = pd.read_sql_query("SELECT id, nome FROM categorias", conn)
-                        map_categoria_id = df_categorias_bd.set_index('nome')['id'].to_dict()
-
-                        df_produtos_source = df_principal[['produto', 'categoria']].copy()
-                        df_produtos_source.drop_duplicates(subset=['produto'], inplace=True) # Pega cada produto uma vez
-                        df_produtos_source['nome'] = df_produtos_source['produto'] # Renomeia para 'nome'
-                        df_produtos_source['categoria_id'] = df_produtos_source['categoria'].map(map_categoria_id)
-                        
-                        df_produtos_final = df_produtos_source[['nome', 'categoria_id']].dropna(subset=['nome'])
-                        df_produtos_final = df_produtos_final[df_produtos_final['nome'].str.strip() != '']
-
-
-                        if df_produtos_final.empty:
-                            print("  AVISO: Nenhum dado de produto válido para inserir após mapeamento.")
-                        else:
-                            try:
-                                df_produtos_final.to_sql('produtos', conn, if_exists='append', index=False)
-                                print(f"  SUCESSO (tentativa): Tabela 'produtos' populada/atualizada com {len(df_produtos_final)} produtos.")
-                            except sqlite3.IntegrityError as ie:
-                                print(f"  INFO: Alguns ou todos os produtos já podem existir (erro de integridade: {ie}).")
-                            except Exception as e_to_sql:
-                                print(f"  ERRO ao usar to_sql para 'produtos': {e_to_sql}")
-
-                    except Exception as e_prod:
-                        print(f"  ERRO ao preparar dados para 'produtos': {e_prod}")
-                else:
-                    print("  AVISO: Colunas 'produto' ou 'categoria' não encontradas. Tabela 'produtos' não populada.")
-
-
-                # 4. Popular Vendas (requer lookup de produto_id e forma_pagamento_id)
-                print("\nPopulando tabela 'vendas'...")
-                if all(col in df_principal.columns for col in ['data_venda', 'cliente', 'produto', 'quantidade', 'forma_pagamento', 'preco_unitario', 'valor_total']):
-                    try:
-                        df_produtos_bd = pd.read_sql_query("SELECT id, nome FROM produtos", conn)
-                        map_produto_id = df_produtos_bd.set_index('nome')['id'].to_dict()
-
-                        df_formas_pagamento_bd = pd.read_sql_query("SELECT id, nome FROM formas_pagamento", conn)
-                        map_forma_pagamento_id = df_formas_pagamento_bd.set_index('nome')['id'].to_dict()
-
-                        df_vendas_preparado = df_principal.copy()
-                        df_vendas_preparado['produto_id'] = df_vendas_preparado['produto'].map(map_produto_id)
-                        df_vendas_preparado['forma_pagamento_id'] = df_vendas_preparado['forma_pagamento'].map(map_forma_pagamento_id)
-                        
-                        # Garantir que data_venda seja formatada como texto para SQLite
-                        df_vendas_preparado['data_venda'] = pd.to_datetime(df_vendas_preparado['data_venda']).dt.strftime('%Y-%m-%d %H:%M:%S')
-
-                        colunas_vendas_sql = ['data_venda', 'cliente', 'produto_id', 'quantidade',
-                                              'forma_pagamento_id', 'preco_unitario', 'valor_total']
-                        df_vendas_final = df_vendas_preparado[colunas_vendas_sql]
-                        
-                        # Verificar se há NaNs nas colunas de ID, o que indicaria falha no mapeamento
-                        if df_vendas_final['produto_id'].isnull().any() or df_vendas_final['forma_pagamento_id'].isnull().any():
-                            print("  AVISO: Algumas vendas não puderam ser mapeadas para IDs de produto ou forma_pagamento e não serão inseridas.")
-                            print("  Verifique se todos os produtos e formas de pagamento do CSV de vendas existem nas respectivas tabelas de lookup.")
-                            # Você pode querer ver quais falharam:
-                            # print(df_vendas_preparado[df_vendas_preparado['produto_id'].isnull() | df_vendas_preparado['forma_pagamento_id'].isnull()])
-                            df_vendas_final.dropna(subset=['produto_id', 'forma_pagamento_id'], inplace=True)
-
-
-                        if df_vendas_final.empty:
-                             print("  AVISO: Nenhum dado de venda válido para inserir após mapeamento e remoção de nulos.")
-                        else:
-                            try:
-                                df_vendas_final.to_sql('vendas', conn, if_exists='append', index=False)
-                                print(f"  SUCESSO: Tabela 'vendas' populada com {len(df_vendas_final)} registros.")
-                            except sqlite3.IntegrityError as ie: # Menos provável aqui, a menos que você tenha uma UNIQUE constraint em vendas
-                                print(f"  ERRO de integridade ao inserir em 'vendas': {ie}")
-                            except Exception as e_to_sql:
-                                print(f"  ERRO ao usar to_sql para 'vendas': {e_to_sql}")
-                                
-                    except Exception as e_vendas:
-                        print(f"  ERRO ao preparar dados para 'vendas': {e_vendas}")
-                else:
-                    print("  AVISO: Colunas necessárias para 'vendas' não encontradas no CSV principal.")
-    
+                print(f"Lendo CSV Principal (incremental, {args.linhas_por_lote} linhas por lote): {caminho_csv_principal}")
+                inicio = time.perf_counter()
+                inseridas = carregar_csv_incremental(conn, caminho_csv_principal, args.linhas_por_lote,
+                                                     args.arquivos_completos)
+                imprimir_desempenho(inseridas, time.perf_counter() - inicio)
+
+        if args.parquet:
+            exportar_parquet(conn)
+        if args.particoes:
+            exportar_particoes(conn)
+
     except sqlite3.Error as e_sqlite:
         print(f"ERRO SQLite durante o setup: {e_sqlite}")
     except FileNotFoundError as e_fnf:
@@ -224,6 +1126,7 @@ if __name__ == '__main__':
         print(f"ERRO GERAL durante o setup: {e_geral}")
     finally:
         if conn:
+            conn.execute("PRAGMA optimize;")  # Atualiza estatísticas apenas se necessário
             conn.close()
             print(f"\nConexão com o banco de Dados '{DB_NAME}' fechada.")
-    print("--- Script de Setup Finalizado. ---")
\ No newline at end of file
+    print("--- Script de Setup Finalizado. ---")